@@ -160,6 +160,35 @@ class Api:
         except:
             raise ProtocolException(f"Response not formatted correctly")
 
+    def embeddings_batch(self, texts):
+
+        # The input consists of a list of text blocks
+        input = {
+            "texts": texts
+        }
+
+        url = f"{self.url}embeddings"
+
+        # Invoke the API, input is passed as JSON
+        resp = requests.post(url, json=input)
+
+        # Should be a 200 status code
+        if resp.status_code != 200:
+            raise ProtocolException(f"Status code {resp.status_code}")
+
+        try:
+            # Parse the response as JSON
+            object = resp.json()
+        except:
+            raise ProtocolException(f"Expected JSON response")
+
+        self.check_error(object)
+
+        try:
+            return object["results"]
+        except:
+            raise ProtocolException(f"Response not formatted correctly")
+
     def prompt(self, id, variables):
 
         # The input consists of system and prompt strings
@@ -255,6 +284,61 @@ class Api:
 
         return object["response"]
 
+    def triples_query_batch(self, patterns, limit=10000):
+
+        # Each pattern is an (s, p, o) tuple, any of which may be None.
+        # The limit applies to each pattern.
+        def to_term(x):
+            return { "v": str(x), "e": isinstance(x, Uri), }
+
+        input = {
+            "limit": limit,
+            "patterns": [
+                {
+                    k: to_term(v)
+                    for k, v in zip(["s", "p", "o"], pattern)
+                    if v
+                }
+                for pattern in patterns
+            ]
+        }
+
+        url = f"{self.url}triples-query"
+
+        # Invoke the API, input is passed as JSON
+        resp = requests.post(url, json=input)
+
+        # Should be a 200 status code
+        if resp.status_code != 200:
+            raise ProtocolException(f"Status code {resp.status_code}")
+
+        try:
+            # Parse the response as JSON
+            object = resp.json()
+        except:
+            raise ProtocolException("Expected JSON response")
+
+        self.check_error(object)
+
+        if "results" not in object:
+            raise ProtocolException("Response not formatted correctly")
+
+        def to_value(x):
+            if x["e"]: return Uri(x["v"])
+            return Literal(x["v"])
+
+        return [
+            [
+                Triple(
+                    s=to_value(t["s"]),
+                    p=to_value(t["p"]),
+                    o=to_value(t["o"])
+                )
+                for t in triples
+            ]
+            for triples in object["results"]
+        ]
+
     def load_document(self, document, id=None, metadata=None):
 
         if id is None:
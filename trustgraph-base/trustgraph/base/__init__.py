@@ -3,4 +3,12 @@ from . base_processor import BaseProcessor
 from . consumer import Consumer
 from . producer import Producer
 from . consumer_producer import ConsumerProducer
+from . buffered_consumer import BufferedConsumer
+from . lru_cache import LruCache
+from . embeddings_cache import EmbeddingsCache
+from . point_id import point_id
+from . topic_reader import read_since
 
+from . rate_limiter import RateLimiter, AdaptiveConcurrency
+from . rate_limiter import MemoryBucketStore, SqliteBucketStore
+from . llm_processor import LlmProcessor
@@ -0,0 +1,165 @@
+
+from prometheus_client import Histogram
+import pulsar
+import time
+
+from . consumer import Consumer
+
+default_batch_size = 500
+default_batch_wait_ms = 1000
+
+# Consumer for writers which upsert to a store.  handle() doesn't write,
+# it calls add(key, item) to buffer items per target (e.g. a collection).
+# Buffers are passed to flush(key, items) once batch_size items are held, or
+# batch_wait_ms after the oldest was buffered.  Keys are flushed one at a
+# time; a message is acknowledged once every key holding its items has
+# flushed, and negatively acknowledged if any of them fails.  Redelivery
+# re-writes items which did get written, so flush() should upsert with
+# deterministic IDs.
+class BufferedConsumer(Consumer):
+
+    def __init__(self, **params):
+
+        super(BufferedConsumer, self).__init__(**params)
+
+        self.batch_size = params.get("batch_size", default_batch_size)
+        self.batch_wait_ms = params.get("batch_wait_ms", default_batch_wait_ms)
+
+        if not hasattr(__class__, "flush_metric"):
+            __class__.flush_metric = Histogram(
+                'flush_size', 'Items written per flush',
+                buckets=[1, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+            )
+
+        self.buffers = {}
+        self.buffered = 0
+        self.staged = []
+        self.messages = []
+        self.deadline = None
+
+    def add(self, key, item):
+        self.staged.append((key, item))
+
+    def flush(self, key, items):
+        raise RuntimeError("flush not implemented")
+
+    def ack(self, msg):
+        self.consumer.acknowledge(msg)
+        Consumer.processing_metric.labels(status="success").inc()
+
+    def nack(self, msg):
+        self.consumer.negative_acknowledge(msg)
+        Consumer.processing_metric.labels(status="error").inc()
+
+    def flush_all(self):
+
+        with Consumer.request_metric.time():
+
+            for key, items in self.buffers.items():
+
+                try:
+                    self.flush(key, items)
+                    __class__.flush_metric.observe(len(items))
+                    failed = False
+                except Exception as e:
+                    print("Exception:", e, flush=True)
+                    failed = True
+
+                # Settle messages with items for this key.  A failure
+                # redelivers them straight away, otherwise they're
+                # acknowledged once every key they wrote to is flushed.
+                remaining = []
+
+                for msg, keys in self.messages:
+
+                    if key in keys:
+
+                        if failed:
+                            self.nack(msg)
+                            continue
+
+                        keys.discard(key)
+
+                        if not keys:
+                            self.ack(msg)
+                            continue
+
+                    remaining.append((msg, keys))
+
+                self.messages = remaining
+
+        self.buffers = {}
+        self.buffered = 0
+        self.messages = []
+        self.deadline = None
+
+    def run(self):
+
+        Consumer.state_metric.state('running')
+
+        while True:
+
+            try:
+
+                if self.deadline is None:
+                    msg = self.consumer.receive()
+                else:
+                    remaining = int((self.deadline - time.time()) * 1000)
+                    if remaining <= 0: raise pulsar.exceptions.Timeout()
+                    msg = self.consumer.receive(timeout_millis=remaining)
+
+            except pulsar.exceptions.Timeout:
+                self.flush_all()
+                continue
+
+            self.staged = []
+
+            try:
+
+                self.handle(msg)
+
+            except Exception as e:
+
+                print("Exception:", e, flush=True)
+
+                # Message failed to be processed, drop its items
+                self.nack(msg)
+
+                continue
+
+            # Nothing to write, done with the message
+            if not self.staged:
+                self.ack(msg)
+                continue
+
+            for key, item in self.staged:
+                self.buffers.setdefault(key, []).append(item)
+
+            self.buffered += len(self.staged)
+            self.messages.append((msg, set(key for key, item in self.staged)))
+
+            if self.deadline is None:
+                self.deadline = time.time() + self.batch_wait_ms / 1000
+
+            if self.buffered >= self.batch_size:
+                self.flush_all()
+
+    @staticmethod
+    def add_args(parser, default_input_queue, default_subscriber):
+
+        Consumer.add_args(parser, default_input_queue, default_subscriber)
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=default_batch_size,
+            help=f'Items buffered before a write (default: {default_batch_size})'
+        )
+
+        parser.add_argument(
+            '--batch-wait-ms',
+            type=int,
+            default=default_batch_wait_ms,
+            help=f'Max time items are buffered, milliseconds (default: {default_batch_wait_ms})'
+        )
+
@@ -1,6 +1,9 @@
 
 from pulsar.schema import JsonSchema
-from prometheus_client import Histogram, Info, Counter, Enum
+from prometheus_client import Histogram, Info, Counter, Enum, Gauge
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pulsar
 import time
 
 from . base_processor import BaseProcessor
@@ -10,6 +13,10 @@ from .. exceptions import TooManyRequests
 
 class ConsumerProducer(BaseProcessor):
 
+    # Processors whose handle() is thread-safe set this, which allows more
+    # than one message to be handled at a time with --concurrency
+    concurrent = False
+
     def __init__(self, **params):
 
         if not hasattr(__class__, "state_metric"):
@@ -26,6 +33,15 @@ class ConsumerProducer(BaseProcessor):
         subscriber = params.get("subscriber")
         input_schema = params.get("input_schema")
         output_schema = params.get("output_schema")
+        concurrency = params.get("concurrency", 1)
+
+        if concurrency < 1:
+            raise RuntimeError("concurrency must be at least 1")
+
+        if concurrency > 1 and not self.concurrent:
+            raise RuntimeError("Processor doesn't support concurrency")
+
+        self.concurrency = concurrency
 
         if not hasattr(__class__, "request_metric"):
             __class__.request_metric = Histogram(
@@ -37,6 +53,11 @@ class ConsumerProducer(BaseProcessor):
                 'output_count', 'Output items created'
             )
 
+        if not hasattr(__class__, "in_flight_metric"):
+            __class__.in_flight_metric = Gauge(
+                'in_flight', 'Messages currently being handled'
+            )
+
         if not hasattr(__class__, "pubsub_metric"):
             __class__.pubsub_metric = Info(
                 'pubsub', 'Pub/sub configuration'
@@ -77,35 +98,92 @@ class ConsumerProducer(BaseProcessor):
 
         __class__.state_metric.state('running')
 
-        while True:
+        if self.concurrency == 1:
+            while True:
+                msg = self.consumer.receive()
+                self.process(msg)
 
-            msg = self.consumer.receive()
+        # Concurrent mode: the receive loop hands each message to a worker
+        # pool, and the semaphore stops us receiving more than concurrency
+        # messages ahead of the workers.  Each message is acked / nacked
+        # individually when its handler completes, so ordering of acks
+        # across messages is not preserved.
+        slots = threading.BoundedSemaphore(self.concurrency)
 
+        def worker(msg):
             try:
+                self.process(msg)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            while True:
 
-                with __class__.request_metric.time():
-                    resp = self.handle(msg)
+                slots.acquire()
 
-                # Acknowledge successful processing of the message
-                self.consumer.acknowledge(msg)
+                try:
+                    msg = self.consumer.receive()
+                except:
+                    slots.release()
+                    raise
 
-                __class__.processing_metric.labels(status="success").inc()
+                executor.submit(worker, msg)
 
-            except TooManyRequests:
-                self.consumer.negative_acknowledge(msg)
-                print("TooManyRequests: will retry")
-                __class__.processing_metric.labels(status="rate-limit").inc()
-                time.sleep(5)
-                continue
+    # Receives up to batch_size messages, waiting at most batch_wait_ms
+    # after the first one arrives.  Used by processors which micro-batch.
+    def receive_batch(self, batch_size, batch_wait_ms):
+
+        msgs = [ self.consumer.receive() ]
+
+        end_time = time.time() + batch_wait_ms / 1000
+
+        while len(msgs) < batch_size:
+
+            remaining = int((end_time - time.time()) * 1000)
+
+            if remaining <= 0: break
+
+            try:
+                msgs.append(
+                    self.consumer.receive(timeout_millis=remaining)
+                )
+            except pulsar.exceptions.Timeout:
+                break
 
-            except Exception as e:
+        return msgs
 
-                print("Exception:", e, flush=True)
+    def process(self, msg):
 
-                # Message failed to be processed
-                self.consumer.negative_acknowledge(msg)
+        __class__.in_flight_metric.inc()
 
-                __class__.processing_metric.labels(status="error").inc()
+        try:
+
+            with __class__.request_metric.time():
+                resp = self.handle(msg)
+
+            # Acknowledge successful processing of the message
+            self.consumer.acknowledge(msg)
+
+            __class__.processing_metric.labels(status="success").inc()
+
+        except TooManyRequests:
+            self.consumer.negative_acknowledge(msg)
+            print("TooManyRequests: will retry")
+            __class__.processing_metric.labels(status="rate-limit").inc()
+            time.sleep(5)
+
+        except Exception as e:
+
+            print("Exception:", e, flush=True)
+
+            # Message failed to be processed
+            self.consumer.negative_acknowledge(msg)
+
+            __class__.processing_metric.labels(status="error").inc()
+
+        finally:
+            __class__.in_flight_metric.dec()
 
     def send(self, msg, properties={}):
         self.producer.send(msg, properties)
@@ -137,3 +215,14 @@ class ConsumerProducer(BaseProcessor):
             help=f'Output queue (default: {default_output_queue})'
         )
 
+    # Only for processors which set concurrent
+    @staticmethod
+    def add_concurrency_args(parser):
+
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help=f'Number of messages handled concurrently, in threads sharing the processor, so handle() must be thread-safe (default: 1)'
+        )
+
@@ -0,0 +1,160 @@
+
+from prometheus_client import Counter
+from array import array
+import hashlib
+import sqlite3
+import threading
+import time
+
+# Persistent, content-addressed embeddings cache.  Vectors are stored in a
+# local SQLite database keyed by model name and the SHA-256 of the text, so
+# re-processing a corpus only pays for new or changed text.  The number of
+# entries is bounded, least-recently-used entries are evicted first.
+class EmbeddingsCache:
+
+    def __init__(self, path, max_size=1000000):
+
+        if not hasattr(__class__, "lookup_metric"):
+            __class__.lookup_metric = Counter(
+                'embeddings_cache_count', 'Embeddings cache lookups',
+                ["model", "result"]
+            )
+
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+
+        self.db.execute("""
+            create table if not exists embeddings (
+                model text,
+                hash text,
+                vector blob,
+                used real,
+                primary key (model, hash)
+            )
+        """)
+
+        self.db.execute("""
+            create index if not exists embeddings_used
+                on embeddings (used)
+        """)
+
+        self.db.commit()
+
+        # Row count, tracked so that puts don't need to count the table.
+        # Rows replaced by a put are counted again, so this can overcount,
+        # and the table is only counted for real when eviction looks due.
+        self.count = self.db.execute(
+            "select count(*) from embeddings"
+        ).fetchone()[0]
+
+        # Eviction frees this many rows beyond the bound, so that it isn't
+        # needed again on the next put
+        self.headroom = max(1, max_size // 100)
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # Returns a list with a vector, or None on a miss, for each text
+    def get_many(self, model, texts):
+
+        hashes = [ self.digest(text) for text in texts ]
+
+        found = {}
+
+        with self.lock:
+
+            for hash in set(hashes):
+
+                row = self.db.execute(
+                    "select vector from embeddings where model = ? and hash = ?",
+                    (model, hash)
+                ).fetchone()
+
+                if row is not None:
+                    found[hash] = array("d", row[0]).tolist()
+
+            if found:
+                now = time.time()
+                self.db.executemany(
+                    "update embeddings set used = ? where model = ? and hash = ?",
+                    [ (now, model, hash) for hash in found ]
+                )
+                self.db.commit()
+
+        hits = sum(1 for hash in hashes if hash in found)
+
+        __class__.lookup_metric.labels(model=model, result="hit").inc(hits)
+        __class__.lookup_metric.labels(
+            model=model, result="miss"
+        ).inc(len(hashes) - hits)
+
+        return [ found.get(hash) for hash in hashes ]
+
+    def put_many(self, model, texts, vectors):
+
+        now = time.time()
+
+        rows = [
+            (model, self.digest(text), array("d", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self.lock:
+
+            self.db.executemany(
+                "insert or replace into embeddings (model, hash, vector, used) values (?, ?, ?, ?)",
+                rows
+            )
+
+            self.count += len(rows)
+
+            if self.count > self.max_size:
+
+                self.count = self.db.execute(
+                    "select count(*) from embeddings"
+                ).fetchone()[0]
+
+                excess = self.count - self.max_size
+
+                if excess > 0:
+                    cursor = self.db.execute("""
+                        delete from embeddings where rowid in (
+                            select rowid from embeddings order by used limit ?
+                        )
+                    """, (excess + self.headroom,))
+                    self.count -= cursor.rowcount
+
+            self.db.commit()
+
+    # Embeds texts using the embed function, only passing it texts which
+    # are not already cached
+    def embed(self, model, texts, fn):
+
+        vectors = self.get_many(model, texts)
+
+        missing = [
+            i for i, vector in enumerate(vectors)
+            if vector is None
+        ]
+
+        if missing:
+
+            # The same text may appear more than once in a batch
+            todo = list(dict.fromkeys(texts[i] for i in missing))
+
+            embeds = dict(zip(todo, fn(todo)))
+
+            self.put_many(model, todo, [ embeds[text] for text in todo ])
+
+            for i in missing:
+                vectors[i] = embeds[texts[i]]
+
+        return vectors
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
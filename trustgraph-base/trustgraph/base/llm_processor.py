@@ -0,0 +1,234 @@
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from . consumer_producer import ConsumerProducer
+from . rate_limiter import RateLimiter, AdaptiveConcurrency
+from . rate_limiter import MemoryBucketStore, SqliteBucketStore
+from .. exceptions import TooManyRequests
+from .. schema import TextCompletionResponse, Error
+
+default_requests_per_minute = 0
+default_tokens_per_minute = 0
+
+# Base for text-completion processors.  Each request is admitted by a
+# rate limiter on requests and tokens per minute, and requests are
+# handled with an adaptive concurrency limit of at most --concurrency.
+# Token usage is taken from the in_token / out_token counts of the
+# responses a handler sends.  A handler raises TooManyRequests when the
+# provider rate limits a request: the message is redelivered, the
+# concurrency limit is cut and the rate limit buckets are emptied,
+# rather than stalling the consumer.  If part of a streamed response has
+# already been sent, redelivery would send it again, so the request fails
+# with an error response instead.
+class LlmProcessor(ConsumerProducer):
+
+    concurrent = True
+
+    def __init__(self, **params):
+
+        requests_per_minute = params.get(
+            "requests_per_minute", default_requests_per_minute
+        )
+        tokens_per_minute = params.get(
+            "tokens_per_minute", default_tokens_per_minute
+        )
+        rate_limit_store = params.get("rate_limit_store", None)
+        rate_limit_key = params.get("rate_limit_key", None)
+
+        super(LlmProcessor, self).__init__(**params)
+
+        if rate_limit_key is None:
+            rate_limit_key = params.get("subscriber")
+
+        if rate_limit_store:
+            store = SqliteBucketStore(rate_limit_store)
+        else:
+            store = MemoryBucketStore()
+
+        self.limiter = RateLimiter(
+            store, rate_limit_key,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+
+        self.adaptive = AdaptiveConcurrency(self.concurrency)
+
+        # Average output tokens per request, used in estimates, updated by
+        # every worker thread
+        self.output_estimate = 0
+        self.output_lock = threading.Lock()
+
+        # Tokens reported by the responses sent for the request each
+        # thread is handling, and whether any of them were stream chunks
+        self.usage = threading.local()
+
+    def estimate(self, v):
+
+        # Roughly four characters per token
+        chars = len(v.system or "") + len(v.prompt or "")
+
+        return chars // 4 + int(self.output_estimate)
+
+    def run(self):
+
+        __class__.state_metric.state('running')
+
+        def worker(msg):
+            throttled = False
+            try:
+                throttled = not self.process(msg)
+            finally:
+                self.adaptive.release(throttled)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            while True:
+
+                self.adaptive.acquire()
+
+                try:
+                    msg = self.consumer.receive()
+                except:
+                    self.adaptive.release()
+                    raise
+
+                try:
+                    executor.submit(worker, msg)
+                except:
+                    self.adaptive.release()
+                    raise
+
+    # Returns False if the request was rate limited by the provider
+    def process(self, msg):
+
+        __class__.in_flight_metric.inc()
+
+        estimate = self.estimate(msg.value())
+
+        self.usage.tokens = 0
+        self.usage.output = None
+        self.usage.streamed = False
+
+        try:
+
+            self.limiter.acquire(estimate)
+
+            with __class__.request_metric.time():
+                self.handle(msg)
+
+            # Acknowledge successful processing of the message
+            self.consumer.acknowledge(msg)
+
+            __class__.processing_metric.labels(status="success").inc()
+
+            return True
+
+        except TooManyRequests:
+
+            __class__.processing_metric.labels(status="rate-limit").inc()
+
+            self.limiter.throttled()
+
+            if self.usage.streamed:
+
+                print("TooManyRequests: part streamed, failing", flush=True)
+
+                r = TextCompletionResponse(
+                    error=Error(
+                        type = "llm-error",
+                        message = "Rate limited part way through response",
+                    ),
+                    response=None,
+                    in_token=None,
+                    out_token=None,
+                    model=None,
+                    end_of_stream=True,
+                )
+
+                self.producer.send(
+                    r, properties={"id": msg.properties()["id"]}
+                )
+
+                self.consumer.acknowledge(msg)
+
+                return False
+
+            print("TooManyRequests: will retry", flush=True)
+
+            self.consumer.negative_acknowledge(msg)
+
+            return False
+
+        except Exception as e:
+
+            print("Exception:", e, flush=True)
+
+            # Message failed to be processed
+            self.consumer.negative_acknowledge(msg)
+
+            __class__.processing_metric.labels(status="error").inc()
+
+            return True
+
+        finally:
+
+            __class__.in_flight_metric.dec()
+
+            self.limiter.settle(estimate, self.usage.tokens)
+
+            if self.usage.output is not None:
+                with self.output_lock:
+                    self.output_estimate = (
+                        0.9 * self.output_estimate + 0.1 * self.usage.output
+                    )
+
+    def send(self, msg, properties={}):
+
+        super(LlmProcessor, self).send(msg, properties)
+
+        if msg.end_of_stream is False:
+            self.usage.streamed = True
+
+        if msg.in_token is not None or msg.out_token is not None:
+            self.usage.tokens += (msg.in_token or 0) + (msg.out_token or 0)
+            self.usage.output = msg.out_token or 0
+
+    @staticmethod
+    def add_args(
+            parser, default_input_queue, default_subscriber,
+            default_output_queue,
+    ):
+
+        ConsumerProducer.add_args(
+            parser, default_input_queue, default_subscriber,
+            default_output_queue,
+        )
+
+        ConsumerProducer.add_concurrency_args(parser)
+
+        parser.add_argument(
+            '--requests-per-minute',
+            type=int,
+            default=default_requests_per_minute,
+            help=f'Request rate limit, 0 for none (default: {default_requests_per_minute})'
+        )
+
+        parser.add_argument(
+            '--tokens-per-minute',
+            type=int,
+            default=default_tokens_per_minute,
+            help=f'Token rate limit, 0 for none (default: {default_tokens_per_minute})'
+        )
+
+        parser.add_argument(
+            '--rate-limit-store',
+            default=None,
+            help=f'SQLite database holding rate limit state, shared by replicas (default: in memory)'
+        )
+
+        parser.add_argument(
+            '--rate-limit-key',
+            default=None,
+            help=f'Rate limit bucket name, shared by processors using the same quota (default: subscriber name)'
+        )
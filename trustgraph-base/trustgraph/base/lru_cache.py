@@ -0,0 +1,71 @@
+
+from collections import OrderedDict
+from prometheus_client import Counter
+import threading
+import time
+
+# Thread-safe LRU cache with a size bound and an optional time-to-live,
+# in seconds, on entries.  Hits and misses are counted in a Prometheus
+# metric labelled with the cache name.
+class LruCache:
+
+    def __init__(self, name, max_size=10000, ttl=None):
+
+        if not hasattr(__class__, "lookup_metric"):
+            __class__.lookup_metric = Counter(
+                'cache_lookup_count', 'Cache lookups',
+                ["cache", "result"]
+            )
+
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+
+        with self.lock:
+
+            if key in self.items:
+
+                value, expiry = self.items[key]
+
+                if expiry is None or expiry > time.time():
+                    self.items.move_to_end(key)
+                    __class__.lookup_metric.labels(
+                        cache=self.name, result="hit"
+                    ).inc()
+                    return value
+
+                del self.items[key]
+
+        __class__.lookup_metric.labels(cache=self.name, result="miss").inc()
+
+        return default
+
+    def put(self, key, value):
+
+        if self.ttl:
+            expiry = time.time() + self.ttl
+        else:
+            expiry = None
+
+        with self.lock:
+
+            self.items[key] = (value, expiry)
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            if key not in self.items: return False
+            value, expiry = self.items[key]
+            return expiry is None or expiry > time.time()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.items)
+
@@ -0,0 +1,14 @@
+
+import uuid
+
+# Deterministic IDs for points written to vector stores, derived from what
+# a point holds and where it came from.  Re-processing a message, e.g. on
+# redelivery, then overwrites its points rather than adding duplicates.
+# Parts must tell apart every point which should be kept: metadata IDs are
+# document IDs, shared by all of a document's chunks, so graph embeddings
+# also include the vector, which differs between chunks.
+def point_id(*parts):
+    return str(uuid.uuid5(
+        uuid.NAMESPACE_URL,
+        "\n".join(str(part) for part in parts)
+    ))
@@ -0,0 +1,273 @@
+
+from prometheus_client import Histogram, Gauge
+import threading
+import sqlite3
+import time
+
+# Token bucket state for a single process.  A store holds a level for each
+# bucket key, which refills at rate per second up to capacity.  Levels can
+# go negative, which is how usage above an estimate is charged after the
+# event.
+class MemoryBucketStore:
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def refill(level, updated, rate, capacity, now):
+        return min(capacity, level + (now - updated) * rate)
+
+    # Takes amount from each bucket, given as a list of (key, amount, rate,
+    # capacity), all or nothing.  Returns 0 if taken, otherwise the time in
+    # seconds until there will be enough.  With force, the amounts are
+    # taken regardless.
+    def take(self, buckets, force=False):
+
+        with self.lock:
+
+            now = time.time()
+
+            levels = {}
+
+            for key, amount, rate, capacity in buckets:
+                level, updated = self.buckets.get(key, (capacity, now))
+                levels[key] = self.refill(level, updated, rate, capacity, now)
+
+            wait = wait_time(buckets, levels)
+
+            if wait > 0 and not force: return wait
+
+            for key, amount, rate, capacity in buckets:
+                self.buckets[key] = (levels[key] - amount, now)
+
+            return 0
+
+    # Empties a bucket, leaving any debt in place
+    def drain(self, key, rate, capacity):
+
+        with self.lock:
+
+            now = time.time()
+
+            level, updated = self.buckets.get(key, (capacity, now))
+            level = self.refill(level, updated, rate, capacity, now)
+
+            self.buckets[key] = (min(level, 0), now)
+
+# Token bucket state in a SQLite database, so that replicas on a host, or
+# sharing a volume, draw from the same buckets.  Updates are made in
+# immediate transactions, which serialise them across processes.
+class SqliteBucketStore:
+
+    def __init__(self, path):
+
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None,
+            timeout=30,
+        )
+
+        self.db.execute("""
+            create table if not exists buckets (
+                key text primary key,
+                level real,
+                updated real
+            )
+        """)
+
+    def get(self, key, rate, capacity, now):
+
+        row = self.db.execute(
+            "select level, updated from buckets where key = ?", (key,)
+        ).fetchone()
+
+        if row is None: return capacity
+
+        level, updated = row
+
+        return MemoryBucketStore.refill(level, updated, rate, capacity, now)
+
+    def put(self, key, level, now):
+        self.db.execute(
+            "insert or replace into buckets (key, level, updated) values (?, ?, ?)",
+            (key, level, now)
+        )
+
+    def take(self, buckets, force=False):
+
+        with self.lock:
+
+            self.db.execute("begin immediate")
+
+            try:
+
+                now = time.time()
+
+                levels = {
+                    key: self.get(key, rate, capacity, now)
+                    for key, amount, rate, capacity in buckets
+                }
+
+                wait = wait_time(buckets, levels)
+
+                if wait == 0 or force:
+                    for key, amount, rate, capacity in buckets:
+                        self.put(key, levels[key] - amount, now)
+                    wait = 0
+
+                self.db.execute("commit")
+
+            except:
+                self.db.execute("rollback")
+                raise
+
+            return wait
+
+    def drain(self, key, rate, capacity):
+
+        with self.lock:
+
+            self.db.execute("begin immediate")
+
+            try:
+                now = time.time()
+                level = self.get(key, rate, capacity, now)
+                self.put(key, min(level, 0), now)
+                self.db.execute("commit")
+            except:
+                self.db.execute("rollback")
+                raise
+
+# Time until every bucket holds its amount.  An amount larger than the
+# bucket's capacity only needs a full bucket, otherwise it could never be
+# taken.
+def wait_time(buckets, levels):
+
+    wait = 0
+
+    for key, amount, rate, capacity in buckets:
+
+        needed = min(amount, capacity) - levels[key]
+
+        if needed > 0:
+            wait = max(wait, needed / rate)
+
+    return wait
+
+# Proactive rate limiting on requests per minute and tokens per minute.
+# Token counts aren't known until a request completes, so acquire() takes
+# an estimate, and settle() charges the difference once the actual count
+# is known.  A limit of 0 is unlimited.  On a rate limit error from the
+# provider, throttled() empties the buckets so that every replica sharing
+# the store backs off.
+class RateLimiter:
+
+    def __init__(
+            self, store, key, requests_per_minute=0, tokens_per_minute=0,
+    ):
+
+        if not hasattr(__class__, "wait_metric"):
+            __class__.wait_metric = Histogram(
+                'rate_limit_wait', 'Time waiting for rate limit (seconds)',
+                buckets=[
+                    0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0,
+                    60.0,
+                ]
+            )
+
+        self.store = store
+
+        self.limits = {}
+
+        if requests_per_minute:
+            self.limits["requests"] = (
+                key + "#requests", requests_per_minute / 60,
+                requests_per_minute
+            )
+
+        if tokens_per_minute:
+            self.limits["tokens"] = (
+                key + "#tokens", tokens_per_minute / 60, tokens_per_minute
+            )
+
+    def buckets(self, requests, tokens):
+
+        amounts = { "requests": requests, "tokens": tokens }
+
+        return [
+            (key, amounts[kind], rate, capacity)
+            for kind, (key, rate, capacity) in self.limits.items()
+            if amounts[kind] != 0
+        ]
+
+    def acquire(self, tokens):
+
+        if not self.limits: return
+
+        start = time.time()
+
+        while True:
+
+            wait = self.store.take(self.buckets(1, tokens))
+
+            if wait == 0: break
+
+            time.sleep(min(wait, 5))
+
+        __class__.wait_metric.observe(time.time() - start)
+
+    def settle(self, estimate, actual):
+
+        if not self.limits: return
+
+        if actual == estimate: return
+
+        self.store.take(self.buckets(0, actual - estimate), force=True)
+
+    def throttled(self):
+
+        for key, rate, capacity in self.limits.values():
+            self.store.drain(key, rate, capacity)
+
+# Additive-increase, multiplicative-decrease concurrency limit.  Each
+# success raises the limit by 1/limit, so it grows by about one per
+# round of requests, and each rate limit error halves it.
+class AdaptiveConcurrency:
+
+    def __init__(self, max_limit, min_limit=1):
+
+        if not hasattr(__class__, "limit_metric"):
+            __class__.limit_metric = Gauge(
+                'concurrency_limit', 'Adaptive concurrency limit'
+            )
+
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.active = 0
+        self.cond = threading.Condition()
+
+        __class__.limit_metric.set(self.limit)
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+
+        with self.cond:
+
+            self.active -= 1
+
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            __class__.limit_metric.set(self.limit)
+
+            self.cond.notify_all()
@@ -0,0 +1,20 @@
+
+import pulsar
+
+# Reads the messages published on a topic since start, a time in seconds,
+# up to the end of the topic.  Yields message values.
+def read_since(client, topic, schema, start):
+
+    reader = client.create_reader(
+        topic, pulsar.MessageId.earliest, schema=schema,
+    )
+
+    try:
+
+        reader.seek(int(start * 1000))
+
+        while reader.has_message_available():
+            yield reader.read_next().value()
+
+    finally:
+        reader.close()
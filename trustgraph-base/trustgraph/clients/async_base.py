@@ -0,0 +1,186 @@
+
+import pulsar
+import _pulsar
+import asyncio
+import threading
+import uuid
+from functools import partial
+from pulsar.schema import JsonSchema
+
+from . base import raise_error, DEFAULT_TIMEOUT
+
+# Ugly
+ERROR=_pulsar.LoggerLevel.Error
+WARN=_pulsar.LoggerLevel.Warn
+INFO=_pulsar.LoggerLevel.Info
+DEBUG=_pulsar.LoggerLevel.Debug
+
+def on_message(pending, lock, consumer, msg):
+
+    # Runs on a Pulsar listener thread, hands the response to the event
+    # loop of whoever made the request
+    consumer.acknowledge(msg)
+
+    try:
+        mid = msg.properties()["id"]
+    except KeyError:
+        return
+
+    with lock:
+        entry = pending.get(mid)
+
+    # Ignore messages with an ID no-one is waiting for
+    if entry is None: return
+
+    loop, q = entry
+
+    try:
+        loop.call_soon_threadsafe(q.put_nowait, msg.value())
+    except RuntimeError:
+        # Event loop closed
+        pass
+
+def set_result(fut, res):
+    # Runs on the event loop thread
+    if fut.done(): return
+    if res == pulsar.Result.Ok:
+        fut.set_result(None)
+    else:
+        fut.set_exception(RuntimeError(f"Send failed: {res}"))
+
+# asyncio counterpart of BaseClient.  Requests are sent with the producer's
+# async send, and responses are delivered by a Pulsar message listener to a
+# per-request asyncio queue keyed by request ID, so no thread blocks waiting
+# on a response.  Pass client to share one Pulsar connection between many
+# async clients.
+class AsyncBaseClient:
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            input_schema=None,
+            output_schema=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None: raise RuntimeError("Need input_queue")
+        if output_queue == None: raise RuntimeError("Need output_queue")
+        if input_schema == None: raise RuntimeError("Need input_schema")
+        if output_schema == None: raise RuntimeError("Need output_schema")
+
+        if subscriber == None:
+            subscriber = str(uuid.uuid4())
+
+        if client is None:
+            self.client = pulsar.Client(
+                pulsar_host,
+                logger=pulsar.ConsoleLogger(log_level),
+            )
+            self.own_client = True
+        else:
+            self.client = client
+            self.own_client = False
+
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+        self.producer = self.client.create_producer(
+            topic=input_queue,
+            schema=JsonSchema(input_schema),
+            chunking_enabled=True,
+        )
+
+        # The listener doesn't hold a reference to self, so that __del__
+        # still runs
+        self.consumer = self.client.subscribe(
+            output_queue, subscriber,
+            schema=JsonSchema(output_schema),
+            message_listener=partial(
+                on_message, self.pending, self.pending_lock
+            ),
+        )
+
+        self.input_schema = input_schema
+        self.output_schema = output_schema
+
+    async def send(self, id, r):
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def callback(res, msg_id):
+            loop.call_soon_threadsafe(set_result, fut, res)
+
+        self.producer.send_async(r, callback, properties={ "id": id })
+
+        await fut
+
+    async def wait(self, q, inspect):
+
+        while True:
+
+            value = await q.get()
+
+            if value.error:
+                raise_error(value.error)
+
+            complete = inspect(value)
+
+            if not complete: continue
+
+            return value
+
+    async def call(self, **args):
+
+        timeout = args.get("timeout", DEFAULT_TIMEOUT)
+        inspect = args.get("inspect", lambda x: True)
+
+        if "timeout" in args:
+            del args["timeout"]
+
+        if "inspect" in args:
+            del args["inspect"]
+
+        id = str(uuid.uuid4())
+
+        r = self.input_schema(**args)
+
+        q = asyncio.Queue()
+
+        with self.pending_lock:
+            self.pending[id] = (asyncio.get_running_loop(), q)
+
+        try:
+
+            await self.send(id, r)
+
+            return await asyncio.wait_for(self.wait(q, inspect), timeout)
+
+        except asyncio.TimeoutError:
+            raise TimeoutError("Timed out waiting for response")
+
+        finally:
+            with self.pending_lock:
+                del self.pending[id]
+
+    def close(self):
+
+        if hasattr(self, "consumer"):
+            self.consumer.close()
+            del self.consumer
+
+        if hasattr(self, "producer"):
+            self.producer.flush()
+            self.producer.close()
+            del self.producer
+
+        if hasattr(self, "client") and getattr(self, "own_client", False):
+            self.client.close()
+            del self.client
+
+    def __del__(self):
+        self.close()
+
@@ -4,6 +4,8 @@ import _pulsar
 import hashlib
 import uuid
 import time
+import queue
+import threading
 from pulsar.schema import JsonSchema
 
 from .. exceptions import *
@@ -17,6 +19,20 @@ WARN=_pulsar.LoggerLevel.Warn
 INFO=_pulsar.LoggerLevel.Info
 DEBUG=_pulsar.LoggerLevel.Debug
 
+def raise_error(error):
+
+    if error.type == "llm-error":
+        raise LlmError(error.message)
+
+    elif error.type == "too-many-requests":
+        raise TooManyRequests(error.message)
+
+    elif error.type == "ParseError":
+        raise ParseError(error.message)
+
+    else:
+        raise RuntimeError(f"{error.type}: {error.message}")
+
 class BaseClient:
 
     def __init__(
@@ -56,6 +72,55 @@ class BaseClient:
         self.input_schema = input_schema
         self.output_schema = output_schema
 
+        # Responses are demultiplexed by a single background receiver onto
+        # a per-request queue, keyed by the request ID.  This means one
+        # client can be shared by many threads making concurrent calls.
+        # The receiver doesn't hold a reference to self, so that __del__
+        # still runs.
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.running = threading.Event()
+        self.running.set()
+
+        self.receiver = threading.Thread(
+            target=BaseClient.receive_loop,
+            args=(
+                self.consumer, self.pending, self.pending_lock, self.running
+            ),
+            daemon=True,
+        )
+        self.receiver.start()
+
+    @staticmethod
+    def receive_loop(consumer, pending, lock, running):
+
+        while running.is_set():
+
+            try:
+                msg = consumer.receive(timeout_millis=2500)
+            except pulsar.exceptions.Timeout:
+                continue
+            except Exception as e:
+                if not running.is_set(): return
+                print("Receive exception:", e, flush=True)
+                time.sleep(1)
+                continue
+
+            consumer.acknowledge(msg)
+
+            try:
+                mid = msg.properties()["id"]
+            except KeyError:
+                continue
+
+            with lock:
+                q = pending.get(mid)
+
+            # Ignore messages with an ID no-one is waiting for
+            if q is None: continue
+
+            q.put(msg.value())
+
     def call(self, **args):
 
         timeout = args.get("timeout", DEFAULT_TIMEOUT)
@@ -73,55 +138,48 @@ class BaseClient:
 
         end_time = time.time() + timeout
 
-        self.producer.send(r, properties={ "id": id })
-
-        while time.time() < end_time:
-
-            try:
-                msg = self.consumer.receive(timeout_millis=2500)
-            except pulsar.exceptions.Timeout:
-                continue
-
-            mid = msg.properties()["id"]
+        q = queue.Queue()
 
-            if mid == id:
+        with self.pending_lock:
+            self.pending[id] = q
 
-                value = msg.value()
-
-                if value.error:
+        try:
 
-                    self.consumer.acknowledge(msg)
+            self.producer.send(r, properties={ "id": id })
 
-                    if value.error.type == "llm-error":
-                        raise LlmError(value.error.message)
+            while True:
 
-                    elif value.error.type == "too-many-requests":
-                        raise TooManyRequests(value.error.message)
+                remaining = end_time - time.time()
 
-                    elif value.error.type == "ParseError":
-                        raise ParseError(value.error.message)
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for response")
 
-                    else:
+                try:
+                    value = q.get(timeout=remaining)
+                except queue.Empty:
+                    continue
 
-                        raise RuntimeError(
-                            f"{value.error.type}: {value.error.message}"
-                        )
+                if value.error:
+                    raise_error(value.error)
 
                 complete = inspect(value)
 
                 if not complete: continue
 
-                resp = msg.value()
-                self.consumer.acknowledge(msg)
-                return resp
-
-            # Ignore messages with wrong ID
-            self.consumer.acknowledge(msg)
+                return value
 
-        raise TimeoutError("Timed out waiting for response")
+        finally:
+            with self.pending_lock:
+                del self.pending[id]
 
     def __del__(self):
 
+        if hasattr(self, "running"):
+            self.running.clear()
+
+        if hasattr(self, "receiver"):
+            self.receiver.join()
+
         if hasattr(self, "consumer"):
             self.consumer.close()
             
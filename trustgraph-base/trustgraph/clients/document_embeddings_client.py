@@ -5,6 +5,7 @@ from .. schema import DocumentEmbeddingsRequest, DocumentEmbeddingsResponse
 from .. schema import document_embeddings_request_queue
 from .. schema import document_embeddings_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -43,3 +44,36 @@ class DocumentEmbeddingsClient(BaseClient):
             vectors=vectors, limit=limit, timeout=timeout
         ).documents
 
+class AsyncDocumentEmbeddingsClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = document_embeddings_request_queue
+
+        if output_queue == None:
+            output_queue = document_embeddings_response_queue
+
+        super(AsyncDocumentEmbeddingsClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=DocumentEmbeddingsRequest,
+            output_schema=DocumentEmbeddingsResponse,
+            client=client,
+        )
+
+    async def request(self, vectors, limit=10, timeout=300):
+        return (await self.call(
+            vectors=vectors, limit=limit, timeout=timeout
+        )).documents
+
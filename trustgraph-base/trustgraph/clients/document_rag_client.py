@@ -4,6 +4,7 @@ import _pulsar
 from .. schema import DocumentRagQuery, DocumentRagResponse
 from .. schema import document_rag_request_queue, document_rag_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -44,3 +45,37 @@ class DocumentRagClient(BaseClient):
             query=query, timeout=timeout
         ).response
 
+class AsyncDocumentRagClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = document_rag_request_queue
+
+        if output_queue == None:
+            output_queue = document_rag_response_queue
+
+        super(AsyncDocumentRagClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=DocumentRagQuery,
+            output_schema=DocumentRagResponse,
+            client=client,
+        )
+
+    async def request(self, query, timeout=300):
+
+        return (await self.call(
+            query=query, timeout=timeout
+        )).response
+
@@ -3,6 +3,7 @@ from pulsar.schema import JsonSchema
 from .. schema import EmbeddingsRequest, EmbeddingsResponse
 from .. schema import embeddings_request_queue, embeddings_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 import _pulsar
 
@@ -41,4 +42,48 @@ class EmbeddingsClient(BaseClient):
     def request(self, text, timeout=300):
         return self.call(text=text, timeout=timeout).vectors
 
+    # Embeds many texts in one request, returns a list of vectors lists,
+    # one per text
+    def request_batch(self, texts, timeout=300):
+        return [
+            r.vectors
+            for r in self.call(texts=texts, timeout=timeout).results
+        ]
+
+class AsyncEmbeddingsClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = embeddings_request_queue
+
+        if output_queue == None:
+            output_queue = embeddings_response_queue
+
+        super(AsyncEmbeddingsClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=EmbeddingsRequest,
+            output_schema=EmbeddingsResponse,
+            client=client,
+        )
+
+    async def request(self, text, timeout=300):
+        return (await self.call(text=text, timeout=timeout)).vectors
+
+    async def request_batch(self, texts, timeout=300):
+        return [
+            r.vectors
+            for r in (await self.call(texts=texts, timeout=timeout)).results
+        ]
 
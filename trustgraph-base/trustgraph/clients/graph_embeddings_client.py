@@ -5,6 +5,7 @@ from .. schema import GraphEmbeddingsRequest, GraphEmbeddingsResponse
 from .. schema import graph_embeddings_request_queue
 from .. schema import graph_embeddings_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -47,3 +48,40 @@ class GraphEmbeddingsClient(BaseClient):
             vectors=vectors, limit=limit, timeout=timeout
         ).entities
 
+class AsyncGraphEmbeddingsClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = graph_embeddings_request_queue
+
+        if output_queue == None:
+            output_queue = graph_embeddings_response_queue
+
+        super(AsyncGraphEmbeddingsClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=GraphEmbeddingsRequest,
+            output_schema=GraphEmbeddingsResponse,
+            client=client,
+        )
+
+    async def request(
+            self, vectors, user="trustgraph", collection="default",
+            limit=10, timeout=300
+    ):
+        return (await self.call(
+            user=user, collection=collection,
+            vectors=vectors, limit=limit, timeout=timeout
+        )).entities
+
@@ -4,6 +4,7 @@ import _pulsar
 from .. schema import GraphRagQuery, GraphRagResponse
 from .. schema import graph_rag_request_queue, graph_rag_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -47,3 +48,40 @@ class GraphRagClient(BaseClient):
             user=user, collection=collection, query=query, timeout=timeout
         ).response
 
+class AsyncGraphRagClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = graph_rag_request_queue
+
+        if output_queue == None:
+            output_queue = graph_rag_response_queue
+
+        super(AsyncGraphRagClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=GraphRagQuery,
+            output_schema=GraphRagResponse,
+            client=client,
+        )
+
+    async def request(
+            self, query, user="trustgraph", collection="default",
+            timeout=500
+    ):
+
+        return (await self.call(
+            user=user, collection=collection, query=query, timeout=timeout
+        )).response
+
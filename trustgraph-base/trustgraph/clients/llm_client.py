@@ -5,6 +5,7 @@ from .. schema import TextCompletionRequest, TextCompletionResponse
 from .. schema import text_completion_request_queue
 from .. schema import text_completion_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -35,8 +36,86 @@ class LlmClient(BaseClient):
             output_schema=TextCompletionResponse,
         )
 
-    def request(self, system, prompt, timeout=300):
-        return self.call(
-            system=system, prompt=prompt, timeout=timeout
-        ).response
+    # If chunk is given, the response is streamed and chunk is called with
+    # each part of the text as it arrives.  The whole text is returned.
+    # prefix_length marks a stable prefix of the prompt which can be
+    # cached, see TextCompletionRequest.
+    def request(
+            self, system, prompt, chunk=None, prefix_length=None, timeout=300
+    ):
+
+        if chunk is None:
+            return self.call(
+                system=system, prompt=prompt, prefix_length=prefix_length,
+                timeout=timeout
+            ).response
+
+        parts = []
+
+        def inspect(x):
+
+            if x.response:
+                parts.append(x.response)
+                chunk(x.response)
+
+            return x.end_of_stream is not False
+
+        self.call(
+            system=system, prompt=prompt, streaming=True,
+            prefix_length=prefix_length, inspect=inspect, timeout=timeout
+        )
+
+        return "".join(parts)
+
+class AsyncLlmClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue is None: input_queue = text_completion_request_queue
+        if output_queue is None: output_queue = text_completion_response_queue
+
+        super(AsyncLlmClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=TextCompletionRequest,
+            output_schema=TextCompletionResponse,
+            client=client,
+        )
+
+    async def request(
+            self, system, prompt, chunk=None, prefix_length=None, timeout=300
+    ):
+
+        if chunk is None:
+            return (await self.call(
+                system=system, prompt=prompt, prefix_length=prefix_length,
+                timeout=timeout
+            )).response
+
+        parts = []
+
+        def inspect(x):
+
+            if x.response:
+                parts.append(x.response)
+                chunk(x.response)
+
+            return x.end_of_stream is not False
+
+        await self.call(
+            system=system, prompt=prompt, streaming=True,
+            prefix_length=prefix_length, inspect=inspect, timeout=timeout
+        )
+
+        return "".join(parts)
 
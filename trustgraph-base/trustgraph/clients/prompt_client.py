@@ -7,6 +7,7 @@ from .. schema import PromptRequest, PromptResponse
 from .. schema import prompt_request_queue
 from .. schema import prompt_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -31,6 +32,61 @@ class Topic:
     name: str
     definition: str
 
+def to_terms(variables):
+    return {
+        k: json.dumps(v)
+        for k, v in variables.items()
+    }
+
+def from_response(resp):
+
+    if resp.text: return resp.text
+
+    return json.loads(resp.object)
+
+def to_definitions(defs):
+    return [
+        Definition(name=d["entity"], definition=d["definition"])
+        for d in defs
+    ]
+
+def to_relationships(rels):
+    return [
+        Relationship(
+            s=d["subject"],
+            p=d["predicate"],
+            o=d["object"],
+            o_entity=d["object-entity"]
+        )
+        for d in rels
+    ]
+
+def to_topics(topics):
+    return [
+        Topic(name=d["topic"], definition=d["definition"])
+        for d in topics
+    ]
+
+def row_schema(schema):
+    return {
+        "name": schema.name,
+        "description": schema.description,
+        "fields": [
+            {
+                "name": f.name, "type": str(f.type),
+                "size": f.size, "primary": f.primary,
+                "description": f.description,
+            }
+            for f in schema.fields
+        ]
+    }
+
+def knowledge(kg):
+    return [
+        { "s": v[0], "p": v[1], "o": v[2] }
+        for v in kg
+    ]
+
 class PromptClient(BaseClient):
 
     def __init__(
@@ -61,16 +117,11 @@ class PromptClient(BaseClient):
 
         resp = self.call(
             id=id,
-            terms={
-                k: json.dumps(v)
-                for k, v in variables.items()
-            },
+            terms=to_terms(variables),
             timeout=timeout
         )
 
-        if resp.text: return resp.text
-
-        return json.loads(resp.object)
+        return from_response(resp)
 
     def request_definitions(self, chunk, timeout=300):
 
@@ -82,10 +133,7 @@ class PromptClient(BaseClient):
             timeout=timeout
         )
 
-        return [
-            Definition(name=d["entity"], definition=d["definition"])
-            for d in defs
-        ]
+        return to_definitions(defs)
 
     def request_relationships(self, chunk, timeout=300):
 
@@ -97,15 +145,7 @@ class PromptClient(BaseClient):
             timeout=timeout
         )
 
-        return [
-            Relationship(
-                s=d["subject"],
-                p=d["predicate"],
-                o=d["object"],
-                o_entity=d["object-entity"]
-            )
-            for d in rels
-        ]
+        return to_relationships(rels)
 
     def request_topics(self, chunk, timeout=300):
 
@@ -117,10 +157,7 @@ class PromptClient(BaseClient):
             timeout=timeout
         )
         
-        return [
-            Topic(name=d["topic"], definition=d["definition"])
-            for d in topics
-        ]
+        return to_topics(topics)
 
     def request_rows(self, schema, chunk, timeout=300):
 
@@ -128,18 +165,7 @@ class PromptClient(BaseClient):
             id="extract-rows",
             variables={
                 "chunk": chunk,
-                "row-schema": {
-                    "name": schema.name,
-                    "description": schema.description,
-                    "fields": [
-                        {
-                            "name": f.name, "type": str(f.type),
-                            "size": f.size, "primary": f.primary,
-                            "description": f.description,
-                        }
-                        for f in schema.fields
-                    ]
-                }
+                "row-schema": row_schema(schema),
             },
             timeout=timeout
         )
@@ -150,10 +176,7 @@ class PromptClient(BaseClient):
             id="kg-prompt",
             variables={
                 "query": query,
-                "knowledge": [
-                    { "s": v[0], "p": v[1], "o": v[2] }
-                    for v in kg
-                ]
+                "knowledge": knowledge(kg),
             },
             timeout=timeout
         )
@@ -169,4 +192,110 @@ class PromptClient(BaseClient):
             timeout=timeout
         )
 
+class AsyncPromptClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = prompt_request_queue
+
+        if output_queue == None:
+            output_queue = prompt_response_queue
+
+        super(AsyncPromptClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=PromptRequest,
+            output_schema=PromptResponse,
+            client=client,
+        )
+
+    async def request(self, id, variables, timeout=300):
+
+        resp = await self.call(
+            id=id,
+            terms=to_terms(variables),
+            timeout=timeout
+        )
+
+        return from_response(resp)
+
+    async def request_definitions(self, chunk, timeout=300):
+
+        defs = await self.request(
+            id="extract-definitions",
+            variables={
+                "text": chunk
+            },
+            timeout=timeout
+        )
+
+        return to_definitions(defs)
+
+    async def request_relationships(self, chunk, timeout=300):
+
+        rels = await self.request(
+            id="extract-relationships",
+            variables={
+                "text": chunk
+            },
+            timeout=timeout
+        )
+
+        return to_relationships(rels)
+
+    async def request_topics(self, chunk, timeout=300):
+
+        topics = await self.request(
+            id="extract-topics",
+            variables={
+                "text": chunk
+            },
+            timeout=timeout
+        )
+        
+        return to_topics(topics)
+
+    async def request_rows(self, schema, chunk, timeout=300):
+
+        return await self.request(
+            id="extract-rows",
+            variables={
+                "chunk": chunk,
+                "row-schema": row_schema(schema),
+            },
+            timeout=timeout
+        )
+
+    async def request_kg_prompt(self, query, kg, timeout=300):
+
+        return await self.request(
+            id="kg-prompt",
+            variables={
+                "query": query,
+                "knowledge": knowledge(kg),
+            },
+            timeout=timeout
+        )
+
+    async def request_document_prompt(self, query, documents, timeout=300):
+
+        return await self.request(
+            id="document-prompt",
+            variables={
+                "query": query,
+                "documents": documents,
+            },
+            timeout=timeout
+        )
 
@@ -3,9 +3,11 @@
 import _pulsar
 
 from .. schema import TriplesQueryRequest, TriplesQueryResponse, Value
+from .. schema import TriplePattern
 from .. schema import triples_request_queue
 from .. schema import triples_response_queue
 from . base import BaseClient
+from . async_base import AsyncBaseClient
 
 # Ugly
 ERROR=_pulsar.LoggerLevel.Error
@@ -39,6 +41,13 @@ class TriplesQueryClient(BaseClient):
             output_schema=TriplesQueryResponse,
         )
 
+    def create_pattern(self, pattern):
+        return TriplePattern(
+            s=self.create_value(pattern[0]),
+            p=self.create_value(pattern[1]),
+            o=self.create_value(pattern[2]),
+        )
+
     def create_value(self, ent):
 
         if ent == None: return None
@@ -64,3 +73,99 @@ class TriplesQueryClient(BaseClient):
             timeout=timeout,
         ).triples
 
+    # Issues many (s, p, o) patterns in one request, returns a list of
+    # triple lists, one per pattern
+    def request_batch(
+            self,
+            patterns,
+            user="trustgraph", collection="default",
+            limit=10, timeout=120,
+    ):
+        return [
+            r.triples
+            for r in self.call(
+                patterns=[self.create_pattern(p) for p in patterns],
+                user=user,
+                collection=collection,
+                limit=limit,
+                timeout=timeout,
+            ).results
+        ]
+
+class AsyncTriplesQueryClient(AsyncBaseClient):
+
+    def __init__(
+            self, log_level=ERROR,
+            subscriber=None,
+            input_queue=None,
+            output_queue=None,
+            pulsar_host="pulsar://pulsar:6650",
+            client=None,
+    ):
+
+        if input_queue == None:
+            input_queue = triples_request_queue
+
+        if output_queue == None:
+            output_queue = triples_response_queue
+
+        super(AsyncTriplesQueryClient, self).__init__(
+            log_level=log_level,
+            subscriber=subscriber,
+            input_queue=input_queue,
+            output_queue=output_queue,
+            pulsar_host=pulsar_host,
+            input_schema=TriplesQueryRequest,
+            output_schema=TriplesQueryResponse,
+            client=client,
+        )
+
+    def create_pattern(self, pattern):
+        return TriplePattern(
+            s=self.create_value(pattern[0]),
+            p=self.create_value(pattern[1]),
+            o=self.create_value(pattern[2]),
+        )
+
+    def create_value(self, ent):
+
+        if ent == None: return None
+
+        if ent.startswith("http://") or ent.startswith("https://"):
+            return Value(value=ent, is_uri=True)
+
+        return Value(value=ent, is_uri=False)
+
+    async def request(
+            self, 
+            s, p, o,
+            user="trustgraph", collection="default",
+            limit=10, timeout=120,
+    ):
+        return (await self.call(
+            s=self.create_value(s),
+            p=self.create_value(p),
+            o=self.create_value(o),
+            user=user,
+            collection=collection,
+            limit=limit,
+            timeout=timeout,
+        )).triples
+
+    async def request_batch(
+            self,
+            patterns,
+            user="trustgraph", collection="default",
+            limit=10, timeout=120,
+    ):
+        return [
+            r.triples
+            for r in (await self.call(
+                patterns=[self.create_pattern(p) for p in patterns],
+                user=user,
+                collection=collection,
+                limit=limit,
+                timeout=timeout,
+            )).results
+        ]
+
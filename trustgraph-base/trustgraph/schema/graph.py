@@ -51,6 +51,19 @@ triples_store_queue = topic('triples-store')
 
 # Triples query
 
+# A (s, p, o) pattern, some values may be null
+class TriplePattern(Record):
+    s = Value()
+    p = Value()
+    o = Value()
+
+# Results for one pattern of a batch query
+class TriplesQueryResult(Record):
+    triples = Array(Triple())
+
+# If patterns is set, this is a batch query: s, p and o are ignored, the
+# limit applies to each pattern, and the response carries one result per
+# pattern in the same order.
 class TriplesQueryRequest(Record):
     s = Value()
     p = Value()
@@ -58,10 +71,12 @@ class TriplesQueryRequest(Record):
     limit = Integer()
     user = String()
     collection = String()
+    patterns = Array(TriplePattern())
 
 class TriplesQueryResponse(Record):
     error = Error()
     triples = Array(Triple())
+    results = Array(TriplesQueryResult())
 
 triples_request_queue = topic(
     'triples', kind='non-persistent', namespace='request'
@@ -1,5 +1,5 @@
 
-from pulsar.schema import Record, String, Array, Double, Integer
+from pulsar.schema import Record, String, Array, Double, Integer, Boolean
 
 from . topic import topic
 from . types import Error
@@ -8,9 +8,20 @@ from . types import Error
 
 # LLM text completion
 
+# If streaming is set, the response may be delivered as a series of
+# messages each holding the next part of the text, with end_of_stream set
+# only on the last, which carries the token counts.  Processors which don't
+# stream send a single response with end_of_stream unset.
+#
+# If prefix_length is set, the system prompt and the first prefix_length
+# characters of the prompt are the same across many requests, and
+# processors may have the provider cache them.  in_token counts all input
+# tokens, including those read from or written to the provider's cache.
 class TextCompletionRequest(Record):
     system = String()
     prompt = String()
+    streaming = Boolean()
+    prefix_length = Integer()
 
 class TextCompletionResponse(Record):
     error = Error()
@@ -18,6 +29,9 @@ class TextCompletionResponse(Record):
     in_token = Integer()
     out_token = Integer()
     model = String()
+    end_of_stream = Boolean()
+    cache_read_token = Integer()
+    cache_write_token = Integer()
 
 text_completion_request_queue = topic(
     'text-completion', kind='non-persistent', namespace='request'
@@ -30,12 +44,20 @@ text_completion_response_queue = topic(
 
 # Embeddings
 
+# Vectors for one text of a batch request
+class EmbeddingsResult(Record):
+    vectors = Array(Array(Double()))
+
+# If texts is set, this is a batch request: text is ignored, and the
+# response carries one result per text in the same order.
 class EmbeddingsRequest(Record):
     text = String()
+    texts = Array(String())
 
 class EmbeddingsResponse(Record):
     error = Error()
     vectors = Array(Array(Double()))
+    results = Array(EmbeddingsResult())
 
 embeddings_request_queue = topic(
     'embeddings', kind='non-persistent', namespace='request'
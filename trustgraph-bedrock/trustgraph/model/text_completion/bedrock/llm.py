@@ -13,7 +13,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -28,7 +28,7 @@ default_aws_id_key = os.getenv("AWS_ID_KEY", None)
 default_aws_secret = os.getenv("AWS_SECRET", None)
 default_aws_region = os.getenv("AWS_REGION", 'us-west-2')
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
     
@@ -134,12 +134,7 @@ class Processor(ConsumerProducer):
                     "messages": [
                         {
                             "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                }
-                            ]
+                            "content": self.claude_content(v, prompt)
                         }
                     ]
                 })
@@ -179,8 +174,14 @@ class Processor(ConsumerProducer):
             accept = 'application/json'
             contentType = 'application/json'
 
-            # FIXME: Consider catching request limits and raise TooManyRequests
-            # See https://boto3.amazonaws.com/v1/documentation/api/latest/guide/retries.html
+            if v.streaming:
+
+                with __class__.text_completion_metric.time():
+                    self.stream(id, promptbody)
+
+                print("Done.", flush=True)
+
+                return
 
             with __class__.text_completion_metric.time():
                 response = self.bedrock.invoke_model(
@@ -225,10 +226,21 @@ class Processor(ConsumerProducer):
             metadata = response['ResponseMetadata']['HTTPHeaders']
             inputtokens = int(metadata['x-amzn-bedrock-input-token-count'])
             outputtokens = int(metadata['x-amzn-bedrock-output-token-count'])        
+            cacheread = int(
+                metadata.get('x-amzn-bedrock-cache-read-input-token-count', 0)
+            )
+            cachewrite = int(
+                metadata.get('x-amzn-bedrock-cache-write-input-token-count', 0)
+            )
+
+            # Cached input tokens are counted separately
+            inputtokens += cacheread + cachewrite
 
             print(outputtext, flush=True)
             print(f"Input Tokens: {inputtokens}", flush=True)
             print(f"Output Tokens: {outputtokens}", flush=True)
+            print(f"Cache Read Tokens: {cacheread}", flush=True)
+            print(f"Cache Write Tokens: {cachewrite}", flush=True)
 
             print("Send response...", flush=True)
             r = TextCompletionResponse(
@@ -237,6 +249,8 @@ class Processor(ConsumerProducer):
                 in_token=inputtokens,
                 out_token=outputtokens,
                 model=str(self.model),
+                cache_read_token=cacheread,
+                cache_write_token=cachewrite,
             )
 
             self.send(r, properties={"id": id})
@@ -244,15 +258,20 @@ class Processor(ConsumerProducer):
             print("Done.", flush=True)
 
 
-        # FIXME: Wrong exception, don't know what Bedrock throws
-        # for a rate limit
-        except TooManyRequests:
+        except self.bedrock.exceptions.ThrottlingException:
 
-            print("Send rate limit response...", flush=True)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
+
+            print("Send error response...", flush=True)
 
             r = TextCompletionResponse(
                 error=Error(
-                    type = "rate-limit",
+                    type = "llm-error",
                     message = str(e),
                 ),
                 response=None,
@@ -261,33 +280,131 @@ class Processor(ConsumerProducer):
                 model=None,
             )
 
-            self.producer.send(r, properties={"id": id})
-
             self.consumer.acknowledge(msg)
 
-        except Exception as e:
+    # Message content for Claude models.  If the request has a stable
+    # prefix, the system prompt and the prefix, which come first in the
+    # prompt, are marked with a cache breakpoint.
+    def claude_content(self, v, prompt):
+
+        if v.prefix_length is None:
+            return [
+                {
+                    "type": "text",
+                    "text": prompt
+                }
+            ]
+
+        split = len(prompt) - len(v.prompt) + v.prefix_length
+
+        content = [
+            {
+                "type": "text",
+                "text": prompt[:split],
+                "cache_control": { "type": "ephemeral" }
+            }
+        ]
 
-            print(f"Exception: {e}")
+        if prompt[split:]:
+            content.append({
+                "type": "text",
+                "text": prompt[split:]
+            })
 
-            print("Send error response...", flush=True)
+        return content
+
+    # Text from one chunk of a streamed response, depending on the model
+    def chunk_text(self, chunk):
+
+        # Claude Response Structure
+        if self.model.startswith("anthropic"):
+            if chunk.get("type") == "content_block_delta":
+                return chunk["delta"].get("text", "")
+            return ""
+
+        # Llama 3.1 Response Structure
+        elif self.model.startswith("meta"):
+            return chunk.get("generation", "")
+
+        # Jamba Response Structure
+        elif self.model.startswith("ai21"):
+            return chunk['choices'][0]['delta'].get('content', "")
+
+        # Cohere Response Structure
+        elif self.model.startswith("cohere"):
+            return chunk.get("text", "")
+
+        # Mistral and default Response Structure
+        else:
+            return chunk['outputs'][0]['text']
+
+    # Sends the completion as it is generated, one message per chunk of
+    # text, followed by an end-of-stream message with the token counts
+    def stream(self, id, promptbody):
+
+        response = self.bedrock.invoke_model_with_response_stream(
+            body=promptbody, modelId=self.model,
+            accept='application/json', contentType='application/json'
+        )
+
+        inputtokens = None
+        outputtokens = None
+        cacheread = None
+        cachewrite = None
+
+        for event in response["body"]:
+
+            if "chunk" not in event: continue
+
+            chunk = json.loads(event["chunk"]["bytes"])
+
+            # Bedrock adds invocation metrics to the last chunk
+            if "amazon-bedrock-invocationMetrics" in chunk:
+                metrics = chunk["amazon-bedrock-invocationMetrics"]
+                cacheread = int(metrics.get("cacheReadInputTokenCount", 0))
+                cachewrite = int(metrics.get("cacheWriteInputTokenCount", 0))
+                inputtokens = (
+                    int(metrics["inputTokenCount"]) + cacheread + cachewrite
+                )
+                outputtokens = int(metrics["outputTokenCount"])
+
+            text = self.chunk_text(chunk)
+
+            if not text: continue
 
             r = TextCompletionResponse(
-                error=Error(
-                    type = "llm-error",
-                    message = str(e),
-                ),
-                response=None,
+                error=None,
+                response=text,
                 in_token=None,
                 out_token=None,
-                model=None,
+                model=str(self.model),
+                end_of_stream=False,
             )
 
-            self.consumer.acknowledge(msg)
+            self.send(r, properties={"id": id})
+
+        print(f"Input Tokens: {inputtokens}", flush=True)
+        print(f"Output Tokens: {outputtokens}", flush=True)
+        print(f"Cache Read Tokens: {cacheread}", flush=True)
+        print(f"Cache Write Tokens: {cachewrite}", flush=True)
+
+        r = TextCompletionResponse(
+            error=None,
+            response="",
+            in_token=inputtokens,
+            out_token=outputtokens,
+            model=str(self.model),
+            end_of_stream=True,
+            cache_read_token=cacheread,
+            cache_write_token=cachewrite,
+        )
+
+        self.send(r, properties={"id": id})
 
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
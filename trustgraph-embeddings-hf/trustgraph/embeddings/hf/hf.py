@@ -7,10 +7,11 @@ Input is text, output is embeddings vector.
 from langchain_huggingface import HuggingFaceEmbeddings
 
 from trustgraph.schema import EmbeddingsRequest, EmbeddingsResponse, Error
+from trustgraph.schema import EmbeddingsResult
 from trustgraph.schema import embeddings_request_queue
 from trustgraph.schema import embeddings_response_queue
 from trustgraph.log_level import LogLevel
-from trustgraph.base import ConsumerProducer
+from trustgraph.base import ConsumerProducer, EmbeddingsCache
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -18,6 +19,9 @@ default_input_queue = embeddings_request_queue
 default_output_queue = embeddings_response_queue
 default_subscriber = module
 default_model="all-MiniLM-L6-v2"
+default_batch_size=1
+default_batch_wait_ms=20
+default_cache_size=1000000
 
 class Processor(ConsumerProducer):
 
@@ -27,6 +31,10 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         model = params.get("model", default_model)
+        batch_size = params.get("batch_size", default_batch_size)
+        batch_wait_ms = params.get("batch_wait_ms", default_batch_wait_ms)
+        cache_path = params.get("cache_path")
+        cache_size = params.get("cache_size", default_cache_size)
 
         super(Processor, self).__init__(
             **params | {
@@ -35,50 +43,155 @@ class Processor(ConsumerProducer):
                 "subscriber": subscriber,
                 "input_schema": EmbeddingsRequest,
                 "output_schema": EmbeddingsResponse,
+                "batch_size": batch_size,
+                "batch_wait_ms": batch_wait_ms,
             }
         )
 
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+
+        self.model = model
         self.embeddings = HuggingFaceEmbeddings(model_name=model)
 
+        if cache_path:
+            self.cache = EmbeddingsCache(cache_path, max_size=cache_size)
+        else:
+            self.cache = None
+
+    def run(self):
+
+        if self.batch_size <= 1:
+            return super(Processor, self).run()
+
+        # Micro-batching mode: collect up to batch_size requests, waiting at
+        # most batch_wait_ms after the first one, and embed them in a single
+        # forward pass
+
+        ConsumerProducer.state_metric.state('running')
+
+        while True:
+
+            msgs = self.receive_batch(self.batch_size, self.batch_wait_ms)
+
+            with ConsumerProducer.request_metric.time():
+                failed = self.handle_batch(msgs)
+
+            for msg in msgs:
+                if msg in failed:
+                    self.consumer.negative_acknowledge(msg)
+                else:
+                    self.consumer.acknowledge(msg)
+
+            ConsumerProducer.processing_metric.labels(
+                status="success"
+            ).inc(len(msgs) - len(failed))
+
+            ConsumerProducer.processing_metric.labels(
+                status="error"
+            ).inc(len(failed))
+
     def handle(self, msg):
 
-        v = msg.value()
+        failed = self.handle_batch([msg])
+
+        if failed: raise failed[msg]
+
+    # Returns the messages which couldn't be read, mapped to the exception,
+    # the rest of the batch is still handled
+    def handle_batch(self, msgs):
+
+        # Every text of every request goes into one forward pass
+        requests = []
+        texts = []
+        failed = {}
+
+        for msg in msgs:
+
+            try:
+
+                v = msg.value()
+
+                # Sender-produced ID
+                id = msg.properties()["id"]
+
+            except Exception as e:
+
+                print("Exception:", e, flush=True)
+
+                failed[msg] = e
 
-        # Sender-produced ID
-        id = msg.properties()["id"]
+                continue
 
-        print(f"Handling input {id}...", flush=True)
+            # An empty texts list is a batch with no texts, not a single
+            # text, and gets an empty list of results
+            if v.texts is not None:
+                requests.append((id, True, len(v.texts)))
+                texts.extend(v.texts)
+            else:
+                requests.append((id, False, 1))
+                texts.append(v.text)
+
+        print(
+            f"Handling {len(texts)} texts from {len(msgs)} requests...",
+            flush=True
+        )
 
         try:
 
-            text = v.text
-            embeds = self.embeddings.embed_documents([text])
+            if not texts:
+                embeds = []
+            elif self.cache:
+                embeds = self.cache.embed(
+                    self.model, texts, self.embeddings.embed_documents
+                )
+            else:
+                embeds = self.embeddings.embed_documents(texts)
 
-            print("Send response...", flush=True)
-            r = EmbeddingsResponse(vectors=embeds, error=None)
-            self.producer.send(r, properties={"id": id})
+            print("Send responses...", flush=True)
 
-            print("Done.", flush=True)
+            # Vectors are routed back to each requester by ID
+            pos = 0
+
+            for id, batch, count in requests:
+
+                vectors = embeds[pos:pos + count]
+                pos += count
+
+                if batch:
+                    r = EmbeddingsResponse(
+                        results=[
+                            EmbeddingsResult(vectors=[vector])
+                            for vector in vectors
+                        ],
+                        error=None,
+                    )
+                else:
+                    r = EmbeddingsResponse(vectors=vectors, error=None)
 
+                self.producer.send(r, properties={"id": id})
+
+            print("Done.", flush=True)
 
         except Exception as e:
 
             print(f"Exception: {e}")
 
-            print("Send error response...", flush=True)
+            print("Send error responses...", flush=True)
+
+            for id, batch, count in requests:
 
-            r = EmbeddingsResponse(
-                error=Error(
-                    type = "llm-error",
-                    message = str(e),
-                ),
-                response=None,
-            )
+                r = EmbeddingsResponse(
+                    error=Error(
+                        type = "llm-error",
+                        message = str(e),
+                    ),
+                    vectors=None,
+                )
 
-            self.producer.send(r, properties={"id": id})
+                self.producer.send(r, properties={"id": id})
 
-            self.consumer.acknowledge(msg)
-            
+        return failed
 
     @staticmethod
     def add_args(parser):
@@ -94,6 +207,32 @@ class Processor(ConsumerProducer):
             help=f'LLM model (default: all-MiniLM-L6-v2)'
         )
 
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=default_batch_size,
+            help=f'Max requests embedded in one batch (default: {default_batch_size})'
+        )
+
+        parser.add_argument(
+            '--batch-wait-ms',
+            type=int,
+            default=default_batch_wait_ms,
+            help=f'Max time to wait to fill a batch, milliseconds (default: {default_batch_wait_ms})'
+        )
+
+        parser.add_argument(
+            '--cache-path',
+            help=f'Embeddings cache database file (default: no cache)'
+        )
+
+        parser.add_argument(
+            '--cache-size',
+            type=int,
+            default=default_cache_size,
+            help=f'Max embeddings cache entries (default: {default_cache_size})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
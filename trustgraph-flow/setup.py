@@ -61,24 +61,29 @@ setuptools.setup(
         "aiohttp",
         "pinecone[grpc]",
         "falkordb",
+        "numpy",
     ],
     scripts=[
         "scripts/api-gateway",
         "scripts/agent-manager-react",
         "scripts/chunker-recursive",
         "scripts/chunker-token",
+        "scripts/de-query-local",
         "scripts/de-query-milvus",
         "scripts/de-query-qdrant",
         "scripts/de-query-pinecone",
+        "scripts/de-write-local",
         "scripts/de-write-milvus",
         "scripts/de-write-qdrant",
         "scripts/de-write-pinecone",
         "scripts/document-rag",
         "scripts/embeddings-ollama",
         "scripts/embeddings-vectorize",
+        "scripts/ge-query-local",
         "scripts/ge-query-milvus",
         "scripts/ge-query-pinecone",
         "scripts/ge-query-qdrant",
+        "scripts/ge-write-local",
         "scripts/ge-write-milvus",
         "scripts/ge-write-pinecone",
         "scripts/ge-write-qdrant",
@@ -88,6 +93,7 @@ setuptools.setup(
         "scripts/kg-extract-relationships",
         "scripts/metering",
         "scripts/object-extract-row",
+        "scripts/oe-write-local",
         "scripts/oe-write-milvus",
         "scripts/pdf-decoder",
         "scripts/prompt-generic",
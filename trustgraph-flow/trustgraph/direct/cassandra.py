@@ -1,24 +1,61 @@
 
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
+from cassandra.concurrent import execute_concurrent
+from cassandra.concurrent import execute_concurrent_with_args
+import threading
+
+from .. base import LruCache
+
+# Table layouts.  The indexed layout is a single table keyed (s, p, o) with
+# secondary indexes on p and o, so p and o lookups are scatter-gather
+# queries.  The denormalised layout also writes every triple to a table
+# partitioned by p and a table partitioned by o, so that every query shape
+# is a single-partition read, at the cost of three writes per triple.
+INDEXED = "indexed"
+DENORMALISED = "denormalised"
+layouts = [ INDEXED, DENORMALISED ]
 
 class TrustGraph:
 
+    # If a session is provided it is shared, and is not bound to a keyspace,
+    # so all statements use keyspace-qualified table names.  The initialised
+    # set records tables whose DDL has already been run on this session.
     def __init__(
             self, hosts=None,
             keyspace="trustgraph", table="default",
+            session=None, initialised=None, layout=INDEXED,
     ):
 
         if hosts is None:
             hosts = ["localhost"]
 
+        if layout not in layouts:
+            raise RuntimeError(f"Table layout {layout} not known")
+
+        self.layout = layout
+
         self.keyspace = keyspace
         self.table = table
-            
-        self.cluster = Cluster(hosts)
-        self.session = self.cluster.connect()
+        self.name = f"{keyspace}.{table}"
 
-        self.init()
+        if session is None:
+            self.cluster = Cluster(hosts)
+            self.session = self.cluster.connect()
+        else:
+            self.cluster = None
+            self.session = session
+
+        if initialised is None:
+            initialised = set()
+
+        self.initialised = initialised
+
+        self.statements = {}
+        self.lock = threading.Lock()
+
+        if (keyspace, table) not in self.initialised:
+            self.init()
 
     def clear(self):
 
@@ -26,22 +63,28 @@ class TrustGraph:
             drop keyspace if exists {self.keyspace};
         """);
 
+        # Dropping the keyspace drops every table in it, including those of
+        # other objects sharing the session
+        for entry in list(self.initialised):
+            if entry[0] == self.keyspace:
+                self.initialised.discard(entry)
+
+        self.statements = {}
+
         self.init()
 
     def init(self):
 
         self.session.execute(f"""
             create keyspace if not exists {self.keyspace}
-                with replication = {{ 
-                   'class' : 'SimpleStrategy', 
-                   'replication_factor' : 1 
+                with replication = {{
+                   'class' : 'SimpleStrategy',
+                   'replication_factor' : 1
                 }};
         """);
 
-        self.session.set_keyspace(self.keyspace)
-
         self.session.execute(f"""
-            create table if not exists {self.table} (
+            create table if not exists {self.name} (
                 s text,
                 p text,
                 o text,
@@ -49,66 +92,266 @@ class TrustGraph:
             );
         """);
 
-        self.session.execute(f"""
-            create index if not exists {self.table}_p
-                ON {self.table} (p);
-        """);
+        if self.layout == DENORMALISED:
 
-        self.session.execute(f"""
-            create index if not exists {self.table}_o
-                ON {self.table} (o);
-        """);
+            self.session.execute(f"""
+                create table if not exists {self.name}_po (
+                    s text,
+                    p text,
+                    o text,
+                    PRIMARY KEY ((p), o, s)
+                );
+            """);
+
+            self.session.execute(f"""
+                create table if not exists {self.name}_os (
+                    s text,
+                    p text,
+                    o text,
+                    PRIMARY KEY ((o), s, p)
+                );
+            """);
+
+        else:
+
+            self.session.execute(f"""
+                create index if not exists {self.table}_p
+                    ON {self.name} (p);
+            """);
+
+            self.session.execute(f"""
+                create index if not exists {self.table}_o
+                    ON {self.name} (o);
+            """);
+
+        self.initialised.add((self.keyspace, self.table))
+
+    # Statements are prepared on first use and kept for the life of this
+    # object, or until the table is recreated after its keyspace was
+    # cleared
+    def prepared(self, kind, cql):
+
+        with self.lock:
+
+            if (self.keyspace, self.table) not in self.initialised:
+                self.statements = {}
+                self.init()
+
+            if kind not in self.statements:
+                self.statements[kind] = self.session.prepare(cql)
+
+            return self.statements[kind]
+
+    def insert_stmts(self):
+
+        tables = [ self.name ]
+
+        if self.layout == DENORMALISED:
+            tables += [ f"{self.name}_po", f"{self.name}_os" ]
+
+        return [
+            self.prepared(
+                "insert " + table,
+                f"insert into {table} (s, p, o) values (?, ?, ?)"
+            )
+            for table in tables
+        ]
 
     def insert(self, s, p, o):
-    
-        self.session.execute(
-            f"insert into {self.table} (s, p, o) values (%s, %s, %s)",
-            (s, p, o)
+        for stmt in self.insert_stmts():
+            self.session.execute(stmt, (s, p, o))
+
+    # Inserts many (s, p, o) tuples, with up to concurrency inserts in
+    # flight at once
+    def insert_many(self, triples, concurrency=100):
+
+        stmts = self.insert_stmts()
+
+        if len(stmts) == 1:
+            execute_concurrent_with_args(
+                self.session, stmts[0], triples,
+                concurrency=concurrency, raise_on_first_error=True,
+            )
+            return
+
+        execute_concurrent(
+            self.session,
+            [
+                (stmt, t)
+                for t in triples
+                for stmt in stmts
+            ],
+            concurrency=concurrency, raise_on_first_error=True,
         )
 
-    def get_all(self, limit=50):
-        return self.session.execute(
-            f"select s, p, o from {self.table} limit {limit}"
+    # Each query shape has a builder returning (statement, params), so that
+    # the same statements can be run one at a time or as a concurrent batch
+
+    def query_all(self, limit=50):
+        return (
+            self.prepared(
+                "all",
+                f"select s, p, o from {self.name} limit ?"
+            ),
+            (limit,)
         )
 
-    def get_s(self, s, limit=10):
-        return self.session.execute(
-            f"select p, o from {self.table} where s = %s limit {limit}",
-            (s,)
+    def query_s(self, s, limit=10):
+        return (
+            self.prepared(
+                "s",
+                f"select p, o from {self.name} where s = ? limit ?"
+            ),
+            (s, limit)
         )
 
-    def get_p(self, p, limit=10):
-        return self.session.execute(
-            f"select s, o from {self.table} where p = %s limit {limit}",
-            (p,)
+    def query_p(self, p, limit=10):
+
+        if self.layout == DENORMALISED:
+            table = f"{self.name}_po"
+        else:
+            table = self.name
+
+        return (
+            self.prepared(
+                "p",
+                f"select s, o from {table} where p = ? limit ?"
+            ),
+            (p, limit)
         )
 
-    def get_o(self, o, limit=10):
-        return self.session.execute(
-            f"select s, p from {self.table} where o = %s limit {limit}",
-            (o,)
+    def query_o(self, o, limit=10):
+
+        if self.layout == DENORMALISED:
+            table = f"{self.name}_os"
+        else:
+            table = self.name
+
+        return (
+            self.prepared(
+                "o",
+                f"select s, p from {table} where o = ? limit ?"
+            ),
+            (o, limit)
         )
 
-    def get_sp(self, s, p, limit=10):
-        return self.session.execute(
-            f"select o from {self.table} where s = %s and p = %s limit {limit}",
-            (s, p)
+    def query_sp(self, s, p, limit=10):
+        return (
+            self.prepared(
+                "sp",
+                f"select o from {self.name} where s = ? and p = ? limit ?"
+            ),
+            (s, p, limit)
         )
 
-    def get_po(self, p, o, limit=10):
-        return self.session.execute(
-            f"select s from {self.table} where p = %s and o = %s limit {limit} allow filtering",
-            (p, o)
+    def query_po(self, p, o, limit=10):
+
+        if self.layout == DENORMALISED:
+            cql = f"select s from {self.name}_po where p = ? and o = ? limit ?"
+        else:
+            cql = f"select s from {self.name} where p = ? and o = ? limit ? allow filtering"
+
+        return (
+            self.prepared("po", cql),
+            (p, o, limit)
         )
 
-    def get_os(self, o, s, limit=10):
-        return self.session.execute(
-            f"select p from {self.table} where o = %s and s = %s limit {limit}",
-            (o, s)
+    def query_os(self, o, s, limit=10):
+
+        if self.layout == DENORMALISED:
+            table = f"{self.name}_os"
+        else:
+            table = self.name
+
+        return (
+            self.prepared(
+                "os",
+                f"select p from {table} where o = ? and s = ? limit ?"
+            ),
+            (o, s, limit)
+        )
+
+    def query_spo(self, s, p, o, limit=10):
+        return (
+            self.prepared(
+                "spo",
+                f"""select s as x from {self.name} where s = ? and p = ? and o = ? limit ?"""
+            ),
+            (s, p, o, limit)
         )
 
+    def get_all(self, limit=50):
+        return self.session.execute(*self.query_all(limit))
+
+    def get_s(self, s, limit=10):
+        return self.session.execute(*self.query_s(s, limit))
+
+    def get_p(self, p, limit=10):
+        return self.session.execute(*self.query_p(p, limit))
+
+    def get_o(self, o, limit=10):
+        return self.session.execute(*self.query_o(o, limit))
+
+    def get_sp(self, s, p, limit=10):
+        return self.session.execute(*self.query_sp(s, p, limit))
+
+    def get_po(self, p, o, limit=10):
+        return self.session.execute(*self.query_po(p, o, limit))
+
+    def get_os(self, o, s, limit=10):
+        return self.session.execute(*self.query_os(o, s, limit))
+
     def get_spo(self, s, p, o, limit=10):
-        return self.session.execute(
-            f"""select s as x from {self.table} where s = %s and p = %s and o = %s limit {limit}""",
-            (s, p, o)
+        return self.session.execute(*self.query_spo(s, p, o, limit))
+
+    # Runs many (statement, params) queries concurrently, returns a list of
+    # result sets in the same order
+    def get_batch(self, queries, concurrency=50):
+
+        results = execute_concurrent(
+            self.session, queries, concurrency=concurrency,
+            raise_on_first_error=True,
         )
+
+        return [
+            rows
+            for success, rows in results
+        ]
+
+# One long-lived Cassandra session shared by a bounded cache of TrustGraph
+# objects, one per (keyspace, table).  Switching between collections reuses
+# the session, and DDL is only run the first time a table is seen.
+class TrustGraphs:
+
+    def __init__(self, hosts=None, max_size=100, layout=INDEXED):
+
+        if hosts is None:
+            hosts = ["localhost"]
+
+        self.layout = layout
+
+        self.cluster = Cluster(hosts)
+        self.session = self.cluster.connect()
+
+        self.initialised = set()
+        self.graphs = LruCache("cassandra-tables", max_size=max_size)
+        self.lock = threading.Lock()
+
+    def get(self, keyspace, table):
+
+        with self.lock:
+
+            tg = self.graphs.get((keyspace, table))
+
+            if tg is None:
+
+                tg = TrustGraph(
+                    keyspace=keyspace, table=table,
+                    session=self.session, initialised=self.initialised,
+                    layout=self.layout,
+                )
+
+                self.graphs.put((keyspace, table), tg)
+
+            return tg
+
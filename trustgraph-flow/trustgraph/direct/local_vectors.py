@@ -0,0 +1,367 @@
+
+from collections import OrderedDict
+import numpy as np
+import urllib.parse
+import threading
+import json
+import os
+
+# Returns the indexes of the k highest scores, best first
+def top_k(scores, k):
+
+    if k >= len(scores):
+        return np.argsort(-scores)
+
+    ixs = np.argpartition(-scores, k)[:k]
+    return ixs[np.argsort(-scores[ixs])]
+
+def normalise(vectors):
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+
+    return vectors / norms
+
+# Exact cosine search of a matrix of normalised vectors.  With several query
+# vectors, each entry scores its best match.  If key is given, results are
+# distinct on that payload field.  Returns a list of (payload, score), best
+# first.
+def search(matrix, payloads, vectors, limit=10, key=None):
+
+    if len(matrix) == 0: return []
+
+    query = normalise(vectors)
+
+    scores = (matrix @ query.T).max(axis=1)
+
+    fetch = limit
+
+    while True:
+
+        results = []
+        seen = set()
+
+        for ix in top_k(scores, fetch):
+
+            payload = payloads[ix]
+
+            if key is not None:
+                if payload[key] in seen: continue
+                seen.add(payload[key])
+
+            results.append((payload, float(scores[ix])))
+
+            if len(results) >= limit: break
+
+        if len(results) >= limit or fetch >= len(scores):
+            return results
+
+        fetch *= 2
+
+# One collection of vectors, all of one dimension, held in a directory.
+# Vectors are normalised and appended to a raw float32 file which is
+# memory-mapped for search, and each point's ID and payload are appended as
+# a JSON line.  Neither file is read past the vector count and payload
+# offset in the commit file, which is replaced once both appends are
+# synced, so readers only ever see complete entries and pick up entries
+# appended by other processes on the next search.  Anything past the commit
+# point was left by a failed write, and is truncated before the next one.
+# Points whose ID is already held are skipped, so a redelivered write adds
+# nothing.  Each index should have a single writer.  Search is an exact
+# scan of every vector, so its cost grows linearly with the collection.
+class VectorIndex:
+
+    def __init__(self, path, dim):
+
+        os.makedirs(path, exist_ok=True)
+
+        self.dim = dim
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.payloads_path = os.path.join(path, "payloads.jsonl")
+        self.commit_path = os.path.join(path, "commit.json")
+
+        self.lock = threading.Lock()
+
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.payloads = []
+        self.ids = set()
+        self.payloads_offset = 0
+
+    def committed(self):
+
+        try:
+            with open(self.commit_path) as f:
+                commit = json.load(f)
+        except FileNotFoundError:
+            return 0, 0
+
+        return commit["count"], commit["offset"]
+
+    def commit(self, count, offset):
+
+        temp_path = self.commit_path + ".tmp"
+
+        with open(temp_path, "w") as f:
+            json.dump({ "count": count, "offset": offset }, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, self.commit_path)
+
+    @staticmethod
+    def append(path, data):
+
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def insert_many(self, ids, vectors, payloads):
+
+        vectors = normalise(vectors)
+
+        if vectors.shape[1] != self.dim:
+            raise RuntimeError("Vector dimension does not match index")
+
+        with self.lock:
+
+            self.refresh()
+
+            # Drop anything after the commit point, left by a failed write
+            for path, size in [
+                    (self.vectors_path, len(self.matrix) * self.dim * 4),
+                    (self.payloads_path, self.payloads_offset),
+            ]:
+                if os.path.exists(path):
+                    os.truncate(path, size)
+
+            rows = []
+            lines = []
+            seen = set()
+
+            for ix, (id, payload) in enumerate(zip(ids, payloads)):
+                if id in self.ids or id in seen: continue
+                seen.add(id)
+                rows.append(ix)
+                lines.append(json.dumps({ "id": id, "payload": payload }))
+
+            if not rows: return
+
+            data = "".join(line + "\n" for line in lines).encode("utf-8")
+
+            self.append(self.vectors_path, vectors[rows].tobytes())
+            self.append(self.payloads_path, data)
+
+            self.commit(
+                len(self.matrix) + len(rows), self.payloads_offset + len(data)
+            )
+
+    def refresh(self):
+
+        count, offset = self.committed()
+
+        if count == len(self.matrix): return
+
+        # Read payload lines added since the last refresh
+        with open(self.payloads_path, "rb") as f:
+            f.seek(self.payloads_offset)
+            data = f.read(offset - self.payloads_offset)
+
+        for line in data.splitlines():
+            entry = json.loads(line)
+            self.ids.add(entry["id"])
+            self.payloads.append(entry["payload"])
+
+        self.payloads_offset = offset
+
+        self.matrix = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r",
+            shape=(count, self.dim)
+        )
+
+    def __len__(self):
+        with self.lock:
+            self.refresh()
+            return len(self.matrix)
+
+    # Exact cosine search, see search() above
+    def search(self, vectors, limit=10, key=None):
+
+        with self.lock:
+            self.refresh()
+            matrix = self.matrix
+            payloads = self.payloads
+
+        return search(matrix, payloads, vectors, limit, key)
+
+# A directory of vector indexes, one per collection name
+class LocalVectors:
+
+    def __init__(self, path):
+
+        self.path = path
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index(self, name, dim):
+
+        with self.lock:
+
+            if name not in self.indexes:
+                self.indexes[name] = VectorIndex(
+                    os.path.join(self.path, urllib.parse.quote(name, safe="")),
+                    dim
+                )
+
+            return self.indexes[name]
+
+# A collection held in memory as a contiguous float32 matrix, which grows
+# by doubling its capacity.  Points whose ID is already held are skipped.
+class VectorMatrix:
+
+    def __init__(self, dim, ids=[], vectors=[], payloads=[]):
+
+        self.matrix = np.zeros((max(len(vectors), 16), dim), dtype=np.float32)
+        self.payloads = []
+        self.ids = set()
+        self.count = 0
+
+        self.add(ids, vectors, payloads)
+
+    def add(self, ids, vectors, payloads):
+
+        rows = []
+
+        for ix, id in enumerate(ids):
+            if id in self.ids: continue
+            self.ids.add(id)
+            rows.append(ix)
+
+        if len(rows) == 0: return
+
+        vectors = normalise([ vectors[ix] for ix in rows ])
+
+        needed = self.count + len(vectors)
+
+        if needed > len(self.matrix):
+            capacity = max(needed, 2 * len(self.matrix))
+            matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            matrix[:self.count] = self.matrix[:self.count]
+            self.matrix = matrix
+
+        self.matrix[self.count:needed] = vectors
+        self.payloads.extend(payloads[ix] for ix in rows)
+        self.count = needed
+
+    def __len__(self):
+        return self.count
+
+    def search(self, vectors, limit=10, key=None):
+        return search(
+            self.matrix[:self.count], self.payloads, vectors, limit, key
+        )
+
+# In-process copies of small collections held in a vector store, so that
+# they can be searched exactly without a round trip to the store.  A
+# collection is read from the store, using a loader function, the first
+# time it is searched, and is then kept up to date with add().  Points are
+# identified by ID, so one that is both loaded and added is held once.
+# Loading happens outside the lock, so that searches of other collections
+# aren't held up, and points added meanwhile are applied once it is done.
+# Collections holding more than max_size vectors are not copied, and
+# searching them returns None so that the caller falls back to the store.
+# At most max_collections are held, the least recently searched is dropped
+# to make room, and read again if it is searched later.
+class MemoryVectors:
+
+    def __init__(self, max_size=10000, max_collections=100):
+
+        self.max_size = max_size
+        self.max_collections = max_collections
+        self.collections = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    # The loader is called with a maximum count, and returns a list of
+    # (id, vector, payload) tuples, empty if the collection doesn't exist
+    def get(self, name, dim, loader):
+
+        with self.lock:
+
+            if name in self.collections:
+                self.collections.move_to_end(name)
+                return self.collections[name]
+
+            # Points added while loading are kept for when it's done
+            pending = self.loading.setdefault(name, [])
+
+        try:
+            items = loader(self.max_size + 1)
+        except:
+            with self.lock:
+                if self.loading.get(name) is pending:
+                    del self.loading[name]
+            raise
+
+        with self.lock:
+
+            if self.loading.get(name) is pending:
+                del self.loading[name]
+
+            # Loaded by another search in the meantime
+            if name in self.collections:
+                self.collections.move_to_end(name)
+                return self.collections[name]
+
+            coll = None
+
+            if len(items) <= self.max_size:
+
+                coll = VectorMatrix(
+                    dim,
+                    [ id for id, vec, payload in items ],
+                    [ vec for id, vec, payload in items ],
+                    [ payload for id, vec, payload in items ],
+                )
+
+                for ids, vectors, payloads in pending:
+                    coll.add(ids, vectors, payloads)
+
+                if len(coll) > self.max_size: coll = None
+
+            self.collections[name] = coll
+
+            while len(self.collections) > self.max_collections:
+                self.collections.popitem(last=False)
+
+            return coll
+
+    # Vectors for collections which aren't held or being loaded are
+    # ignored, the store will have them when the collection is read
+    def add(self, name, ids, vectors, payloads):
+
+        with self.lock:
+
+            if name in self.loading:
+                self.loading[name].append((ids, vectors, payloads))
+                return
+
+            coll = self.collections.get(name)
+
+            if coll is None: return
+
+            coll.add(ids, vectors, payloads)
+
+            if len(coll) > self.max_size:
+                self.collections[name] = None
+
+    def search(self, name, dim, loader, vectors, limit=10, key=None):
+
+        coll = self.get(name, dim, loader)
+
+        if coll is None: return None
+
+        with self.lock:
+            return coll.search(vectors, limit, key)
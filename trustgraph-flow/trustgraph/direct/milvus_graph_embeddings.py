@@ -1,10 +1,11 @@
 
 from pymilvus import MilvusClient, CollectionSchema, FieldSchema, DataType
-import time
+from . milvus_residency import CollectionResidency
 
 class EntityVectors:
 
-    def __init__(self, uri="http://localhost:19530", prefix='entity'):
+    def __init__(self, uri="http://localhost:19530", prefix='entity',
+                 max_loaded=10):
 
         self.client = MilvusClient(uri=uri)
 
@@ -16,22 +17,24 @@ class EntityVectors:
 
         self.prefix = prefix
 
-        # Time between reloads
-        self.reload_time = 90
-
-        # Next time to reload - this forces a reload at next window
-        self.next_reload = time.time() + self.reload_time
-        print("Reload at", self.next_reload)
+        # Collections stay loaded between searches
+        self.residency = CollectionResidency(
+            self.client, max_loaded=max_loaded
+        )
 
     def init_collection(self, dimension):
 
-        collection_name = self.prefix + "_" + str(dimension)
+        # The v2 schema has writer-set string IDs.  Collections from before,
+        # with auto-assigned integer IDs, have no suffix and are left alone.
+        collection_name = self.prefix + "_" + str(dimension) + "_v2"
 
+        # IDs are set by the writer, so that re-writing a point replaces it
         pkey_field = FieldSchema(
             name="id",
-            dtype=DataType.INT64,
+            dtype=DataType.VARCHAR,
+            max_length=64,
             is_primary=True,
-            auto_id=True,
+            auto_id=False,
         )
 
         vec_field = FieldSchema(
@@ -74,7 +77,7 @@ class EntityVectors:
 
         self.collections[dimension] = collection_name
 
-    def insert(self, embeds, entity):
+    def insert(self, id, embeds, entity):
 
         dim = len(embeds)
 
@@ -83,16 +86,65 @@ class EntityVectors:
     
         data = [
             {
+                "id": id,
                 "vector": embeds,
                 "entity": entity,
             }
         ]
 
-        self.client.insert(
+        self.client.upsert(
             collection_name=self.collections[dim],
             data=data
         )
 
+    # Upserts a list of (id, embeds, entity) tuples, with one upsert per
+    # collection
+    def insert_many(self, items):
+
+        data = {}
+
+        for id, embeds, entity in items:
+
+            dim = len(embeds)
+
+            if dim not in self.collections:
+                self.init_collection(dim)
+
+            data.setdefault(dim, []).append({
+                "id": id,
+                "vector": embeds,
+                "entity": entity,
+            })
+
+        for dim, rows in data.items():
+            self.client.upsert(
+                collection_name=self.collections[dim],
+                data=rows
+            )
+
+    # Reads up to limit vectors from the collection for a dimension, returns
+    # a list of (id, vector, fields) tuples
+    def get_all(self, dim, fields=["entity"], limit=10000):
+
+        if dim not in self.collections:
+            self.init_collection(dim)
+
+        coll = self.collections[dim]
+
+        self.residency.acquire(coll)
+
+        res = self.client.query(
+            collection_name=coll,
+            filter="",
+            output_fields=["id", "vector"] + fields,
+            limit=limit,
+        )
+
+        return [
+            (r["id"], r["vector"], { f: r[f] for f in fields })
+            for r in res
+        ]
+
     def search(self, embeds, fields=["entity"], limit=10):
 
         dim = len(embeds)
@@ -110,29 +162,50 @@ class EntityVectors:
             }
         }
 
-        print("Loading...")
-        self.client.load_collection(
-            collection_name=coll,
-        )
-
-        print("Searching...")
-
-        res = self.client.search(
-            collection_name=coll,
+        res = self.residency.search(
+            coll,
             data=[embeds],
             limit=limit,
             output_fields=fields,
             search_params=search_params,
         )[0]
 
+        return res
+
+    # Searches with many vectors in one request per collection.  Returns a
+    # list of hit lists, one per vector, in the same order.
+    def search_many(self, embeds, fields=["entity"], limit=10):
+
+        search_params = {
+            "metric_type": "COSINE",
+            "params": {
+                "radius": 0.1,
+                "range_filter": 0.8
+            }
+        }
+
+        by_dim = {}
 
-        # If reload time has passed, unload collection
-        if time.time() > self.next_reload:
-            print("Unloading, reload at", self.next_reload)
-            self.client.release_collection(
-                collection_name=coll,
+        for i, vec in enumerate(embeds):
+            by_dim.setdefault(len(vec), []).append(i)
+
+        results = [ None ] * len(embeds)
+
+        for dim, ixs in by_dim.items():
+
+            if dim not in self.collections:
+                self.init_collection(dim)
+
+            res = self.residency.search(
+                self.collections[dim],
+                data=[ embeds[i] for i in ixs ],
+                limit=limit,
+                output_fields=fields,
+                search_params=search_params,
             )
-            self.next_reload = time.time() + self.reload_time
 
-        return res
+            for i, hits in zip(ixs, res):
+                results[i] = hits
+
+        return results
 
@@ -1,10 +1,11 @@
 
 from pymilvus import MilvusClient, CollectionSchema, FieldSchema, DataType
-import time
+from . milvus_residency import CollectionResidency
 
 class ObjectVectors:
 
-    def __init__(self, uri="http://localhost:19530", prefix='obj'):
+    def __init__(self, uri="http://localhost:19530", prefix='obj',
+                 max_loaded=10):
 
         self.client = MilvusClient(uri=uri)
 
@@ -16,22 +17,26 @@ class ObjectVectors:
 
         self.prefix = prefix
 
-        # Time between reloads
-        self.reload_time = 90
-
-        # Next time to reload - this forces a reload at next window
-        self.next_reload = time.time() + self.reload_time
-        print("Reload at", self.next_reload)
+        # Collections stay loaded between searches
+        self.residency = CollectionResidency(
+            self.client, max_loaded=max_loaded
+        )
 
     def init_collection(self, dimension, name):
 
-        collection_name = self.prefix + "_" + name + "_" + str(dimension)
+        # The v2 schema has writer-set string IDs.  Collections from before,
+        # with auto-assigned integer IDs, have no suffix and are left alone.
+        collection_name = (
+            self.prefix + "_" + name + "_" + str(dimension) + "_v2"
+        )
 
+        # IDs are set by the writer, so that re-writing a point replaces it
         pkey_field = FieldSchema(
             name="id",
-            dtype=DataType.INT64,
+            dtype=DataType.VARCHAR,
+            max_length=64,
             is_primary=True,
-            auto_id=True,
+            auto_id=False,
         )
 
         vec_field = FieldSchema(
@@ -88,7 +93,7 @@ class ObjectVectors:
 
         self.collections[(dimension, name)] = collection_name
 
-    def insert(self, embeds, name, key_name, key):
+    def insert(self, id, embeds, name, key_name, key):
 
         dim = len(embeds)
 
@@ -97,6 +102,7 @@ class ObjectVectors:
     
         data = [
             {
+                "id": id,
                 "vector": embeds,
                 "name": name,
                 "key_name": key_name,
@@ -104,11 +110,38 @@ class ObjectVectors:
             }
         ]
 
-        self.client.insert(
+        self.client.upsert(
             collection_name=self.collections[(dim, name)],
             data=data
         )
 
+    # Upserts a list of (id, embeds, name, key_name, key) tuples, with one
+    # upsert per collection
+    def insert_many(self, items):
+
+        data = {}
+
+        for id, embeds, name, key_name, key in items:
+
+            dim = len(embeds)
+
+            if (dim, name) not in self.collections:
+                self.init_collection(dim, name)
+
+            data.setdefault((dim, name), []).append({
+                "id": id,
+                "vector": embeds,
+                "name": name,
+                "key_name": key_name,
+                "key": key,
+            })
+
+        for coll, rows in data.items():
+            self.client.upsert(
+                collection_name=self.collections[coll],
+                data=rows
+            )
+
     def search(self, embeds, name, fields=["key_name", "name"], limit=10):
 
         dim = len(embeds)
@@ -126,29 +159,13 @@ class ObjectVectors:
             }
         }
 
-        print("Loading...")
-        self.client.load_collection(
-            collection_name=coll,
-        )
-
-        print("Searching...")
-
-        res = self.client.search(
-            collection_name=coll,
+        res = self.residency.search(
+            coll,
             data=[embeds],
             limit=limit,
             output_fields=fields,
             search_params=search_params,
         )[0]
 
-
-        # If reload time has passed, unload collection
-        if time.time() > self.next_reload:
-            print("Unloading, reload at", self.next_reload)
-            self.client.release_collection(
-                collection_name=coll,
-            )
-            self.next_reload = time.time() + self.reload_time
-
         return res
 
@@ -0,0 +1,98 @@
+
+from prometheus_client import Histogram, Gauge, Counter
+from collections import OrderedDict
+import threading
+import time
+
+# Keeps Milvus collections loaded between searches.  A collection is loaded
+# the first time it is searched and then stays resident; when more than
+# max_loaded collections are resident the least recently searched ones are
+# released.  Load and search latency are exported as metrics.
+class CollectionResidency:
+
+    def __init__(self, client, max_loaded=10):
+
+        if not hasattr(__class__, "load_metric"):
+            __class__.load_metric = Histogram(
+                'milvus_load_latency', 'Milvus collection load latency (seconds)'
+            )
+
+        if not hasattr(__class__, "search_metric"):
+            __class__.search_metric = Histogram(
+                'milvus_search_latency', 'Milvus search latency (seconds)'
+            )
+
+        if not hasattr(__class__, "loaded_metric"):
+            __class__.loaded_metric = Gauge(
+                'milvus_loaded_collections', 'Milvus collections resident'
+            )
+
+        if not hasattr(__class__, "release_metric"):
+            __class__.release_metric = Counter(
+                'milvus_release_count', 'Milvus collections released'
+            )
+
+        self.client = client
+        self.max_loaded = max_loaded
+
+        # Resident collections, least recently used first
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, collection):
+
+        with self.lock:
+
+            if collection in self.loaded:
+                self.loaded.move_to_end(collection)
+                return
+
+            print(f"Loading {collection}...", flush=True)
+
+            with __class__.load_metric.time():
+                self.client.load_collection(collection_name=collection)
+
+            self.loaded[collection] = True
+
+            # Release cold collections to stay within the budget
+            while len(self.loaded) > self.max_loaded:
+
+                cold, _ = self.loaded.popitem(last=False)
+
+                print(f"Releasing {cold}...", flush=True)
+
+                self.client.release_collection(collection_name=cold)
+
+                __class__.release_metric.inc()
+
+            __class__.loaded_metric.set(len(self.loaded))
+
+    def forget(self, collection):
+
+        with self.lock:
+            self.loaded.pop(collection, None)
+            __class__.loaded_metric.set(len(self.loaded))
+
+    def search(self, collection, **kwargs):
+
+        self.acquire(collection)
+
+        try:
+
+            with __class__.search_metric.time():
+                return self.client.search(
+                    collection_name=collection, **kwargs
+                )
+
+        except Exception:
+
+            # The collection may have been released behind our back,
+            # reload it and try once more
+            self.forget(collection)
+            self.acquire(collection)
+
+            with __class__.search_metric.time():
+                return self.client.search(
+                    collection_name=collection, **kwargs
+                )
+
@@ -0,0 +1,95 @@
+
+from pinecone import ServerlessSpec
+import threading
+import time
+
+# Creates Pinecone indexes in the background.  Writers ask is_ready()
+# before writing to an index; if the index doesn't exist, creation is
+# started on a separate thread and False is returned, so the writer can
+# have the message redelivered later rather than blocking while Pinecone
+# provisions the index.  Ready indexes are remembered, so only the first
+# write to an index costs a call to Pinecone.
+class IndexProvisioner:
+
+    def __init__(self, pinecone, cloud, region, timeout=1000):
+
+        self.pinecone = pinecone
+        self.cloud = cloud
+        self.region = region
+        self.timeout = timeout
+
+        self.ready = set()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def is_ready(self, name, dim):
+
+        with self.lock:
+
+            if name in self.ready: return True
+            if name in self.pending: return False
+
+            self.pending.add(name)
+
+        try:
+
+            if self.pinecone.has_index(name):
+                if self.pinecone.describe_index(name).status["ready"]:
+                    with self.lock:
+                        self.pending.discard(name)
+                        self.ready.add(name)
+                    return True
+
+        except Exception:
+            with self.lock:
+                self.pending.discard(name)
+            raise
+
+        threading.Thread(
+            target=self.provision, args=(name, dim), daemon=True
+        ).start()
+
+        return False
+
+    def provision(self, name, dim):
+
+        try:
+
+            if not self.pinecone.has_index(name):
+
+                print(f"Creating index {name}...", flush=True)
+
+                self.pinecone.create_index(
+                    name = name,
+                    dimension = dim,
+                    metric = "cosine",
+                    spec = ServerlessSpec(
+                        cloud = self.cloud,
+                        region = self.region,
+                    )
+                )
+
+            start = time.time()
+
+            while not self.pinecone.describe_index(name).status["ready"]:
+
+                if time.time() - start > self.timeout:
+                    raise RuntimeError("Gave up waiting for index creation")
+
+                time.sleep(1)
+
+            print(f"Index {name} created", flush=True)
+
+            with self.lock:
+                self.ready.add(name)
+
+        except Exception as e:
+
+            # The next write to the index starts another attempt
+            print(f"Pinecone index creation failed: {e}", flush=True)
+
+        finally:
+
+            with self.lock:
+                self.pending.discard(name)
+
@@ -3,12 +3,13 @@
 Embeddings service, applies an embeddings model selected from HuggingFace.
 Input is text, output is embeddings vector.
 """
-from langchain_community.embeddings import OllamaEmbeddings
+from ollama import Client
 
 from ... schema import EmbeddingsRequest, EmbeddingsResponse
+from ... schema import EmbeddingsResult
 from ... schema import embeddings_request_queue, embeddings_response_queue
 from ... log_level import LogLevel
-from ... base import ConsumerProducer
+from ... base import ConsumerProducer, EmbeddingsCache
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -17,14 +18,23 @@ default_output_queue = embeddings_response_queue
 default_subscriber = module
 default_model="mxbai-embed-large"
 default_ollama = 'http://localhost:11434'
+default_cache_size = 1000000
 
 class Processor(ConsumerProducer):
 
+    # The Ollama client and embeddings cache are safe to share between
+    # threads
+    concurrent = True
+
     def __init__(self, **params):
 
         input_queue = params.get("input_queue", default_input_queue)
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
+        model = params.get("model", default_model)
+        ollama = params.get("ollama", default_ollama)
+        cache_path = params.get("cache_path")
+        cache_size = params.get("cache_size", default_cache_size)
 
         super(Processor, self).__init__(
             **params | {
@@ -36,7 +46,27 @@ class Processor(ConsumerProducer):
             }
         )
 
-        self.embeddings = OllamaEmbeddings(base_url=ollama, model=model)
+        self.model = model
+        self.ollama = Client(host=ollama)
+
+        if cache_path:
+            self.cache = EmbeddingsCache(cache_path, max_size=cache_size)
+        else:
+            self.cache = None
+
+    # Single and batch requests both go through Ollama's embed API, which
+    # takes every text in one request, so a text gets the same vector
+    # whichever form of request carries it
+    def embed(self, texts):
+
+        def embed_texts(texts):
+            resp = self.ollama.embed(model=self.model, input=texts)
+            return resp["embeddings"]
+
+        if self.cache:
+            return self.cache.embed(self.model, texts, embed_texts)
+
+        return embed_texts(texts)
 
     def handle(self, msg):
 
@@ -48,11 +78,26 @@ class Processor(ConsumerProducer):
 
         print(f"Handling input {id}...", flush=True)
 
-        text = v.text
-        embeds = self.embeddings.embed_query([text])
+        # An empty texts list is a batch with no texts, not a single text
+        if v.texts is not None:
+
+            # Batch request, one result per text
+            embeds = self.embed(v.texts) if v.texts else []
+
+            print("Send response...", flush=True)
+            r = EmbeddingsResponse(
+                results=[
+                    EmbeddingsResult(vectors=[vector])
+                    for vector in embeds
+                ]
+            )
+
+        else:
 
-        print("Send response...", flush=True)
-        r = EmbeddingsResponse(vectors=[embeds])
+            embeds = self.embed([v.text])[0]
+
+            print("Send response...", flush=True)
+            r = EmbeddingsResponse(vectors=[embeds])
 
         self.producer.send(r, properties={"id": id})
 
@@ -66,6 +111,8 @@ class Processor(ConsumerProducer):
             default_output_queue,
         )
 
+        ConsumerProducer.add_concurrency_args(parser)
+
         parser.add_argument(
             '-m', '--model',
             default=default_model,
@@ -78,6 +125,18 @@ class Processor(ConsumerProducer):
             help=f'ollama (default: {default_ollama})'
         )
 
+        parser.add_argument(
+            '--cache-path',
+            help=f'Embeddings cache database file (default: no cache)'
+        )
+
+        parser.add_argument(
+            '--cache-size',
+            type=int,
+            default=default_cache_size,
+            help=f'Max embeddings cache entries (default: {default_cache_size})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
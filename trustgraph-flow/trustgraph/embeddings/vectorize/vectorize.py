@@ -16,6 +16,8 @@ module = ".".join(__name__.split(".")[1:-1])
 default_input_queue = chunk_ingest_queue
 default_output_queue = chunk_embeddings_ingest_queue
 default_subscriber = module
+default_batch_size = 1
+default_batch_wait_ms = 50
 
 class Processor(ConsumerProducer):
 
@@ -30,6 +32,8 @@ class Processor(ConsumerProducer):
         emb_response_queue = params.get(
             "embeddings_response_queue", embeddings_response_queue
         )
+        batch_size = params.get("batch_size", default_batch_size)
+        batch_wait_ms = params.get("batch_wait_ms", default_batch_wait_ms)
 
         super(Processor, self).__init__(
             **params | {
@@ -43,6 +47,9 @@ class Processor(ConsumerProducer):
             }
         )
 
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+
         self.embeddings = EmbeddingsClient(
             pulsar_host=self.pulsar_host,
             input_queue=emb_request_queue,
@@ -55,6 +62,55 @@ class Processor(ConsumerProducer):
         r = ChunkEmbeddings(metadata=metadata, chunk=chunk, vectors=vectors)
         self.producer.send(r)
 
+    def run(self):
+
+        if self.batch_size <= 1:
+            return super(Processor, self).run()
+
+        # Batch mode: collect up to batch_size chunks, waiting at most
+        # batch_wait_ms after the first one, and embed them all with one
+        # embeddings request
+
+        ConsumerProducer.state_metric.state('running')
+
+        while True:
+
+            msgs = self.receive_batch(self.batch_size, self.batch_wait_ms)
+
+            with ConsumerProducer.request_metric.time():
+                self.handle_batch(msgs)
+
+            for msg in msgs:
+                self.consumer.acknowledge(msg)
+
+            ConsumerProducer.processing_metric.labels(
+                status="success"
+            ).inc(len(msgs))
+
+    def handle_batch(self, msgs):
+
+        chunks = [ msg.value() for msg in msgs ]
+
+        print(f"Indexing {len(chunks)} chunks...", flush=True)
+
+        try:
+
+            texts = [ v.chunk.decode("utf-8") for v in chunks ]
+
+            results = self.embeddings.request_batch(texts)
+
+            for v, text, vectors in zip(chunks, texts, results):
+                self.emit(
+                    metadata=v.metadata,
+                    chunk=text.encode("utf-8"),
+                    vectors=vectors
+                )
+
+        except Exception as e:
+            print("Exception:", e, flush=True)
+
+        print("Done.", flush=True)
+
     def handle(self, msg):
 
         v = msg.value()
@@ -97,6 +153,20 @@ class Processor(ConsumerProducer):
             help=f'Embeddings request queue (default: {embeddings_response_queue})',
         )
 
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=default_batch_size,
+            help=f'Max chunks embedded per request (default: {default_batch_size})'
+        )
+
+        parser.add_argument(
+            '--batch-wait-ms',
+            type=int,
+            default=default_batch_wait_ms,
+            help=f'Max time to wait to fill a batch, milliseconds (default: {default_batch_wait_ms})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
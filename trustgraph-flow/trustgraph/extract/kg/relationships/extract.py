@@ -18,7 +18,7 @@ from .... schema import prompt_response_queue
 from .... log_level import LogLevel
 from .... clients.prompt_client import PromptClient
 from .... rdf import RDF_LABEL, TRUSTGRAPH_ENTITIES, SUBJECT_OF
-from .... base import ConsumerProducer
+from .... base import ConsumerProducer, LruCache
 
 RDF_LABEL_VALUE = Value(value=RDF_LABEL, is_uri=True)
 SUBJECT_OF_VALUE = Value(value=SUBJECT_OF, is_uri=True)
@@ -29,6 +29,7 @@ default_input_queue = chunk_embeddings_ingest_queue
 default_output_queue = triples_store_queue
 default_vector_queue = graph_embeddings_store_queue
 default_subscriber = module
+default_dedup_window = 0
 
 class Processor(ConsumerProducer):
 
@@ -44,6 +45,7 @@ class Processor(ConsumerProducer):
         pr_response_queue = params.get(
             "prompt_response_queue", prompt_response_queue
         )
+        dedup_window = params.get("dedup_window", default_dedup_window)
 
         super(Processor, self).__init__(
             **params | {
@@ -81,6 +83,16 @@ class Processor(ConsumerProducer):
             subscriber = module + "-prompt",
         )
 
+        # Entities already emitted in recent chunks, keyed by (user,
+        # collection, entity).  Disabled with a zero window, in which case
+        # embeddings are only deduplicated within a chunk.
+        if dedup_window > 0:
+            self.recent = LruCache(
+                "relationships-entities", max_size=dedup_window
+            )
+        else:
+            self.recent = None
+
     def to_uri(self, text):
 
         part = text.replace(" ", "-").lower().encode("utf-8")
@@ -101,7 +113,21 @@ class Processor(ConsumerProducer):
         )
         self.producer.send(t)
 
-    def emit_vec(self, metadata, ent, vec):
+    def emit_vec(self, metadata, ent, vec, emitted):
+
+        # Each entity gets its embedding emitted once per chunk, however
+        # many relationships it appears in
+        if ent.value in emitted: return
+
+        emitted.add(ent.value)
+
+        if self.recent is not None:
+
+            key = (metadata.user, metadata.collection, ent.value)
+
+            if key in self.recent: return
+
+            self.recent.put(key, True)
 
         r = GraphEmbeddings(metadata=metadata, entity=ent, vectors=vec)
         self.vec_prod.send(r)
@@ -118,6 +144,7 @@ class Processor(ConsumerProducer):
             rels = self.get_relationships(chunk)
 
             triples = []
+            emitted = set()
 
             # FIXME: Putting metadata into triples store is duplicated in
             # relationships extractor too
@@ -193,11 +220,11 @@ class Processor(ConsumerProducer):
                         o=Value(value=v.metadata.id, is_uri=True)
                     ))
 
-                self.emit_vec(v.metadata, s_value, v.vectors)
-                self.emit_vec(v.metadata, p_value, v.vectors)
+                self.emit_vec(v.metadata, s_value, v.vectors, emitted)
+                self.emit_vec(v.metadata, p_value, v.vectors, emitted)
 
                 if rel.o_entity:
-                    self.emit_vec(v.metadata, o_value, v.vectors)
+                    self.emit_vec(v.metadata, o_value, v.vectors, emitted)
 
             self.emit_edges(
                 Metadata(
@@ -240,6 +267,13 @@ class Processor(ConsumerProducer):
             help=f'Prompt response queue (default: {prompt_response_queue})',
         )
 
+        parser.add_argument(
+            '--dedup-window',
+            type=int,
+            default=default_dedup_window,
+            help=f'Number of recent entities whose embeddings are not re-emitted by later chunks, 0 to only deduplicate within a chunk (default: {default_dedup_window})',
+        )
+
 def run():
 
     Processor.start(module, __doc__)
@@ -19,10 +19,22 @@ class EmbeddingsRequestor(ServiceRequestor):
         )
 
     def to_request(self, body):
+
+        if "texts" in body:
+            return EmbeddingsRequest(
+                texts=body["texts"]
+            )
+
         return EmbeddingsRequest(
             text=body["text"]
         )
 
     def from_response(self, message):
+
+        if message.results is not None:
+            return {
+                "results": [ r.vectors for r in message.results ]
+            }, True
+
         return { "vectors": message.vectors }, True
 
@@ -3,6 +3,7 @@ import asyncio
 from pulsar.schema import JsonSchema
 from aiohttp import web
 import uuid
+import json
 import logging
 
 from . publisher import Publisher
@@ -53,6 +54,9 @@ class ServiceEndpoint:
 
             print(data)
 
+            if self.requestor.streaming and data.get("streaming", False):
+                return await self.stream(request, data)
+
             async def responder(x, fin):
                 print(x)
 
@@ -67,3 +71,29 @@ class ServiceEndpoint:
                 { "error": str(e) }
             )
 
+    # Streamed responses are sent as a chunked body holding one JSON object
+    # per line, each written as soon as the service produces it
+    async def stream(self, request, data):
+
+        resp = web.StreamResponse()
+        resp.content_type = "application/x-ndjson"
+        await resp.prepare(request)
+
+        async def responder(x, fin):
+            await resp.write(
+                json.dumps(x | { "complete": fin }).encode("utf-8") + b"\n"
+            )
+
+        final = await self.requestor.process(data, responder)
+
+        # Errors are returned without calling the responder
+        if "error" in final:
+            await resp.write(
+                json.dumps(final | { "complete": True }).encode("utf-8") +
+                b"\n"
+            )
+
+        await resp.write_eof()
+
+        return resp
+
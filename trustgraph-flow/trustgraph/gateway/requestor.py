@@ -12,6 +12,10 @@ logger.setLevel(logging.INFO)
 
 class ServiceRequestor:
 
+    # Set by requestors whose service can stream its response, which the
+    # endpoint then sends as it arrives if the request asks for streaming
+    streaming = False
+
     def __init__(
             self,
             pulsar_host,
@@ -51,7 +55,12 @@ class ServiceRequestor:
 
         try:
 
-            q = self.sub.subscribe(id)
+            # A streamed response can be any number of messages, all of
+            # which are needed, so its queue is unbounded
+            if self.streaming:
+                q = self.sub.subscribe(id, max_size=0)
+            else:
+                q = self.sub.subscribe(id)
 
             await asyncio.to_thread(
                 self.pub.send, id, self.to_request(request)
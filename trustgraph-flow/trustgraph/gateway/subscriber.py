@@ -73,11 +73,15 @@ class Subscriber:
             # If handler drops out, sleep a retry
             time.sleep(2)
 
-    def subscribe(self, id):
+    # A max_size of 0 is unbounded, for responses which mustn't be dropped
+    # when the reader falls behind, e.g. streamed responses
+    def subscribe(self, id, max_size=None):
+
+        if max_size is None: max_size = self.max_size
 
         with self.lock:
 
-            q = queue.Queue(maxsize=self.max_size)
+            q = queue.Queue(maxsize=max_size)
             self.q[id] = q
 
         return q
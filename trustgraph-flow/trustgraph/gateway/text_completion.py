@@ -7,6 +7,9 @@ from . endpoint import ServiceEndpoint
 from . requestor import ServiceRequestor
 
 class TextCompletionRequestor(ServiceRequestor):
+
+    streaming = True
+
     def __init__(self, pulsar_host, timeout, auth):
 
         super(TextCompletionRequestor, self).__init__(
@@ -21,9 +24,15 @@ class TextCompletionRequestor(ServiceRequestor):
     def to_request(self, body):
         return TextCompletionRequest(
             system=body["system"],
-            prompt=body["prompt"]
+            prompt=body["prompt"],
+            streaming=body.get("streaming", False),
+            prefix_length=body.get("prefix_length", None),
         )
 
+    # Processors which don't stream leave end_of_stream unset
     def from_response(self, message):
-        return { "response": message.response }, True
+        return (
+            { "response": message.response },
+            message.end_of_stream is not False
+        )
 
@@ -1,5 +1,6 @@
 
 from .. schema import TriplesQueryRequest, TriplesQueryResponse, Triples
+from .. schema import TriplePattern
 from .. schema import triples_request_queue
 from .. schema import triples_response_queue
 
@@ -38,8 +39,21 @@ class TriplesQueryRequestor(ServiceRequestor):
 
         limit = int(body.get("limit", 10000))
 
+        if "patterns" in body:
+            patterns = [
+                TriplePattern(
+                    s = to_value(t["s"]) if "s" in t else None,
+                    p = to_value(t["p"]) if "p" in t else None,
+                    o = to_value(t["o"]) if "o" in t else None,
+                )
+                for t in body["patterns"]
+            ]
+        else:
+            patterns = None
+
         return TriplesQueryRequest(
             s = s, p = p, o = o,
+            patterns = patterns,
             limit = limit,
             user = body.get("user", "trustgraph"),
             collection = body.get("collection", "default"),
@@ -47,6 +61,15 @@ class TriplesQueryRequestor(ServiceRequestor):
 
     def from_response(self, message):
         print(message)
+
+        if message.results is not None:
+            return {
+                "results": [
+                    serialize_subgraph(r.triples)
+                    for r in message.results
+                ]
+            }, True
+
         return {
             "response": serialize_subgraph(message.triples)
         }, True
@@ -1,4 +1,7 @@
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . base import LruCache
 from . clients.graph_embeddings_client import GraphEmbeddingsClient
 from . clients.triples_query_client import TriplesQueryClient
 from . clients.embeddings_client import EmbeddingsClient
@@ -62,22 +65,53 @@ class Query:
 
         return entities
         
-    def maybe_label(self, e):
+    def get_labels(self, entities):
 
-        if e in self.rag.label_cache:
-            return self.rag.label_cache[e]
+        labels = {}
+        missing = []
 
-        res = self.rag.triples_client.request(
-            user=self.user, collection=self.collection,
-            s=e, p=LABEL, o=None, limit=1,
-        )
+        for e in set(entities):
+            label = self.rag.label_cache.get(e)
+            if label is None:
+                missing.append(e)
+            else:
+                labels[e] = label
+
+        if self.verbose:
+            print(f"Fetch {len(missing)} labels...", flush=True)
+
+        # Labels are fetched with batch queries, one (e, LABEL, ?) pattern
+        # per entity
+        size = self.rag.label_batch_size
+
+        batches = [
+            missing[i:i + size]
+            for i in range(0, len(missing), size)
+        ]
 
-        if len(res) == 0:
-            self.rag.label_cache[e] = e
-            return e
+        def fetch(batch):
+            return self.rag.triples_client.request_batch(
+                user=self.user, collection=self.collection,
+                patterns=[(e, LABEL, None) for e in batch], limit=1,
+            )
+
+        with ThreadPoolExecutor(
+                max_workers=self.rag.triple_concurrency
+        ) as executor:
+
+            for batch, results in zip(batches, executor.map(fetch, batches)):
 
-        self.rag.label_cache[e] = res[0].o.value
-        return self.rag.label_cache[e]
+                for e, res in zip(batch, results):
+
+                    if res:
+                        label = res[0].o.value
+                    else:
+                        label = e
+
+                    self.rag.label_cache.put(e, label)
+                    labels[e] = label
+
+        return labels
 
     def get_subgraph(self, query):
 
@@ -88,40 +122,44 @@ class Query:
         if self.verbose:
             print("Get subgraph...", flush=True)
 
-        for e in entities:
+        # Each entity is looked up as s, p and o.  The lookups are issued
+        # concurrently, and the subgraph is assembled as results come in.
+        patterns = [
+            pattern
+            for e in entities
+            for pattern in [(e, None, None), (None, e, None), (None, None, e)]
+        ]
 
-            res = self.rag.triples_client.request(
+        def fetch(pattern):
+            return self.rag.triples_client.request(
                 user=self.user, collection=self.collection,
-                s=e, p=None, o=None,
-                limit=self.rag.query_limit
+                s=pattern[0], p=pattern[1], o=pattern[2],
+                limit=self.rag.query_limit,
             )
 
-            for triple in res:
-                subgraph.add(
-                    (triple.s.value, triple.p.value, triple.o.value)
-                )
+        with ThreadPoolExecutor(
+                max_workers=self.rag.triple_concurrency
+        ) as executor:
 
-            res = self.rag.triples_client.request(
-                user=self.user, collection=self.collection,
-                s=None, p=e, o=None,
-                limit=self.rag.query_limit
-            )
+            futures = [
+                executor.submit(fetch, pattern)
+                for pattern in patterns
+            ]
 
-            for triple in res:
-                subgraph.add(
-                    (triple.s.value, triple.p.value, triple.o.value)
-                )
+            for fut in as_completed(futures):
 
-            res = self.rag.triples_client.request(
-                user=self.user, collection=self.collection,
-                s=None, p=None, o=e,
-                limit=self.rag.query_limit,
-            )
+                for triple in fut.result():
+                    subgraph.add(
+                        (triple.s.value, triple.p.value, triple.o.value)
+                    )
+
+                if len(subgraph) >= self.rag.max_subgraph_size:
 
-            for triple in res:
-                subgraph.add(
-                    (triple.s.value, triple.p.value, triple.o.value)
-                )
+                    # Got enough, don't wait for the rest
+                    for f in futures:
+                        f.cancel()
+
+                    break
 
         subgraph = list(subgraph)
 
@@ -141,18 +179,19 @@ class Query:
 
         subgraph = self.get_subgraph(query)
 
-        sg2 = []
-
-        for edge in subgraph:
-
-            if edge[1] == LABEL:
-                continue
+        subgraph = [
+            edge for edge in subgraph
+            if edge[1] != LABEL
+        ]
 
-            s = self.maybe_label(edge[0])
-            p = self.maybe_label(edge[1])
-            o = self.maybe_label(edge[2])
+        labels = self.get_labels([
+            ent for edge in subgraph for ent in edge
+        ])
 
-            sg2.append((s, p, o))
+        sg2 = [
+            (labels[edge[0]], labels[edge[1]], labels[edge[2]])
+            for edge in subgraph
+        ]
 
         return sg2
     
@@ -173,6 +212,10 @@ class GraphRag:
             entity_limit=50,
             triple_limit=30,
             max_subgraph_size=3000,
+            triple_concurrency=10,
+            label_batch_size=100,
+            label_cache_size=10000,
+            label_cache_ttl=600,
             module="test",
     ):
 
@@ -229,8 +272,14 @@ class GraphRag:
         self.entity_limit=entity_limit
         self.query_limit=triple_limit
         self.max_subgraph_size=max_subgraph_size
+        self.triple_concurrency=triple_concurrency
+
+        self.label_batch_size=label_batch_size
 
-        self.label_cache = {}
+        self.label_cache = LruCache(
+            "graph-rag-labels",
+            max_size=label_cache_size, ttl=label_cache_ttl,
+        )
 
         self.prompt = PromptClient(
             pulsar_host=pulsar_host,
@@ -30,6 +30,16 @@ class Processor(Consumer):
                 'output_tokens', 'Output token count'
             )
 
+        if not hasattr(__class__, "cache_read_token_metric"):
+            __class__.cache_read_token_metric = Counter(
+                'cache_read_tokens', 'Input tokens read from prompt cache'
+            )
+
+        if not hasattr(__class__, "cache_write_token_metric"):
+            __class__.cache_write_token_metric = Counter(
+                'cache_write_tokens', 'Input tokens written to prompt cache'
+            )
+
         if not hasattr(__class__, "input_cost_metric"):
             __class__.input_cost_metric = Counter(
                 'input_cost', 'Input cost'
@@ -51,11 +61,18 @@ class Processor(Consumer):
             }
         )
 
+    # Returns input, output, cache read and cache write prices.  Models
+    # without cache prices in the list have cached tokens charged at the
+    # input price.
     def get_prices(self, prices, modelname):
         for model in prices["price_list"]:
             if model["model_name"] == modelname:
-                return model["input_price"], model["output_price"]
-        return None, None  # Return None if model is not found
+                return (
+                    model["input_price"], model["output_price"],
+                    model.get("cache_read_price", model["input_price"]),
+                    model.get("cache_write_price", model["input_price"]),
+                )
+        return None, None, None, None  # Return None if model is not found
 
     def handle(self, msg):
 
@@ -67,18 +84,34 @@ class Processor(Consumer):
 
         print(f"Handling response {id}...", flush=True)
 
-        num_in = v.in_token
-        num_out = v.out_token
+        # Streamed responses only carry token counts on the last message
+        if v.in_token is None and v.out_token is None: return
+
+        num_in = v.in_token or 0
+        num_out = v.out_token or 0
+        num_cache_read = v.cache_read_token or 0
+        num_cache_write = v.cache_write_token or 0
 
         __class__.input_token_metric.inc(num_in)
         __class__.output_token_metric.inc(num_out)
+        __class__.cache_read_token_metric.inc(num_cache_read)
+        __class__.cache_write_token_metric.inc(num_cache_write)
 
-        model_input_price, model_output_price = self.get_prices(price_list, modelname)
+        (
+            model_input_price, model_output_price,
+            model_cache_read_price, model_cache_write_price
+        ) = self.get_prices(price_list, modelname)
 
         if model_input_price == None:
             cost_per_call = f"Model Not Found in Price list"
         else:
-            cost_in = num_in * model_input_price
+            # Input tokens include the cached tokens
+            num_uncached = num_in - num_cache_read - num_cache_write
+            cost_in = (
+                num_uncached * model_input_price +
+                num_cache_read * model_cache_read_price +
+                num_cache_write * model_cache_write_price
+            )
             cost_out = num_out * model_output_price
             cost_per_call = round(cost_in + cost_out, 6)
 
@@ -87,6 +120,8 @@ class Processor(Consumer):
 
         print(f"Input Tokens: {num_in}", flush=True)
         print(f"Output Tokens: {num_out}", flush=True)
+        print(f"Cache Read Tokens: {num_cache_read}", flush=True)
+        print(f"Cache Write Tokens: {num_cache_write}", flush=True)
         print(f"Cost for call: ${cost_per_call}", flush=True)
 
     @staticmethod
@@ -1,8 +1,11 @@
 
 import ibis
 import json
-from jsonschema import validate
-import re
+import logging
+from jsonschema import Draft7Validator
+from jsonschema.validators import validator_for
+
+logger = logging.getLogger("prompt")
 
 from trustgraph.clients.llm_client import LlmClient
 
@@ -21,9 +24,10 @@ class Prompt:
 
 class PromptManager:
 
-    def __init__(self, llm, config):
+    def __init__(self, llm, config, cache=None):
         self.llm = llm
         self.config = config
+        self.cache = cache
         self.terms = config.global_terms
 
         self.prompts = config.prompts
@@ -43,16 +47,60 @@ class PromptManager:
             if v.terms is None:
                 v.terms = {}
 
+        # The literal text at the start of each template, up to the first
+        # tag, is the same in every request, so can be cached by the LLM
+        # provider along with the system prompt
+        self.prefixes = {}
+        for k, v in self.prompts.items():
+            tags = [
+                ix for ix in (
+                    v.template.find("{{"), v.template.find("{%"),
+                    v.template.find("{#")
+                )
+                if ix >= 0
+            ]
+            self.prefixes[k] = min(tags, default=len(v.template))
+
+        # Schema validators are built once, rather than on every response
+        self.validators = {}
+        for k, v in self.prompts.items():
+            if v.schema:
+                try:
+                    cls = validator_for(v.schema, default=Draft7Validator)
+                    cls.check_schema(v.schema)
+                    self.validators[k] = cls(v.schema)
+                except Exception as e:
+                    raise RuntimeError(f"Error in schema: {k}: {e}")
+
     def parse_json(self, text):
-        json_match = re.search(r'```(?:json)?(.*?)```', text, re.DOTALL)
-    
-        if json_match:
-            json_str = json_match.group(1).strip()
-        else:
-            # If no delimiters, assume the entire output is JSON
-            json_str = text.strip()
 
-        return json.loads(json_str)
+        text = text.strip()
+
+        # Fast path, the entire output is JSON
+        if text[:1] in ("{", "["):
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                pass
+
+        # Otherwise, look for JSON in a ``` or ```json block
+        start = text.find("```")
+
+        if start >= 0:
+
+            end = text.find("```", start + 3)
+
+            if end >= 0:
+
+                json_str = text[start + 3:end]
+
+                if json_str.startswith("json"):
+                    json_str = json_str[4:]
+
+                return json.loads(json_str.strip())
+
+        # If no delimiters, assume the entire output is JSON
+        return json.loads(text)
 
     def invoke(self, id, input):
 
@@ -68,11 +116,29 @@ class PromptManager:
             "prompt": self.templates[id].render(terms)
         }
 
-        resp = self.llm.request(**prompt)
+        resp = None
 
-        print(resp, flush=True)
+        if self.cache:
+            resp = self.cache.get(id, **prompt)
+
+        if resp is None:
+            resp = self.llm.request(
+                prefix_length=self.prefixes[id], **prompt
+            )
+            cached = False
+        else:
+            cached = True
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                "prompt": id, "system": prompt["system"],
+                "request": prompt["prompt"], "cached": cached,
+                "response": resp,
+            }))
 
         if resp_type == "text":
+            if self.cache and not cached:
+                self.cache.put(id, response=resp, **prompt)
             return resp
 
         if resp_type != "json":
@@ -83,13 +149,15 @@ class PromptManager:
         except:
             raise RuntimeError("JSON parse fail")
 
-        print(obj, flush=True)
-        if self.prompts[id].schema:
+        if id in self.validators:
             try:
-                print(self.prompts[id].schema)
-                validate(instance=obj, schema=self.prompts[id].schema)
+                self.validators[id].validate(obj)
             except Exception as e:
                 raise RuntimeError(f"Schema validation fail: {e}")
 
+        # Only responses which parsed and validated are cached
+        if self.cache and not cached:
+            self.cache.put(id, response=resp, **prompt)
+
         return obj
 
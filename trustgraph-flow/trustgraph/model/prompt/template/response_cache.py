@@ -0,0 +1,122 @@
+
+from prometheus_client import Counter
+import hashlib
+import sqlite3
+import threading
+import json
+import time
+
+from .... base import LruCache
+
+# Persistent store for cached responses, in a local SQLite database.  Any
+# object with the same get/put methods can be used as a store.
+class SqliteResponseStore:
+
+    def __init__(self, path):
+
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+
+        self.db.execute("""
+            create table if not exists responses (
+                key text primary key,
+                response text,
+                expiry real
+            )
+        """)
+
+        self.db.commit()
+
+    def get(self, key):
+
+        with self.lock:
+
+            row = self.db.execute(
+                "select response, expiry from responses where key = ?",
+                (key,)
+            ).fetchone()
+
+        if row is None: return None
+
+        response, expiry = row
+
+        if expiry is not None and expiry < time.time(): return None
+
+        return response
+
+    def put(self, key, response, expiry):
+
+        with self.lock:
+
+            self.db.execute(
+                "insert or replace into responses (key, response, expiry) values (?, ?, ?)",
+                (key, response, expiry)
+            )
+
+            # Drop expired entries as we go
+            self.db.execute(
+                "delete from responses where expiry < ?", (time.time(),)
+            )
+
+            self.db.commit()
+
+# Cache of LLM responses keyed by prompt ID, the rendered system and user
+# prompts, and the model.  Entries are held in memory with a size bound and
+# TTL, and optionally also in a persistent store so that they survive
+# restarts.  Hits and misses are counted per prompt ID.
+class ResponseCache:
+
+    def __init__(self, model="", max_size=10000, ttl=None, store=None):
+
+        if not hasattr(__class__, "lookup_metric"):
+            __class__.lookup_metric = Counter(
+                'prompt_cache_count', 'Prompt response cache lookups',
+                ["prompt", "result"]
+            )
+
+        self.model = model
+        self.ttl = ttl
+        self.store = store
+        self.memory = LruCache("prompt-responses", max_size=max_size, ttl=ttl)
+
+    def key(self, id, system, prompt):
+        return hashlib.sha256(
+            json.dumps([self.model, id, system, prompt]).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, id, system, prompt):
+
+        key = self.key(id, system, prompt)
+
+        response = self.memory.get(key)
+
+        if response is None and self.store is not None:
+
+            response = self.store.get(key)
+
+            if response is not None:
+                self.memory.put(key, response)
+
+        if response is None:
+            __class__.lookup_metric.labels(prompt=id, result="miss").inc()
+        else:
+            __class__.lookup_metric.labels(prompt=id, result="hit").inc()
+
+        return response
+
+    def put(self, id, system, prompt, response):
+
+        key = self.key(id, system, prompt)
+
+        self.memory.put(key, response)
+
+        if self.store is not None:
+
+            if self.ttl:
+                expiry = time.time() + self.ttl
+            else:
+                expiry = None
+
+            self.store.put(key, response, expiry)
+
@@ -4,6 +4,7 @@ Language service abstracts prompt engineering from LLM.
 """
 
 import json
+import logging
 import re
 
 from .... schema import Definition, Relationship, Triple
@@ -14,15 +15,22 @@ from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... schema import prompt_request_queue, prompt_response_queue
 from .... base import ConsumerProducer
+from .... log_level import LogLevel
 from .... clients.llm_client import LlmClient
 
 from . prompt_manager import PromptConfiguration, Prompt, PromptManager
+from . response_cache import ResponseCache, SqliteResponseStore
+
+logger = logging.getLogger("prompt")
 
 module = ".".join(__name__.split(".")[1:-1])
 
 default_input_queue = prompt_request_queue
 default_output_queue = prompt_response_queue
 default_subscriber = module
+default_cache_size = 0
+default_cache_ttl = 3600
+default_llm_model = "default"
 
 class Processor(ConsumerProducer):
 
@@ -91,8 +99,6 @@ class Processor(ConsumerProducer):
                     raise RuntimeError(f"Global term arg not well-formed: {t}")
                 global_terms[toks[0]] = toks[1]
 
-        print(global_terms)
-
         prompts = {
             k: Prompt(**v)
             for k, v in prompt_base.items()
@@ -119,6 +125,10 @@ class Processor(ConsumerProducer):
         rows_template = params.get("rows_template")
         knowledge_query_template = params.get("knowledge_query_template")
         document_query_template = params.get("document_query_template")
+        cache_size = params.get("cache_size", default_cache_size)
+        cache_ttl = params.get("cache_ttl", default_cache_ttl)
+        cache_path = params.get("cache_path")
+        llm_model = params.get("llm_model", default_llm_model)
 
         super(Processor, self).__init__(
             **params | {
@@ -139,20 +149,36 @@ class Processor(ConsumerProducer):
             pulsar_host = self.pulsar_host
         )
 
-        # System prompt hack
-        class Llm:
-            def __init__(self, llm):
-                self.llm = llm
-            def request(self, system, prompt):
-                print(system)
-                print(prompt, flush=True)
-                return self.llm.request(system, prompt)
+        # Rendered prompts and responses are logged, as JSON lines, when
+        # the log level is debug
+        logging.basicConfig(format="%(message)s")
+
+        if params.get("log_level", LogLevel.INFO) == LogLevel.DEBUG:
+            logger.setLevel(logging.DEBUG)
+        else:
+            logger.setLevel(logging.INFO)
 
-        self.llm = Llm(self.llm)
+        if cache_size > 0:
+
+            if cache_path:
+                store = SqliteResponseStore(cache_path)
+            else:
+                store = None
+
+            cache = ResponseCache(
+                model = llm_model,
+                max_size = cache_size,
+                ttl = cache_ttl,
+                store = store,
+            )
+
+        else:
+            cache = None
 
         self.manager = PromptManager(
             llm = self.llm,
             config = prompt_configuration,
+            cache = cache,
         )
 
     def handle(self, msg):
@@ -167,22 +193,18 @@ class Processor(ConsumerProducer):
 
         try:
 
-            print(v.terms)
-
             input = {
                 k: json.loads(v)
                 for k, v in v.terms.items()
             }
             
             print(f"Handling kind {kind}...", flush=True)
-            print(input, flush=True)
 
             resp = self.manager.invoke(kind, input)
 
             if isinstance(resp, str):
 
                 print("Send text response...", flush=True)
-                print(resp, flush=True)
 
                 r = PromptResponse(
                     text=resp,
@@ -197,7 +219,6 @@ class Processor(ConsumerProducer):
             else:
 
                 print("Send object response...", flush=True)
-                print(json.dumps(resp, indent=4), flush=True)
 
                 r = PromptResponse(
                     text=None,
@@ -291,6 +312,31 @@ class Processor(ConsumerProducer):
             help=f'Global term, form key:value'
         )
 
+        parser.add_argument(
+            '--cache-size',
+            type=int,
+            default=default_cache_size,
+            help=f'Max LLM responses cached in memory, 0 disables the cache (default: {default_cache_size})'
+        )
+
+        parser.add_argument(
+            '--cache-ttl',
+            type=int,
+            default=default_cache_ttl,
+            help=f'Cached response lifetime, seconds (default: {default_cache_ttl})'
+        )
+
+        parser.add_argument(
+            '--cache-path',
+            help=f'Database file which keeps cached responses across restarts (default: memory only)'
+        )
+
+        parser.add_argument(
+            '--llm-model',
+            default=default_llm_model,
+            help=f'Name of the model behind the text completion queue, part of the cache key (default: {default_llm_model})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
@@ -13,7 +13,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -27,7 +27,7 @@ default_model = "AzureAI"
 default_endpoint = os.getenv("AZURE_ENDPOINT")
 default_token = os.getenv("AZURE_TOKEN")
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
 
@@ -154,26 +154,12 @@ class Processor(ConsumerProducer):
             print("Send response...", flush=True)
 
             r = TextCompletionResponse(response=resp, error=None, in_token=inputtokens, out_token=outputtokens, model=self.model)
-            self.producer.send(r, properties={"id": id})
+            self.send(r, properties={"id": id})
 
         except TooManyRequests:
 
-            print("Send rate limit response...", flush=True)
-
-            r = TextCompletionResponse(
-                error=Error(
-                    type = "rate-limit",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
-            )
-
-            self.producer.send(r, properties={"id": id})
-
-            self.consumer.acknowledge(msg)
+            # The message is redelivered and the rate limiter backs off
+            raise
 
         except Exception as e:
 
@@ -201,7 +187,7 @@ class Processor(ConsumerProducer):
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
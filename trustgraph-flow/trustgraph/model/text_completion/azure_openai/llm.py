@@ -7,14 +7,14 @@ OpenAI endpoit service.  Input is prompt, output is response.
 import requests
 import json
 from prometheus_client import Histogram
-from openai import AzureOpenAI
+from openai import AzureOpenAI, RateLimitError
 import os
 
 from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -28,7 +28,7 @@ default_api = "2024-02-15-preview"
 default_endpoint = os.getenv("AZURE_ENDPOINT")
 default_token = os.getenv("AZURE_TOKEN")
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
 
@@ -127,26 +127,12 @@ class Processor(ConsumerProducer):
             print("Send response...", flush=True)
 
             r = TextCompletionResponse(response=resp.choices[0].message.content, error=None, in_token=inputtokens, out_token=outputtokens, model=self.model)
-            self.producer.send(r, properties={"id": id})
-
-        except TooManyRequests:
+            self.send(r, properties={"id": id})
 
-            print("Send rate limit response...", flush=True)
+        except RateLimitError:
 
-            r = TextCompletionResponse(
-                error=Error(
-                    type = "rate-limit",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
-            )
-
-            self.producer.send(r, properties={"id": id})
-
-            self.consumer.acknowledge(msg)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
 
         except Exception as e:
 
@@ -174,7 +160,7 @@ class Processor(ConsumerProducer):
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
@@ -12,7 +12,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -25,7 +25,7 @@ default_temperature = 0.0
 default_max_output = 8192
 default_api_key = os.getenv("CLAUDE_KEY")
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
     
@@ -83,65 +83,50 @@ class Processor(ConsumerProducer):
 
         print(f"Handling prompt {id}...", flush=True)
 
-        prompt = v.prompt
-
         try:
 
-            # FIXME: Rate limits?
+            if v.streaming:
+
+                with __class__.text_completion_metric.time():
+                    self.stream(id, v)
+
+                print("Done.", flush=True)
+
+                return
 
             with __class__.text_completion_metric.time():
 
-                response = message = self.claude.messages.create(
+                response = self.claude.messages.create(
                     model=self.model,
                     max_tokens=self.max_output,
                     temperature=self.temperature,
-                    system = v.system,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                }
-                            ]
-                        }
-                    ]
+                    **self.prompt(v)
                 )
 
             resp = response.content[0].text
-            inputtokens = response.usage.input_tokens
-            outputtokens = response.usage.output_tokens
+            inputtokens, outputtokens, cacheread, cachewrite = self.token_counts(
+                response.usage
+            )
             print(resp, flush=True)
             print(f"Input Tokens: {inputtokens}", flush=True)
             print(f"Output Tokens: {outputtokens}", flush=True)
+            print(f"Cache Read Tokens: {cacheread}", flush=True)
+            print(f"Cache Write Tokens: {cachewrite}", flush=True)
 
             print("Send response...", flush=True)
-            r = TextCompletionResponse(response=resp, error=None, in_token=inputtokens, out_token=outputtokens, model=self.model)
+            r = TextCompletionResponse(
+                response=resp, error=None, in_token=inputtokens,
+                out_token=outputtokens, model=self.model,
+                cache_read_token=cacheread, cache_write_token=cachewrite,
+            )
             self.send(r, properties={"id": id})
 
             print("Done.", flush=True)
 
-        # FIXME: Wrong exception, don't know what this LLM throws
-        # for a rate limit
-        except TooManyRequests:
-
-            print("Send rate limit response...", flush=True)
-
-            r = TextCompletionResponse(
-                error=Error(
-                    type = "rate-limit",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
-            )
-
-            self.producer.send(r, properties={"id": id})
+        except anthropic.RateLimitError:
 
-            self.consumer.acknowledge(msg)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
 
         except Exception as e:
 
@@ -164,10 +149,123 @@ class Processor(ConsumerProducer):
 
             self.consumer.acknowledge(msg)
 
+    # System prompt and messages for a request.  If the request has a
+    # stable prefix, the system prompt and the prefix are marked with cache
+    # breakpoints, so that the provider caches them.
+    def prompt(self, v):
+
+        if v.prefix_length is None:
+            return {
+                "system": v.system,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": v.prompt
+                            }
+                        ]
+                    }
+                ]
+            }
+
+        cache = { "type": "ephemeral" }
+
+        system = []
+
+        if v.system:
+            system.append({
+                "type": "text", "text": v.system, "cache_control": cache
+            })
+
+        prefix = v.prompt[:v.prefix_length]
+        rest = v.prompt[v.prefix_length:]
+
+        content = []
+
+        if prefix:
+            content.append({
+                "type": "text", "text": prefix, "cache_control": cache
+            })
+
+        if rest or not content:
+            content.append({ "type": "text", "text": rest })
+
+        return {
+            "system": system,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content,
+                }
+            ]
+        }
+
+    # Returns input, output, cache read and cache write token counts.
+    # Claude counts cached input tokens separately, they are added into
+    # the input count.
+    def token_counts(self, usage):
+
+        cacheread = getattr(usage, "cache_read_input_tokens", None) or 0
+        cachewrite = getattr(usage, "cache_creation_input_tokens", None) or 0
+
+        return (
+            usage.input_tokens + cacheread + cachewrite,
+            usage.output_tokens, cacheread, cachewrite
+        )
+
+    # Sends the completion as it is generated, one message per chunk of
+    # text, followed by an end-of-stream message with the token counts
+    def stream(self, id, v):
+
+        with self.claude.messages.stream(
+                model=self.model,
+                max_tokens=self.max_output,
+                temperature=self.temperature,
+                **self.prompt(v)
+        ) as stream:
+
+            for text in stream.text_stream:
+
+                if not text: continue
+
+                r = TextCompletionResponse(
+                    response=text,
+                    error=None,
+                    in_token=None,
+                    out_token=None,
+                    model=self.model,
+                    end_of_stream=False,
+                )
+                self.send(r, properties={"id": id})
+
+            response = stream.get_final_message()
+
+        inputtokens, outputtokens, cacheread, cachewrite = self.token_counts(
+            response.usage
+        )
+        print(f"Input Tokens: {inputtokens}", flush=True)
+        print(f"Output Tokens: {outputtokens}", flush=True)
+        print(f"Cache Read Tokens: {cacheread}", flush=True)
+        print(f"Cache Write Tokens: {cachewrite}", flush=True)
+
+        r = TextCompletionResponse(
+            response="",
+            error=None,
+            in_token=inputtokens,
+            out_token=outputtokens,
+            model=self.model,
+            end_of_stream=True,
+            cache_read_token=cacheread,
+            cache_write_token=cachewrite,
+        )
+        self.send(r, properties={"id": id})
+
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
@@ -12,7 +12,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -24,7 +24,7 @@ default_model = 'c4ai-aya-23-8b'
 default_temperature = 0.0
 default_api_key = os.getenv("COHERE_KEY")
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
     
@@ -110,26 +110,10 @@ class Processor(ConsumerProducer):
 
             print("Done.", flush=True)
 
-        # FIXME: Wrong exception, don't know what this LLM throws
-        # for a rate limit
-        except TooManyRequests:
+        except cohere.TooManyRequestsError:
 
-            print("Send rate limit response...", flush=True)
-
-            r = TextCompletionResponse(
-                error=Error(
-                    type = "rate-limit",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
-            )
-
-            self.producer.send(r, properties={"id": id})
-
-            self.consumer.acknowledge(msg)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
 
         except Exception as e:
 
@@ -155,7 +139,7 @@ class Processor(ConsumerProducer):
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
@@ -4,14 +4,14 @@ Simple LLM service, performs text prompt completion using OpenAI.
 Input is prompt, output is response.
 """
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
 from prometheus_client import Histogram
 
 from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -24,7 +24,7 @@ default_llamafile = os.getenv("LLAMAFILE_URL", "http://localhost:8080/v1")
 default_temperature = 0.0
 default_max_output = 4096
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
     
@@ -88,8 +88,6 @@ class Processor(ConsumerProducer):
 
         try:
 
-            # FIXME: Rate limits
-
             with __class__.text_completion_metric.time():
 
                 resp = self.openai.chat.completions.create(
@@ -126,26 +124,10 @@ class Processor(ConsumerProducer):
 
             print("Done.", flush=True)
 
-        # FIXME: Wrong exception, don't know what this LLM throws
-        # for a rate limit
-        except TooManyRequests:
-
-            print("Send rate limit response...", flush=True)
+        except RateLimitError:
 
-            r = TextCompletionResponse(
-                error=Error(
-                    type = "rate-limit",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
-            )
-
-            self.producer.send(r, properties={"id": id})
-
-            self.consumer.acknowledge(msg)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
 
         except Exception as e:
 
@@ -171,7 +153,7 @@ class Processor(ConsumerProducer):
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
@@ -12,7 +12,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -23,7 +23,7 @@ default_subscriber = module
 default_model = 'gemma2:9b'
 default_ollama = os.getenv("OLLAMA_HOST", 'http://localhost:11434')
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
 
@@ -84,6 +84,15 @@ class Processor(ConsumerProducer):
 
         try:
 
+            if v.streaming:
+
+                with __class__.text_completion_metric.time():
+                    self.stream(id, prompt)
+
+                print("Done.", flush=True)
+
+                return
+
             with __class__.text_completion_metric.time():
                 response = self.llm.generate(self.model, prompt)
 
@@ -100,15 +109,20 @@ class Processor(ConsumerProducer):
 
             print("Done.", flush=True)
 
-        # FIXME: Wrong exception, don't know what this LLM throws
-        # for a rate limit
         except TooManyRequests:
 
-            print("Send rate limit response...", flush=True)
+            # The message is redelivered and the rate limiter backs off
+            raise
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
+
+            print("Send error response...", flush=True)
 
             r = TextCompletionResponse(
                 error=Error(
-                    type = "rate-limit",
+                    type = "llm-error",
                     message = str(e),
                 ),
                 response=None,
@@ -121,31 +135,42 @@ class Processor(ConsumerProducer):
 
             self.consumer.acknowledge(msg)
 
-        except Exception as e:
+    # Sends the completion as it is generated, one message per chunk of
+    # text, followed by an end-of-stream message with the token counts
+    def stream(self, id, prompt):
 
-            print(f"Exception: {e}")
+        inputtokens = None
+        outputtokens = None
 
-            print("Send error response...", flush=True)
+        for chunk in self.llm.generate(self.model, prompt, stream=True):
+
+            # Token counts are only present on the final chunk
+            if chunk['done']:
+                inputtokens = int(chunk['prompt_eval_count'])
+                outputtokens = int(chunk['eval_count'])
+
+            if not chunk['response']: continue
 
             r = TextCompletionResponse(
-                error=Error(
-                    type = "llm-error",
-                    message = str(e),
-                ),
-                response=None,
-                in_token=None,
-                out_token=None,
-                model=None,
+                response=chunk['response'], error=None,
+                in_token=None, out_token=None, model="ollama",
+                end_of_stream=False,
             )
 
-            self.producer.send(r, properties={"id": id})
+            self.send(r, properties={"id": id})
 
-            self.consumer.acknowledge(msg)
+        r = TextCompletionResponse(
+            response="", error=None,
+            in_token=inputtokens, out_token=outputtokens, model="ollama",
+            end_of_stream=True,
+        )
+
+        self.send(r, properties={"id": id})
 
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
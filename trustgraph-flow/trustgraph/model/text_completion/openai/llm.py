@@ -4,15 +4,16 @@ Simple LLM service, performs text prompt completion using OpenAI.
 Input is prompt, output is response.
 """
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
 from prometheus_client import Histogram
+import hashlib
 import os
 
 from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -25,7 +26,7 @@ default_temperature = 0.0
 default_max_output = 4096
 default_api_key = os.getenv("OPENAI_TOKEN")
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
     
@@ -87,7 +88,14 @@ class Processor(ConsumerProducer):
 
         try:
 
-            # FIXME: Rate limits
+            if v.streaming:
+
+                with __class__.text_completion_metric.time():
+                    self.stream(id, prompt, self.cache_options(v))
+
+                print("Done.", flush=True)
+
+                return
 
             with __class__.text_completion_metric.time():
 
@@ -111,14 +119,17 @@ class Processor(ConsumerProducer):
                     presence_penalty=0,
                     response_format={
                         "type": "text"
-                    }
+                    },
+                    **self.cache_options(v)
                 )
             
             inputtokens = resp.usage.prompt_tokens
             outputtokens = resp.usage.completion_tokens
+            cacheread = self.cached_tokens(resp.usage)
             print(resp.choices[0].message.content, flush=True)
             print(f"Input Tokens: {inputtokens}", flush=True)
             print(f"Output Tokens: {outputtokens}", flush=True)
+            print(f"Cache Read Tokens: {cacheread}", flush=True)
 
             print("Send response...", flush=True)
             r = TextCompletionResponse(
@@ -126,21 +137,28 @@ class Processor(ConsumerProducer):
                 error=None,
                 in_token=inputtokens,
                 out_token=outputtokens,
-                model=self.model
+                model=self.model,
+                cache_read_token=cacheread,
+                cache_write_token=0,
             )
             self.send(r, properties={"id": id})
 
             print("Done.", flush=True)
 
-        # FIXME: Wrong exception, don't know what this LLM throws
-        # for a rate limit
-        except TooManyRequests:
+        except RateLimitError:
 
-            print("Send rate limit response...", flush=True)
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
+
+            print("Send error response...", flush=True)
 
             r = TextCompletionResponse(
                 error=Error(
-                    type = "rate-limit",
+                    type = "llm-error",
                     message = str(e),
                 ),
                 response=None,
@@ -153,31 +171,112 @@ class Processor(ConsumerProducer):
 
             self.consumer.acknowledge(msg)
 
-        except Exception as e:
+    # OpenAI caches prompt prefixes automatically.  Requests with the same
+    # stable prefix are given the same cache key, which routes them to
+    # the same cache.
+    def cache_options(self, v):
 
-            print(f"Exception: {e}")
+        if v.prefix_length is None: return {}
 
-            print("Send error response...", flush=True)
+        prefix = v.system + "\n\n" + v.prompt[:v.prefix_length]
+
+        return {
+            "extra_body": {
+                "prompt_cache_key": hashlib.sha256(
+                    prefix.encode("utf-8")
+                ).hexdigest()
+            }
+        }
+
+    # Input tokens read from the cache, these are included in prompt_tokens
+    def cached_tokens(self, usage):
+
+        details = getattr(usage, "prompt_tokens_details", None)
+
+        if details is None: return 0
+
+        return details.cached_tokens or 0
+
+    # Sends the completion as it is generated, one message per chunk of
+    # text, followed by an end-of-stream message with the token counts
+    def stream(self, id, prompt, options):
+
+        resp = self.openai.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        }
+                    ]
+                }
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_output,
+            top_p=1,
+            frequency_penalty=0,
+            presence_penalty=0,
+            response_format={
+                "type": "text"
+            },
+            stream=True,
+            stream_options={
+                "include_usage": True
+            },
+            **options
+        )
+
+        inputtokens = None
+        outputtokens = None
+        cacheread = None
+
+        for chunk in resp:
+
+            # The usage chunk comes last, with no choices
+            if chunk.usage:
+                inputtokens = chunk.usage.prompt_tokens
+                outputtokens = chunk.usage.completion_tokens
+                cacheread = self.cached_tokens(chunk.usage)
+
+            if not chunk.choices: continue
+
+            text = chunk.choices[0].delta.content
+
+            if not text: continue
 
             r = TextCompletionResponse(
-                error=Error(
-                    type = "llm-error",
-                    message = str(e),
-                ),
-                response=None,
+                response=text,
+                error=None,
                 in_token=None,
                 out_token=None,
-                model=None,
+                model=self.model,
+                end_of_stream=False,
             )
+            self.send(r, properties={"id": id})
 
-            self.producer.send(r, properties={"id": id})
-
-            self.consumer.acknowledge(msg)
+        print(f"Input Tokens: {inputtokens}", flush=True)
+        print(f"Output Tokens: {outputtokens}", flush=True)
+        print(f"Cache Read Tokens: {cacheread}", flush=True)
+
+        r = TextCompletionResponse(
+            response="",
+            error=None,
+            in_token=inputtokens,
+            out_token=outputtokens,
+            model=self.model,
+            end_of_stream=True,
+            cache_read_token=cacheread,
+            cache_write_token=0,
+        )
+        self.send(r, properties={"id": id})
 
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )
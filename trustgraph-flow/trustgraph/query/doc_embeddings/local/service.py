@@ -0,0 +1,112 @@
+
+"""
+Document embeddings query service.  Input is vector, output is an array
+of chunks.  Searches a local vector store held in memory-mapped files.
+"""
+
+from .... direct.local_vectors import LocalVectors
+from .... schema import DocumentEmbeddingsRequest, DocumentEmbeddingsResponse
+from .... schema import Error, Value
+from .... schema import document_embeddings_request_queue
+from .... schema import document_embeddings_response_queue
+from .... base import ConsumerProducer
+
+module = ".".join(__name__.split(".")[1:-1])
+
+default_input_queue = document_embeddings_request_queue
+default_output_queue = document_embeddings_response_queue
+default_subscriber = module
+default_store_path = 'vectors'
+
+class Processor(ConsumerProducer):
+
+    def __init__(self, **params):
+
+        input_queue = params.get("input_queue", default_input_queue)
+        output_queue = params.get("output_queue", default_output_queue)
+        subscriber = params.get("subscriber", default_subscriber)
+        store_path = params.get("store_path", default_store_path)
+
+        super(Processor, self).__init__(
+            **params | {
+                "input_queue": input_queue,
+                "output_queue": output_queue,
+                "subscriber": subscriber,
+                "input_schema": DocumentEmbeddingsRequest,
+                "output_schema": DocumentEmbeddingsResponse,
+                "store_path": store_path,
+            }
+        )
+
+        self.vecstore = LocalVectors(store_path)
+
+    def handle(self, msg):
+
+        try:
+
+            v = msg.value()
+
+            # Sender-produced ID
+            id = msg.properties()["id"]
+
+            print(f"Handling input {id}...", flush=True)
+
+            chunks = []
+
+            for vec in v.vectors:
+
+                dim = len(vec)
+                collection = (
+                    "d_" + v.user + "_" + v.collection + "_" +
+                    str(dim)
+                )
+
+                results = self.vecstore.index(collection, dim).search(
+                    [vec], limit=v.limit
+                )
+
+                for payload, score in results:
+                    chunks.append(payload["doc"])
+
+            print("Send response...", flush=True)
+            r = DocumentEmbeddingsResponse(documents=chunks, error=None)
+            self.producer.send(r, properties={"id": id})
+
+            print("Done.", flush=True)
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
+
+            print("Send error response...", flush=True)
+
+            r = DocumentEmbeddingsResponse(
+                error=Error(
+                    type = "llm-error",
+                    message = str(e),
+                ),
+                documents=None,
+            )
+
+            self.producer.send(r, properties={"id": id})
+
+            self.consumer.acknowledge(msg)
+
+    @staticmethod
+    def add_args(parser):
+
+        ConsumerProducer.add_args(
+            parser, default_input_queue, default_subscriber,
+            default_output_queue,
+        )
+
+        parser.add_argument(
+            '-t', '--store-path',
+            default=default_store_path,
+            help=f'Vector store directory (default: {default_store_path})'
+        )
+
+def run():
+
+    Processor.start(module, __doc__)
+
@@ -4,19 +4,38 @@ Document embeddings query service.  Input is vector, output is an array
 of chunks
 """
 
+from pulsar.schema import JsonSchema
+import threading
+import pulsar
+import time
+
 from .... direct.milvus_doc_embeddings import DocVectors
 from .... schema import DocumentEmbeddingsRequest, DocumentEmbeddingsResponse
 from .... schema import Error, Value
 from .... schema import document_embeddings_request_queue
 from .... schema import document_embeddings_response_queue
-from .... base import ConsumerProducer
+from .... schema import ChunkEmbeddings, chunk_embeddings_ingest_queue
+from .... base import ConsumerProducer, point_id, read_since
+from .... direct.local_vectors import MemoryVectors
 
 module = ".".join(__name__.split(".")[1:-1])
 
 default_input_queue = document_embeddings_request_queue
 default_output_queue = document_embeddings_response_queue
 default_subscriber = module
+default_store_queue = chunk_embeddings_ingest_queue
+default_exact_max_size = 0
+default_exact_max_collections = 100
 default_store_uri = 'http://localhost:19530'
+default_max_loaded = 10
+
+# Largest result set Milvus will return for a query
+max_fetch = 16384
+
+# In hybrid mode, a collection read from the store is topped up with store
+# messages published from this many seconds before the read, which covers
+# writes still buffered by a writer when the store was read
+replay_window = 60
 
 class Processor(ConsumerProducer):
 
@@ -26,6 +45,14 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         store_uri = params.get("store_uri", default_store_uri)
+        store_queue = params.get("store_queue", default_store_queue)
+        exact_max_size = params.get(
+            "exact_max_size", default_exact_max_size
+        )
+        exact_max_collections = params.get(
+            "exact_max_collections", default_exact_max_collections
+        )
+        max_loaded = params.get("max_loaded", default_max_loaded)
 
         super(Processor, self).__init__(
             **params | {
@@ -38,7 +65,96 @@ class Processor(ConsumerProducer):
             }
         )
 
-        self.vecstore = DocVectors(store_uri)
+        self.vecstore = DocVectors(store_uri, max_loaded=max_loaded)
+
+        # Hybrid mode: small collections are searched in memory, and kept
+        # in sync by reading the store queue
+        if exact_max_size > 0:
+
+            # A collection is read in one query, for one more point than
+            # fits, so larger collections can't be held
+            if exact_max_size >= max_fetch:
+                exact_max_size = max_fetch - 1
+                print(
+                    f"Exact max size limited to {exact_max_size}", flush=True
+                )
+
+            self.memory = MemoryVectors(
+                max_size=exact_max_size,
+                max_collections=exact_max_collections,
+            )
+
+            self.store_queue = store_queue
+
+            self.store_schema = JsonSchema(ChunkEmbeddings)
+
+            self.store_reader = self.client.create_reader(
+                store_queue, pulsar.MessageId.latest,
+                schema=self.store_schema,
+            )
+
+            self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+            self.sync_thread.start()
+
+        else:
+            self.memory = None
+
+    def sync(self):
+
+        while True:
+
+            msg = self.store_reader.read_next()
+
+            try:
+                for name, id, vec, payload in self.points(msg.value()):
+                    self.memory.add(name, [id], [vec], [payload])
+            except Exception as e:
+                print("Sync exception:", e, flush=True)
+
+    # In-memory collection name, ID, vector and payload of each point held
+    # by a store message.  IDs match those the writer gives the points.
+    def points(self, v):
+
+        chunk = v.chunk.decode("utf-8")
+
+        if chunk == "": return []
+
+        return [
+            (
+                len(vec),
+                point_id(
+                    v.metadata.user, v.metadata.collection, v.metadata.id,
+                    chunk, i
+                ),
+                vec,
+                { "doc": chunk },
+            )
+            for i, vec in enumerate(v.vectors)
+        ]
+
+    # Reads up to limit points of a collection, for the in-memory copy.
+    # Store messages published from shortly before the read are replayed on
+    # top, for writes which hadn't reached the store yet.
+    def load(self, name, limit):
+
+        start = time.time() - replay_window
+
+        items = self.vecstore.get_all(name, limit=limit)
+
+        if len(items) >= limit: return items
+
+        replayed = read_since(
+            self.client, self.store_queue, self.store_schema, start
+        )
+
+        for v in replayed:
+            items.extend(
+                (id, vec, payload)
+                for coll, id, vec, payload in self.points(v)
+                if coll == name
+            )
+
+        return items
 
     def handle(self, msg):
 
@@ -55,6 +171,23 @@ class Processor(ConsumerProducer):
 
             for vec in v.vectors:
 
+                dim = len(vec)
+
+                if self.memory:
+
+                    results = self.memory.search(
+                        dim, dim,
+                        lambda limit: self.load(dim, limit),
+                        [vec], limit=v.limit
+                    )
+
+                    if results is not None:
+
+                        for payload, score in results:
+                            chunks.append(payload["doc"].encode("utf-8"))
+
+                        continue
+
                 resp = self.vecstore.search(vec, limit=v.limit)
 
                 for r in resp:
@@ -100,6 +233,33 @@ class Processor(ConsumerProducer):
             help=f'Milvus store URI (default: {default_store_uri})'
         )
 
+        parser.add_argument(
+            '--max-loaded',
+            type=int,
+            default=default_max_loaded,
+            help=f'Max collections kept loaded in Milvus (default: {default_max_loaded})'
+        )
+
+        parser.add_argument(
+            '--exact-max-size',
+            type=int,
+            default=default_exact_max_size,
+            help=f'Collections of up to this many vectors are held in memory and searched exactly, 0 to disable (default: {default_exact_max_size})'
+        )
+
+        parser.add_argument(
+            '--exact-max-collections',
+            type=int,
+            default=default_exact_max_collections,
+            help=f'Max collections held in memory, least recently searched are dropped first (default: {default_exact_max_collections})'
+        )
+
+        parser.add_argument(
+            '--store-queue',
+            default=default_store_queue,
+            help=f'Queue followed to keep in-memory collections up to date (default: {default_store_queue})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
@@ -7,21 +7,35 @@ of chunks
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct
 from qdrant_client.models import Distance, VectorParams
+from pulsar.schema import JsonSchema
+import threading
+import pulsar
+import time
 import uuid
 
 from .... schema import DocumentEmbeddingsRequest, DocumentEmbeddingsResponse
 from .... schema import Error, Value
 from .... schema import document_embeddings_request_queue
 from .... schema import document_embeddings_response_queue
-from .... base import ConsumerProducer
+from .... schema import ChunkEmbeddings, chunk_embeddings_ingest_queue
+from .... base import ConsumerProducer, point_id, read_since
+from .... direct.local_vectors import MemoryVectors
 
 module = ".".join(__name__.split(".")[1:-1])
 
 default_input_queue = document_embeddings_request_queue
 default_output_queue = document_embeddings_response_queue
 default_subscriber = module
+default_store_queue = chunk_embeddings_ingest_queue
+default_exact_max_size = 0
+default_exact_max_collections = 100
 default_store_uri = 'http://localhost:6333'
 
+# In hybrid mode, a collection read from the store is topped up with store
+# messages published from this many seconds before the read, which covers
+# writes still buffered by a writer when the store was read
+replay_window = 60
+
 class Processor(ConsumerProducer):
 
     def __init__(self, **params):
@@ -30,6 +44,13 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         store_uri = params.get("store_uri", default_store_uri)
+        store_queue = params.get("store_queue", default_store_queue)
+        exact_max_size = params.get(
+            "exact_max_size", default_exact_max_size
+        )
+        exact_max_collections = params.get(
+            "exact_max_collections", default_exact_max_collections
+        )
 
         super(Processor, self).__init__(
             **params | {
@@ -42,7 +63,101 @@ class Processor(ConsumerProducer):
             }
         )
 
-        self.client = QdrantClient(url=store_uri)
+        self.qdrant = QdrantClient(url=store_uri)
+
+        # Hybrid mode: small collections are searched in memory, and kept
+        # in sync by reading the store queue
+        if exact_max_size > 0:
+
+            self.memory = MemoryVectors(
+                max_size=exact_max_size,
+                max_collections=exact_max_collections,
+            )
+
+            self.store_queue = store_queue
+
+            self.store_schema = JsonSchema(ChunkEmbeddings)
+
+            self.store_reader = self.client.create_reader(
+                store_queue, pulsar.MessageId.latest,
+                schema=self.store_schema,
+            )
+
+            self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+            self.sync_thread.start()
+
+        else:
+            self.memory = None
+
+    def sync(self):
+
+        while True:
+
+            msg = self.store_reader.read_next()
+
+            try:
+                for name, id, vec, payload in self.points(msg.value()):
+                    self.memory.add(name, [id], [vec], [payload])
+            except Exception as e:
+                print("Sync exception:", e, flush=True)
+
+    # In-memory collection name, ID, vector and payload of each point held
+    # by a store message.  IDs match those the writer gives the points.
+    def points(self, v):
+
+        chunk = v.chunk.decode("utf-8")
+
+        if chunk == "": return []
+
+        return [
+            (
+                (
+                    "d_" + v.metadata.user + "_" +
+                    v.metadata.collection + "_" + str(len(vec))
+                ),
+                point_id(
+                    v.metadata.user, v.metadata.collection, v.metadata.id,
+                    chunk, i
+                ),
+                vec,
+                { "doc": chunk },
+            )
+            for i, vec in enumerate(v.vectors)
+        ]
+
+    # Reads up to limit points of a collection, for the in-memory copy.
+    # Store messages published from shortly before the read are replayed on
+    # top, for writes which hadn't reached the store yet.
+    def load(self, name, limit):
+
+        start = time.time() - replay_window
+
+        if self.qdrant.collection_exists(name):
+            points, next = self.qdrant.scroll(
+                collection_name=name,
+                limit=limit,
+                with_payload=True,
+                with_vectors=True,
+            )
+        else:
+            points = []
+
+        items = [ (str(p.id), p.vector, p.payload) for p in points ]
+
+        if len(items) >= limit: return items
+
+        replayed = read_since(
+            self.client, self.store_queue, self.store_schema, start
+        )
+
+        for v in replayed:
+            items.extend(
+                (id, vec, payload)
+                for coll, id, vec, payload in self.points(v)
+                if coll == name
+            )
+
+        return items
 
     def handle(self, msg):
 
@@ -65,7 +180,22 @@ class Processor(ConsumerProducer):
                     str(dim)
                 )
 
-                search_result = self.client.query_points(
+                if self.memory:
+
+                    results = self.memory.search(
+                        collection, dim,
+                        lambda limit: self.load(collection, limit),
+                        [vec], limit=v.limit
+                    )
+
+                    if results is not None:
+
+                        for payload, score in results:
+                            chunks.append(payload["doc"])
+
+                        continue
+
+                search_result = self.qdrant.query_points(
                     collection_name=collection,
                     query=vec,
                     limit=v.limit,
@@ -114,6 +244,26 @@ class Processor(ConsumerProducer):
             help=f'Milvus store URI (default: {default_store_uri})'
         )
 
+        parser.add_argument(
+            '--exact-max-size',
+            type=int,
+            default=default_exact_max_size,
+            help=f'Collections of up to this many vectors are held in memory and searched exactly, 0 to disable (default: {default_exact_max_size})'
+        )
+
+        parser.add_argument(
+            '--exact-max-collections',
+            type=int,
+            default=default_exact_max_collections,
+            help=f'Max collections held in memory, least recently searched are dropped first (default: {default_exact_max_collections})'
+        )
+
+        parser.add_argument(
+            '--store-queue',
+            default=default_store_queue,
+            help=f'Queue followed to keep in-memory collections up to date (default: {default_store_queue})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
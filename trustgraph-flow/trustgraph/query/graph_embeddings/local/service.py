@@ -0,0 +1,137 @@
+
+"""
+Graph embeddings query service.  Input is vector, output is list of
+entities.  Searches a local vector store held in memory-mapped files.
+"""
+
+from .... direct.local_vectors import LocalVectors
+from .... schema import GraphEmbeddingsRequest, GraphEmbeddingsResponse
+from .... schema import Error, Value
+from .... schema import graph_embeddings_request_queue
+from .... schema import graph_embeddings_response_queue
+from .... base import ConsumerProducer
+
+module = ".".join(__name__.split(".")[1:-1])
+
+default_input_queue = graph_embeddings_request_queue
+default_output_queue = graph_embeddings_response_queue
+default_subscriber = module
+default_store_path = 'vectors'
+
+class Processor(ConsumerProducer):
+
+    def __init__(self, **params):
+
+        input_queue = params.get("input_queue", default_input_queue)
+        output_queue = params.get("output_queue", default_output_queue)
+        subscriber = params.get("subscriber", default_subscriber)
+        store_path = params.get("store_path", default_store_path)
+
+        super(Processor, self).__init__(
+            **params | {
+                "input_queue": input_queue,
+                "output_queue": output_queue,
+                "subscriber": subscriber,
+                "input_schema": GraphEmbeddingsRequest,
+                "output_schema": GraphEmbeddingsResponse,
+                "store_path": store_path,
+            }
+        )
+
+        self.vecstore = LocalVectors(store_path)
+
+    def create_value(self, ent):
+        if ent.startswith("http://") or ent.startswith("https://"):
+            return Value(value=ent, is_uri=True)
+        else:
+            return Value(value=ent, is_uri=False)
+
+    def handle(self, msg):
+
+        try:
+
+            v = msg.value()
+
+            # Sender-produced ID
+            id = msg.properties()["id"]
+
+            print(f"Handling input {id}...", flush=True)
+
+            # Vectors of each dimension live in their own collection
+            collections = {}
+
+            for vec in v.vectors:
+
+                dim = len(vec)
+                collection = (
+                    "t_" + v.user + "_" + v.collection + "_" +
+                    str(dim)
+                )
+
+                collections.setdefault((collection, dim), []).append(vec)
+
+            scores = {}
+
+            for (collection, dim), vecs in collections.items():
+
+                results = self.vecstore.index(collection, dim).search(
+                    vecs, limit=v.limit, key="entity"
+                )
+
+                for payload, score in results:
+                    ent = payload["entity"]
+                    if ent not in scores or score > scores[ent]:
+                        scores[ent] = score
+
+            entities = sorted(scores, key=lambda ent: -scores[ent])
+            entities = entities[:v.limit]
+
+            ents2 = []
+
+            for ent in entities:
+                ents2.append(self.create_value(ent))
+
+            entities = ents2
+
+            print("Send response...", flush=True)
+            r = GraphEmbeddingsResponse(entities=entities, error=None)
+            self.producer.send(r, properties={"id": id})
+
+            print("Done.", flush=True)
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
+
+            print("Send error response...", flush=True)
+
+            r = GraphEmbeddingsResponse(
+                error=Error(
+                    type = "llm-error",
+                    message = str(e),
+                ),
+                entities=None,
+            )
+
+            self.producer.send(r, properties={"id": id})
+
+            self.consumer.acknowledge(msg)
+
+    @staticmethod
+    def add_args(parser):
+
+        ConsumerProducer.add_args(
+            parser, default_input_queue, default_subscriber,
+            default_output_queue,
+        )
+
+        parser.add_argument(
+            '-t', '--store-path',
+            default=default_store_path,
+            help=f'Vector store directory (default: {default_store_path})'
+        )
+
+def run():
+
+    Processor.start(module, __doc__)
+
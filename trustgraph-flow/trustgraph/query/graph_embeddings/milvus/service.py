@@ -4,19 +4,38 @@ Graph embeddings query service.  Input is vector, output is list of
 entities
 """
 
+from pulsar.schema import JsonSchema
+import threading
+import pulsar
+import time
+
 from .... direct.milvus_graph_embeddings import EntityVectors
 from .... schema import GraphEmbeddingsRequest, GraphEmbeddingsResponse
 from .... schema import Error, Value
 from .... schema import graph_embeddings_request_queue
 from .... schema import graph_embeddings_response_queue
-from .... base import ConsumerProducer
+from .... schema import GraphEmbeddings, graph_embeddings_store_queue
+from .... base import ConsumerProducer, point_id, read_since
+from .... direct.local_vectors import MemoryVectors
 
 module = ".".join(__name__.split(".")[1:-1])
 
 default_input_queue = graph_embeddings_request_queue
 default_output_queue = graph_embeddings_response_queue
 default_subscriber = module
+default_store_queue = graph_embeddings_store_queue
+default_exact_max_size = 0
+default_exact_max_collections = 100
 default_store_uri = 'http://localhost:19530'
+default_max_loaded = 10
+
+# Largest result set Milvus will return for a search or query
+max_fetch = 16384
+
+# In hybrid mode, a collection read from the store is topped up with store
+# messages published from this many seconds before the read, which covers
+# writes still buffered by a writer when the store was read
+replay_window = 60
 
 class Processor(ConsumerProducer):
 
@@ -26,6 +45,14 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         store_uri = params.get("store_uri", default_store_uri)
+        store_queue = params.get("store_queue", default_store_queue)
+        exact_max_size = params.get(
+            "exact_max_size", default_exact_max_size
+        )
+        exact_max_collections = params.get(
+            "exact_max_collections", default_exact_max_collections
+        )
+        max_loaded = params.get("max_loaded", default_max_loaded)
 
         super(Processor, self).__init__(
             **params | {
@@ -38,7 +65,94 @@ class Processor(ConsumerProducer):
             }
         )
 
-        self.vecstore = EntityVectors(store_uri)
+        self.vecstore = EntityVectors(store_uri, max_loaded=max_loaded)
+
+        # Hybrid mode: small collections are searched in memory, and kept
+        # in sync by reading the store queue
+        if exact_max_size > 0:
+
+            # A collection is read in one query, for one more point than
+            # fits, so larger collections can't be held
+            if exact_max_size >= max_fetch:
+                exact_max_size = max_fetch - 1
+                print(
+                    f"Exact max size limited to {exact_max_size}", flush=True
+                )
+
+            self.memory = MemoryVectors(
+                max_size=exact_max_size,
+                max_collections=exact_max_collections,
+            )
+
+            self.store_queue = store_queue
+
+            self.store_schema = JsonSchema(GraphEmbeddings)
+
+            self.store_reader = self.client.create_reader(
+                store_queue, pulsar.MessageId.latest,
+                schema=self.store_schema,
+            )
+
+            self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+            self.sync_thread.start()
+
+        else:
+            self.memory = None
+
+    def sync(self):
+
+        while True:
+
+            msg = self.store_reader.read_next()
+
+            try:
+                for name, id, vec, payload in self.points(msg.value()):
+                    self.memory.add(name, [id], [vec], [payload])
+            except Exception as e:
+                print("Sync exception:", e, flush=True)
+
+    # In-memory collection name, ID, vector and payload of each point held
+    # by a store message.  IDs match those the writer gives the points.
+    def points(self, v):
+
+        if v.entity.value == "" or v.entity.value is None: return []
+
+        return [
+            (
+                len(vec),
+                point_id(
+                    v.metadata.user, v.metadata.collection, v.entity.value,
+                    v.metadata.id, i, vec
+                ),
+                vec,
+                { "entity": v.entity.value },
+            )
+            for i, vec in enumerate(v.vectors)
+        ]
+
+    # Reads up to limit points of a collection, for the in-memory copy.
+    # Store messages published from shortly before the read are replayed on
+    # top, for writes which hadn't reached the store yet.
+    def load(self, name, limit):
+
+        start = time.time() - replay_window
+
+        items = self.vecstore.get_all(name, limit=limit)
+
+        if len(items) >= limit: return items
+
+        replayed = read_since(
+            self.client, self.store_queue, self.store_schema, start
+        )
+
+        for v in replayed:
+            items.extend(
+                (id, vec, payload)
+                for coll, id, vec, payload in self.points(v)
+                if coll == name
+            )
+
+        return items
 
     def create_value(self, ent):
         if ent.startswith("http://") or ent.startswith("https://"):
@@ -57,18 +171,66 @@ class Processor(ConsumerProducer):
 
             print(f"Handling input {id}...", flush=True)
 
-            entities = set()
+            if self.memory:
+
+                scores = {}
+                dims = {}
+
+                for vec in v.vectors:
+                    dims.setdefault(len(vec), []).append(vec)
+
+                for dim, vecs in dims.items():
+
+                    results = self.memory.search(
+                        dim, dim,
+                        lambda limit: self.load(dim, limit),
+                        vecs, limit=v.limit, key="entity"
+                    )
+
+                    # Too big to hold in memory, search the store
+                    if results is None:
+                        scores = None
+                        break
+
+                    for payload, score in results:
+                        ent = payload["entity"]
+                        if ent not in scores or score > scores[ent]:
+                            scores[ent] = score
+
+            else:
+                scores = None
+
+            if scores is None:
+
+                # All vectors are searched in one request.  The same entity can
+                # be stored many times, so if that leaves fewer than (limit)
+                # distinct entities the search is repeated, fetching more.
+                fetch = v.limit
+
+                while True:
+
+                    results = self.vecstore.search_many(v.vectors, limit=fetch)
 
-            for vec in v.vectors:
+                    scores = {}
 
-                resp = self.vecstore.search(vec, limit=v.limit)
+                    for hits in results:
+                        for r in hits:
+                            ent = r["entity"]["entity"]
+                            score = r["distance"]
+                            if ent not in scores or score > scores[ent]:
+                                scores[ent] = score
 
-                for r in resp:
-                    ent = r["entity"]["entity"]
-                    entities.add(ent)
+                    if len(scores) >= v.limit: break
 
-            # Convert set to list
-            entities = list(entities)
+                    # Every vector exhausted its matches
+                    if all(len(hits) < fetch for hits in results): break
+
+                    if fetch >= max_fetch: break
+
+                    fetch = min(fetch * 2, max_fetch)
+
+            entities = sorted(scores, key=lambda ent: -scores[ent])
+            entities = entities[:v.limit]
 
             ents2 = []
 
@@ -115,6 +277,33 @@ class Processor(ConsumerProducer):
             help=f'Milvus store URI (default: {default_store_uri})'
         )
 
+        parser.add_argument(
+            '--exact-max-size',
+            type=int,
+            default=default_exact_max_size,
+            help=f'Collections of up to this many vectors are held in memory and searched exactly, 0 to disable (default: {default_exact_max_size})'
+        )
+
+        parser.add_argument(
+            '--exact-max-collections',
+            type=int,
+            default=default_exact_max_collections,
+            help=f'Max collections held in memory, least recently searched are dropped first (default: {default_exact_max_collections})'
+        )
+
+        parser.add_argument(
+            '--store-queue',
+            default=default_store_queue,
+            help=f'Queue followed to keep in-memory collections up to date (default: {default_store_queue})'
+        )
+
+        parser.add_argument(
+            '--max-loaded',
+            type=int,
+            default=default_max_loaded,
+            help=f'Max collections kept loaded in Milvus (default: {default_max_loaded})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
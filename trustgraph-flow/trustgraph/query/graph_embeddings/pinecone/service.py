@@ -7,6 +7,7 @@ entities.  Pinecone implementation.
 from pinecone import Pinecone, ServerlessSpec
 from pinecone.grpc import PineconeGRPC, GRPCClientConfig
 
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import os
 
@@ -23,6 +24,9 @@ default_output_queue = graph_embeddings_response_queue
 default_subscriber = module
 default_api_key = os.getenv("PINECONE_API_KEY", "not-specified")
 
+# Largest top_k Pinecone accepts when returning metadata
+max_fetch = 1000
+
 class Processor(ConsumerProducer):
 
     def __init__(self, **params):
@@ -32,6 +36,7 @@ class Processor(ConsumerProducer):
         subscriber = params.get("subscriber", default_subscriber)
 
         self.url = params.get("url", None)
+        self.pool = ThreadPoolExecutor(max_workers=10)
         self.api_key = params.get("api_key", default_api_key)
 
         if self.url:
@@ -62,6 +67,24 @@ class Processor(ConsumerProducer):
         else:
             return Value(value=ent, is_uri=False)
         
+    def query(self, v, vec, limit):
+
+        dim = len(vec)
+
+        index_name = (
+            "t-" + v.user + "-" + str(dim)
+        )
+
+        index = self.pinecone.Index(index_name)
+
+        return index.query(
+            namespace=v.collection,
+            vector=vec,
+            top_k=limit,
+            include_values=False,
+            include_metadata=True
+        ).matches
+
     def handle(self, msg):
 
         try:
@@ -73,43 +96,38 @@ class Processor(ConsumerProducer):
 
             print(f"Handling input {id}...", flush=True)
 
-            entity_set = set()
-            entities = []
-
-            for vec in v.vectors:
+            # Pinecone has no multi-vector query, so the vectors are
+            # queried in parallel.  The same entity can be stored many
+            # times, so if that leaves fewer than (limit) distinct entities
+            # the queries are repeated, fetching more.
+            fetch = v.limit
 
-                dim = len(vec)
+            while True:
 
-                index_name = (
-                    "t-" + v.user + "-" + str(dim)
-                )
+                results = list(self.pool.map(
+                    lambda vec: self.query(v, vec, fetch),
+                    v.vectors
+                ))
 
-                index = self.pinecone.Index(index_name)
+                scores = {}
 
-                # Heuristic hack, get (2*limit), so that we have more chance
-                # of getting (limit) entities
-                results = index.query(
-                    namespace=v.collection,
-                    vector=vec,
-                    top_k=v.limit * 2,
-                    include_values=False,
-                    include_metadata=True
-                )
+                for matches in results:
+                    for r in matches:
+                        ent = r.metadata["entity"]
+                        if ent not in scores or r.score > scores[ent]:
+                            scores[ent] = r.score
 
-                for r in results.matches:
+                if len(scores) >= v.limit: break
 
-                    ent = r.metadata["entity"]
+                # Every vector exhausted its matches
+                if all(len(matches) < fetch for matches in results): break
 
-                    # De-dupe entities
-                    if ent not in entity_set:
-                        entity_set.add(ent)
-                        entities.append(ent)
+                if fetch >= max_fetch: break
 
-                    # Keep adding entities until limit
-                    if len(entity_set) >= v.limit: break
+                fetch = min(fetch * 2, max_fetch)
 
-                # Keep adding entities until limit
-                if len(entity_set) >= v.limit: break
+            entities = sorted(scores, key=lambda ent: -scores[ent])
+            entities = entities[:v.limit]
 
             ents2 = []
 
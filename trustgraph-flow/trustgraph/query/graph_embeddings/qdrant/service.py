@@ -7,21 +7,43 @@ entities
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct
 from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import Prefetch, FusionQuery, Fusion
+from pulsar.schema import JsonSchema
+import threading
+import pulsar
+import time
 import uuid
 
 from .... schema import GraphEmbeddingsRequest, GraphEmbeddingsResponse
 from .... schema import Error, Value
 from .... schema import graph_embeddings_request_queue
 from .... schema import graph_embeddings_response_queue
-from .... base import ConsumerProducer
+from .... schema import GraphEmbeddings, graph_embeddings_store_queue
+from .... base import ConsumerProducer, point_id, read_since
+from .... direct.local_vectors import MemoryVectors, normalise
 
 module = ".".join(__name__.split(".")[1:-1])
 
 default_input_queue = graph_embeddings_request_queue
 default_output_queue = graph_embeddings_response_queue
 default_subscriber = module
+default_store_queue = graph_embeddings_store_queue
+default_exact_max_size = 0
+default_exact_max_collections = 100
 default_store_uri = 'http://localhost:6333'
 
+# In hybrid mode, a collection read from the store is topped up with store
+# messages published from this many seconds before the read, which covers
+# writes still buffered by a writer when the store was read
+replay_window = 60
+
+# With several query vectors, each one prefetches this many points per
+# entity wanted, and the candidates are fused by reciprocal rank.  Fused
+# scores are ranks rather than similarities, so the candidates are then
+# re-scored by their best cosine match, the same score every other path
+# gives.
+prefetch_factor = 5
+
 class Processor(ConsumerProducer):
 
     def __init__(self, **params):
@@ -30,6 +52,13 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         store_uri = params.get("store_uri", default_store_uri)
+        store_queue = params.get("store_queue", default_store_queue)
+        exact_max_size = params.get(
+            "exact_max_size", default_exact_max_size
+        )
+        exact_max_collections = params.get(
+            "exact_max_collections", default_exact_max_collections
+        )
 
         super(Processor, self).__init__(
             **params | {
@@ -42,7 +71,99 @@ class Processor(ConsumerProducer):
             }
         )
 
-        self.client = QdrantClient(url=store_uri)
+        self.qdrant = QdrantClient(url=store_uri)
+
+        # Hybrid mode: small collections are searched in memory, and kept
+        # in sync by reading the store queue
+        if exact_max_size > 0:
+
+            self.memory = MemoryVectors(
+                max_size=exact_max_size,
+                max_collections=exact_max_collections,
+            )
+
+            self.store_queue = store_queue
+
+            self.store_schema = JsonSchema(GraphEmbeddings)
+
+            self.store_reader = self.client.create_reader(
+                store_queue, pulsar.MessageId.latest,
+                schema=self.store_schema,
+            )
+
+            self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+            self.sync_thread.start()
+
+        else:
+            self.memory = None
+
+    def sync(self):
+
+        while True:
+
+            msg = self.store_reader.read_next()
+
+            try:
+                for name, id, vec, payload in self.points(msg.value()):
+                    self.memory.add(name, [id], [vec], [payload])
+            except Exception as e:
+                print("Sync exception:", e, flush=True)
+
+    # In-memory collection name, ID, vector and payload of each point held
+    # by a store message.  IDs match those the writer gives the points.
+    def points(self, v):
+
+        if v.entity.value == "" or v.entity.value is None: return []
+
+        return [
+            (
+                (
+                    "t_" + v.metadata.user + "_" +
+                    v.metadata.collection + "_" + str(len(vec))
+                ),
+                point_id(
+                    v.metadata.user, v.metadata.collection, v.entity.value,
+                    v.metadata.id, i, vec
+                ),
+                vec,
+                { "entity": v.entity.value },
+            )
+            for i, vec in enumerate(v.vectors)
+        ]
+
+    # Reads up to limit points of a collection, for the in-memory copy.
+    # Store messages published from shortly before the read are replayed on
+    # top, for writes which hadn't reached the store yet.
+    def load(self, name, limit):
+
+        start = time.time() - replay_window
+
+        if self.qdrant.collection_exists(name):
+            points, next = self.qdrant.scroll(
+                collection_name=name,
+                limit=limit,
+                with_payload=True,
+                with_vectors=True,
+            )
+        else:
+            points = []
+
+        items = [ (str(p.id), p.vector, p.payload) for p in points ]
+
+        if len(items) >= limit: return items
+
+        replayed = read_since(
+            self.client, self.store_queue, self.store_schema, start
+        )
+
+        for v in replayed:
+            items.extend(
+                (id, vec, payload)
+                for coll, id, vec, payload in self.points(v)
+                if coll == name
+            )
+
+        return items
 
     def create_value(self, ent):
         if ent.startswith("http://") or ent.startswith("https://"):
@@ -61,8 +182,8 @@ class Processor(ConsumerProducer):
 
             print(f"Handling input {id}...", flush=True)
 
-            entity_set = set()
-            entities = []
+            # Vectors of each dimension live in their own collection
+            collections = {}
 
             for vec in v.vectors:
 
@@ -72,28 +193,70 @@ class Processor(ConsumerProducer):
                     str(dim)
                 )
 
-                # Heuristic hack, get (2*limit), so that we have more chance
-                # of getting (limit) entities
-                search_result = self.client.query_points(
-                    collection_name=collection,
-                    query=vec,
-                    limit=v.limit * 2,
-                    with_payload=True,
-                ).points
+                collections.setdefault(collection, []).append(vec)
+
+            scores = {}
+
+            for collection, vecs in collections.items():
+
+                if self.memory:
 
-                for r in search_result:
-                    ent = r.payload["entity"]
+                    results = self.memory.search(
+                        collection, len(vecs[0]),
+                        lambda limit: self.load(collection, limit),
+                        vecs, limit=v.limit, key="entity"
+                    )
 
-                    # De-dupe entities
-                    if ent not in entity_set:
-                        entity_set.add(ent)
-                        entities.append(ent)
+                    if results is not None:
 
-                    # Keep adding entities until limit
-                    if len(entity_set) >= v.limit: break
+                        for payload, score in results:
+                            ent = payload["entity"]
+                            if ent not in scores or score > scores[ent]:
+                                scores[ent] = score
 
-                # Keep adding entities until limit
-                if len(entity_set) >= v.limit: break
+                        continue
+
+                if len(vecs) == 1:
+                    query = { "query": vecs[0] }
+                else:
+                    query = {
+                        "prefetch": [
+                            Prefetch(
+                                query=vec,
+                                limit=v.limit * prefetch_factor
+                            )
+                            for vec in vecs
+                        ],
+                        "query": FusionQuery(fusion=Fusion.RRF),
+                    }
+
+                # Grouping by entity dedups in the store, so this returns
+                # up to (limit) distinct entities, best first
+                groups = self.qdrant.query_points_groups(
+                    collection_name=collection,
+                    group_by="entity",
+                    group_size=1,
+                    limit=v.limit,
+                    with_payload=False,
+                    with_vectors=len(vecs) > 1,
+                    **query
+                ).groups
+
+                if len(vecs) > 1:
+                    query_vecs = normalise(vecs)
+
+                for group in groups:
+                    ent = group.id
+                    if len(vecs) > 1:
+                        hit = normalise([group.hits[0].vector])
+                        score = float((hit @ query_vecs.T).max())
+                    else:
+                        score = group.hits[0].score
+                    if ent not in scores or score > scores[ent]:
+                        scores[ent] = score
+
+            entities = sorted(scores, key=lambda ent: -scores[ent])
+            entities = entities[:v.limit]
 
             ents2 = []
 
@@ -140,6 +303,26 @@ class Processor(ConsumerProducer):
             help=f'Milvus store URI (default: {default_store_uri})'
         )
 
+        parser.add_argument(
+            '--exact-max-size',
+            type=int,
+            default=default_exact_max_size,
+            help=f'Collections of up to this many vectors are held in memory and searched exactly, 0 to disable (default: {default_exact_max_size})'
+        )
+
+        parser.add_argument(
+            '--exact-max-collections',
+            type=int,
+            default=default_exact_max_collections,
+            help=f'Max collections held in memory, least recently searched are dropped first (default: {default_exact_max_collections})'
+        )
+
+        parser.add_argument(
+            '--store-queue',
+            default=default_store_queue,
+            help=f'Queue followed to keep in-memory collections up to date (default: {default_store_queue})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
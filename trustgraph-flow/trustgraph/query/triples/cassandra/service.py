@@ -4,9 +4,9 @@ Triples query service.  Input is a (s, p, o) triple, some values may be
 null.  Output is a list of triples.
 """
 
-from .... direct.cassandra import TrustGraph
+from .... direct.cassandra import TrustGraphs, layouts, INDEXED
 from .... schema import TriplesQueryRequest, TriplesQueryResponse, Error
-from .... schema import Value, Triple
+from .... schema import Value, Triple, TriplesQueryResult
 from .... schema import triples_request_queue
 from .... schema import triples_response_queue
 from .... base import ConsumerProducer
@@ -17,6 +17,8 @@ default_input_queue = triples_request_queue
 default_output_queue = triples_response_queue
 default_subscriber = module
 default_graph_host='localhost'
+default_table_cache_size = 100
+default_table_layout = INDEXED
 
 class Processor(ConsumerProducer):
 
@@ -26,6 +28,10 @@ class Processor(ConsumerProducer):
         output_queue = params.get("output_queue", default_output_queue)
         subscriber = params.get("subscriber", default_subscriber)
         graph_host = params.get("graph_host", default_graph_host)
+        table_cache_size = params.get(
+            "table_cache_size", default_table_cache_size
+        )
+        table_layout = params.get("table_layout", default_table_layout)
 
         super(Processor, self).__init__(
             **params | {
@@ -35,11 +41,15 @@ class Processor(ConsumerProducer):
                 "input_schema": TriplesQueryRequest,
                 "output_schema": TriplesQueryResponse,
                 "graph_host": graph_host,
+                "table_cache_size": table_cache_size,
+                "table_layout": table_layout,
             }
         )
 
-        self.graph_host = [graph_host]
-        self.table = None
+        self.graphs = TrustGraphs(
+            hosts=[graph_host], max_size=table_cache_size,
+            layout=table_layout,
+        )
 
     def create_value(self, ent):
         if ent.startswith("http://") or ent.startswith("https://"):
@@ -47,100 +57,143 @@ class Processor(ConsumerProducer):
         else:
             return Value(value=ent, is_uri=False)
 
+    def to_triples(self, triples):
+        return [
+            Triple(
+                s=self.create_value(t[0]),
+                p=self.create_value(t[1]), 
+                o=self.create_value(t[2])
+            )
+            for t in triples
+        ]
+
+    # Works out the query for an (s, p, o) pattern.  Returns the query, and
+    # a function which converts its result rows to triples
+    def plan(self, tg, s, p, o, limit):
+
+        if s is not None:
+            if p is not None:
+                if o is not None:
+                    return (
+                        tg.query_spo(
+                            s.value, p.value, o.value, limit=limit
+                        ),
+                        lambda rows: [
+                            (s.value, p.value, o.value) for t in rows
+                        ]
+                    )
+                else:
+                    return (
+                        tg.query_sp(s.value, p.value, limit=limit),
+                        lambda rows: [
+                            (s.value, p.value, t.o) for t in rows
+                        ]
+                    )
+            else:
+                if o is not None:
+                    return (
+                        tg.query_os(o.value, s.value, limit=limit),
+                        lambda rows: [
+                            (s.value, t.p, o.value) for t in rows
+                        ]
+                    )
+                else:
+                    return (
+                        tg.query_s(s.value, limit=limit),
+                        lambda rows: [
+                            (s.value, t.p, t.o) for t in rows
+                        ]
+                    )
+        else:
+            if p is not None:
+                if o is not None:
+                    return (
+                        tg.query_po(p.value, o.value, limit=limit),
+                        lambda rows: [
+                            (t.s, p.value, o.value) for t in rows
+                        ]
+                    )
+                else:
+                    return (
+                        tg.query_p(p.value, limit=limit),
+                        lambda rows: [
+                            (t.s, p.value, t.o) for t in rows
+                        ]
+                    )
+            else:
+                if o is not None:
+                    return (
+                        tg.query_o(o.value, limit=limit),
+                        lambda rows: [
+                            (t.s, t.p, o.value) for t in rows
+                        ]
+                    )
+                else:
+                    return (
+                        tg.query_all(limit=limit),
+                        lambda rows: [
+                            (t.s, t.p, t.o) for t in rows
+                        ]
+                    )
+
+    def query(self, tg, s, p, o, limit):
+
+        query, convert = self.plan(tg, s, p, o, limit)
+
+        return convert(tg.session.execute(*query))
+
+    # Batch queries are executed concurrently on the Cassandra session
+    def query_batch(self, tg, patterns, limit):
+
+        if not patterns: return []
+
+        plans = [
+            self.plan(tg, t.s, t.p, t.o, limit)
+            for t in patterns
+        ]
+
+        results = tg.get_batch([query for query, convert in plans])
+
+        return [
+            convert(rows)
+            for (query, convert), rows in zip(plans, results)
+        ]
+
     def handle(self, msg):
 
         try:
 
             v = msg.value()
 
-            table = (v.user, v.collection)
-
-            if table != self.table:
-                self.tg = TrustGraph(
-                    hosts=self.graph_host,
-                    keyspace=v.user, table=v.collection,
-                )
-                self.table = table
+            tg = self.graphs.get(v.user, v.collection)
 
             # Sender-produced ID
             id = msg.properties()["id"]
 
             print(f"Handling input {id}...", flush=True)
 
-            triples = []
-
-            if v.s is not None:
-                if v.p is not None:
-                    if v.o is not None:
-                        resp = self.tg.get_spo(
-                            v.s.value, v.p.value, v.o.value,
-                            limit=v.limit
-                        )
-                        triples.append((v.s.value, v.p.value, v.o.value))
-                    else:
-                        resp = self.tg.get_sp(
-                            v.s.value, v.p.value,
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((v.s.value, v.p.value, t.o))
-                else:
-                    if v.o is not None:
-                        resp = self.tg.get_os(
-                            v.o.value, v.s.value, 
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((v.s.value, t.p, v.o.value))
-                    else:
-                        resp = self.tg.get_s(
-                            v.s.value,
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((v.s.value, t.p, t.o))
+            # An empty patterns list is a batch with no patterns, not a
+            # single query
+            if v.patterns is not None:
+
+                # Batch query, one result per pattern
+                results = [
+                    TriplesQueryResult(triples=self.to_triples(triples))
+                    for triples in self.query_batch(tg, v.patterns, v.limit)
+                ]
+
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(results=results, error=None)
+
             else:
-                if v.p is not None:
-                    if v.o is not None:
-                        resp = self.tg.get_po(
-                            v.p.value, v.o.value,
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((t.s, v.p.value, v.o.value))
-                    else:
-                        resp = self.tg.get_p(
-                            v.p.value,
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((t.s, v.p.value, t.o))
-                else:
-                    if v.o is not None:
-                        resp = self.tg.get_o(
-                            v.o.value,
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((t.s, t.p, v.o.value))
-                    else:
-                        resp = self.tg.get_all(
-                            limit=v.limit
-                        )
-                        for t in resp:
-                            triples.append((t.s, t.p, t.o))
-
-            triples = [
-                Triple(
-                    s=self.create_value(t[0]),
-                    p=self.create_value(t[1]), 
-                    o=self.create_value(t[2])
+
+                triples = self.to_triples(
+                    self.query(tg, v.s, v.p, v.o, v.limit)
                 )
-                for t in triples
-            ]
 
-            print("Send response...", flush=True)
-            r = TriplesQueryResponse(triples=triples, error=None)
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(triples=triples, error=None)
+
             self.producer.send(r, properties={"id": id})
 
             print("Done.", flush=True)
@@ -177,6 +230,20 @@ class Processor(ConsumerProducer):
             help=f'Graph host (default: localhost)'
         )
 
+        parser.add_argument(
+            '--table-cache-size',
+            type=int,
+            default=default_table_cache_size,
+            help=f'Max collections with cached statements (default: {default_table_cache_size})'
+        )
+
+        parser.add_argument(
+            '--table-layout',
+            default=default_table_layout,
+            choices=layouts,
+            help=f'Table layout, must match between writer and query service (default: {default_table_layout})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
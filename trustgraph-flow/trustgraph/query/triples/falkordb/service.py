@@ -8,7 +8,7 @@ triples.
 from falkordb import FalkorDB
 
 from .... schema import TriplesQueryRequest, TriplesQueryResponse, Error
-from .... schema import Value, Triple
+from .... schema import Value, Triple, TriplesQueryResult
 from .... schema import triples_request_queue
 from .... schema import triples_response_queue
 from .... base import ConsumerProducer
@@ -22,6 +22,10 @@ default_subscriber = module
 default_graph_url = 'falkor://falkordb:6379'
 default_database = 'falkordb'
 
+# Per-pattern limit for batch queries which don't set one, as the gateway
+# uses for single queries
+default_batch_limit = 10000
+
 class Processor(ConsumerProducer):
 
     def __init__(self, **params):
@@ -54,253 +58,336 @@ class Processor(ConsumerProducer):
         else:
             return Value(value=ent, is_uri=False)
 
-    def handle(self, msg):
+    def to_triples(self, triples):
+        return [
+            Triple(
+                s=self.create_value(t[0]),
+                p=self.create_value(t[1]), 
+                o=self.create_value(t[2])
+            )
+            for t in triples
+        ]
 
-        try:
+    def query(self, s, p, o, limit):
 
-            v = msg.value()
+        triples = []
 
-            # Sender-produced ID
-            id = msg.properties()["id"]
+        if s is not None:
+            if p is not None:
+                if o is not None:
 
-            print(f"Handling input {id}...", flush=True)
+                    # SPO
 
-            triples = []
-
-            if v.s is not None:
-                if v.p is not None:
-                    if v.o is not None:
-
-                        # SPO
-
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal {value: $value}) "
-                            "RETURN $src as src",
-                            params={
-                                "src": v.s.value,
-                                "rel": v.p.value,
-                                "value": v.o.value,
-                            },
-                        ).result_set
-
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, v.o.value))
-
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node {uri: $uri}) "
-                            "RETURN $src as src",
-                            params={
-                                "src": v.s.value,
-                                "rel": v.p.value,
-                                "uri": v.o.value,
-                            },
-                        ).result_set
-
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, v.o.value))
-
-                    else:
-
-                        # SP
-
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal) "
-                            "RETURN dest.value as dest",
-                            params={
-                                "src": v.s.value,
-                                "rel": v.p.value,
-                            },
-                        ).result_set
-
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, rec[0]))
-
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node) "
-                            "RETURN dest.uri as dest",
-                            params={
-                                "src": v.s.value,
-                                "rel": v.p.value,
-                            },
-                        ).result_set
-
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, rec[0]))
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal {value: $value}) "
+                        "RETURN $src as src",
+                        params={
+                            "src": s.value,
+                            "rel": p.value,
+                            "value": o.value,
+                        },
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((s.value, p.value, o.value))
+
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node {uri: $uri}) "
+                        "RETURN $src as src",
+                        params={
+                            "src": s.value,
+                            "rel": p.value,
+                            "uri": o.value,
+                        },
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((s.value, p.value, o.value))
 
                 else:
 
-                    if v.o is not None:
+                    # SP
 
-                        # SO
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal) "
+                        "RETURN dest.value as dest",
+                        params={
+                            "src": s.value,
+                            "rel": p.value,
+                        },
+                    ).result_set
 
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal {value: $value}) "
-                            "RETURN rel.uri as rel",
-                            params={
-                                "src": v.s.value,
-                                "value": v.o.value,
-                            },
-                        ).result_set
+                    for rec in records:
+                        triples.append((s.value, p.value, rec[0]))
 
-                        for rec in records:
-                            triples.append((v.s.value, rec[0], v.o.value))
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node) "
+                        "RETURN dest.uri as dest",
+                        params={
+                            "src": s.value,
+                            "rel": p.value,
+                        },
+                    ).result_set
 
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node {uri: $uri}) "
-                            "RETURN rel.uri as rel",
-                            params={
-                                "src": v.s.value,
-                                "uri": v.o.value,
-                            },
-                        ).result_set
+                    for rec in records:
+                        triples.append((s.value, p.value, rec[0]))
 
-                        for rec in records:
-                            triples.append((v.s.value, rec[0], v.o.value))
+            else:
 
-                    else:
+                if o is not None:
 
-                        # s
+                    # SO
 
-                        records = self.io.query(
-                            "match (src:node {uri: $src})-[rel:rel]->(dest:literal) "
-                            "return rel.uri as rel, dest.value as dest",
-                            params={
-                                "src": v.s.value,
-                            },
-                        ).result_set
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal {value: $value}) "
+                        "RETURN rel.uri as rel",
+                        params={
+                            "src": s.value,
+                            "value": o.value,
+                        },
+                    ).result_set
 
-                        for rec in records:
-                            triples.append((v.s.value, rec[0], rec[1]))
+                    for rec in records:
+                        triples.append((s.value, rec[0], o.value))
 
-                        records = self.io.query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node) "
-                            "RETURN rel.uri as rel, dest.uri as dest",
-                            params={
-                                "src": v.s.value,
-                            },
-                        ).result_set
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node {uri: $uri}) "
+                        "RETURN rel.uri as rel",
+                        params={
+                            "src": s.value,
+                            "uri": o.value,
+                        },
+                    ).result_set
 
-                        for rec in records:
-                            triples.append((v.s.value, rec[0], rec[1]))
+                    for rec in records:
+                        triples.append((s.value, rec[0], o.value))
 
+                else:
 
-            else:
+                    # s
+
+                    records = self.io.query(
+                        "match (src:node {uri: $src})-[rel:rel]->(dest:literal) "
+                        "return rel.uri as rel, dest.value as dest",
+                        params={
+                            "src": s.value,
+                        },
+                    ).result_set
 
-                if v.p is not None:
+                    for rec in records:
+                        triples.append((s.value, rec[0], rec[1]))
+
+                    records = self.io.query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node) "
+                        "RETURN rel.uri as rel, dest.uri as dest",
+                        params={
+                            "src": s.value,
+                        },
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((s.value, rec[0], rec[1]))
+
+
+        else:
+
+            if p is not None:
+
+                if o is not None:
+
+                    # PO
+
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal {value: $value}) "
+                        "RETURN src.uri as src",
+                        params={
+                            "uri": p.value,
+                            "value": o.value,
+                        },
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((rec[0], p.value, o.value))
+
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node {uri: $uri}) "
+                        "RETURN src.uri as src",
+                        params={
+                            "uri": p.value,
+                            "dest": o.value,
+                        },
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((rec[0], p.value, o.value))
+
+                else:
 
-                    if v.o is not None:
+                    # P
 
-                        # PO
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal) "
+                        "RETURN src.uri as src, dest.value as dest",
+                        params={
+                            "uri": p.value,
+                        },
+                    ).result_set
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal {value: $value}) "
-                            "RETURN src.uri as src",
-                            params={
-                                "uri": v.p.value,
-                                "value": v.o.value,
-                            },
-                        ).result_set
+                    for rec in records:
+                        triples.append((rec[0], p.value, rec[1]))
 
-                        for rec in records:
-                            triples.append((rec[0], v.p.value, v.o.value))
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node) "
+                        "RETURN src.uri as src, dest.uri as dest",
+                        params={
+                            "uri": p.value,
+                        },
+                    ).result_set
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node {uri: $uri}) "
-                            "RETURN src.uri as src",
-                            params={
-                                "uri": v.p.value,
-                                "dest": v.o.value,
-                            },
-                        ).result_set
+                    for rec in records:
+                        triples.append((rec[0], p.value, rec[1]))
 
-                        for rec in records:
-                            triples.append((rec[0], v.p.value, v.o.value))
+            else:
 
-                    else:
+                if o is not None:
 
-                        # P
+                    # O
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal) "
-                            "RETURN src.uri as src, dest.value as dest",
-                            params={
-                                "uri": v.p.value,
-                            },
-                        ).result_set
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Literal {value: $value}) "
+                        "RETURN src.uri as src, rel.uri as rel",
+                        params={
+                            "value": o.value,
+                        },
+                    ).result_set
 
-                        for rec in records:
-                            triples.append((rec[0], v.p.value, rec[1]))
+                    for rec in records:
+                        triples.append((rec[0], rec[1], o.value))
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node) "
-                            "RETURN src.uri as src, dest.uri as dest",
-                            params={
-                                "uri": v.p.value,
-                            },
-                        ).result_set
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Node {uri: $uri}) "
+                        "RETURN src.uri as src, rel.uri as rel",
+                        params={
+                            "uri": o.value,
+                        },
+                    ).result_set
 
-                        for rec in records:
-                            triples.append((rec[0], v.p.value, rec[1]))
+                    for rec in records:
+                        triples.append((rec[0], rec[1], o.value))
 
                 else:
 
-                    if v.o is not None:
+                    # *
+
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Literal) "
+                        "RETURN src.uri as src, rel.uri as rel, dest.value as dest",
+                    ).result_set
+
+                    for rec in records:
+                        triples.append((rec[0], rec[1], rec[2]))
+
+                    records = self.io.query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Node) "
+                        "RETURN src.uri as src, rel.uri as rel, dest.uri as dest",
+                    ).result_set
 
-                        # O
+                    for rec in records:
+                        triples.append((rec[0], rec[1], rec[2]))
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Literal {value: $value}) "
-                            "RETURN src.uri as src, rel.uri as rel",
-                            params={
-                                "value": v.o.value,
-                            },
-                        ).result_set
+        return triples
+
+    # Batch queries are grouped by which of s, p and o are set, and each
+    # group is run as one UNWIND query for literal objects and one for node
+    # objects
+    def batch_query(self, shape, dest, key):
+
+        s, p, o = shape
+
+        return (
+            "UNWIND $rows AS row "
+            "MATCH (src:Node" + (" {uri: row.s}" if s else "") + ")"
+            "-[rel:Rel" + (" {uri: row.p}" if p else "") + "]->"
+            "(dest:" + dest + (" {" + key + ": row.o}" if o else "") + ") "
+            "WITH row.idx AS idx, "
+            "collect([src.uri, rel.uri, dest." + key + "]) AS ts "
+            "RETURN idx, ts[0..$limit] AS ts"
+        )
 
-                        for rec in records:
-                            triples.append((rec[0], rec[1], v.o.value))
+    def query_batch(self, patterns, limit):
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Node {uri: $uri}) "
-                            "RETURN src.uri as src, rel.uri as rel",
-                            params={
-                                "uri": v.o.value,
-                            },
-                        ).result_set
+        if not patterns: return []
 
-                        for rec in records:
-                            triples.append((rec[0], rec[1], v.o.value))
+        # A null bound would make every slice in the query null
+        if limit is None: limit = default_batch_limit
 
-                    else:
+        results = [[] for t in patterns]
 
-                        # *
+        groups = {}
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Literal) "
-                            "RETURN src.uri as src, rel.uri as rel, dest.value as dest",
-                        ).result_set
+        for i, t in enumerate(patterns):
 
-                        for rec in records:
-                            triples.append((rec[0], rec[1], rec[2]))
+            shape = (t.s is not None, t.p is not None, t.o is not None)
 
-                        records = self.io.query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Node) "
-                            "RETURN src.uri as src, rel.uri as rel, dest.uri as dest",
-                        ).result_set
+            groups.setdefault(shape, []).append({
+                "idx": i,
+                "s": t.s.value if t.s is not None else None,
+                "p": t.p.value if t.p is not None else None,
+                "o": t.o.value if t.o is not None else None,
+            })
 
-                        for rec in records:
-                            triples.append((rec[0], rec[1], rec[2]))
+        for shape, rows in groups.items():
 
-            triples = [
-                Triple(
-                    s=self.create_value(t[0]),
-                    p=self.create_value(t[1]), 
-                    o=self.create_value(t[2])
+            for dest, key in [("Literal", "value"), ("Node", "uri")]:
+
+                records = self.io.query(
+                    self.batch_query(shape, dest, key),
+                    params={
+                        "rows": rows,
+                        "limit": limit,
+                    },
+                ).result_set
+
+                for rec in records:
+                    results[rec[0]].extend(
+                        tuple(t) for t in rec[1]
+                    )
+
+        return [r[:limit] for r in results]
+
+    def handle(self, msg):
+
+        try:
+
+            v = msg.value()
+
+            # Sender-produced ID
+            id = msg.properties()["id"]
+
+            print(f"Handling input {id}...", flush=True)
+
+            # An empty patterns list is a batch with no patterns, not a
+            # single query
+            if v.patterns is not None:
+
+                # Batch query, one result per pattern
+                results = [
+                    TriplesQueryResult(triples=self.to_triples(triples))
+                    for triples in self.query_batch(v.patterns, v.limit)
+                ]
+
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(results=results, error=None)
+
+            else:
+
+                triples = self.to_triples(
+                    self.query(v.s, v.p, v.o, v.limit)
                 )
-                for t in triples
-            ]
 
-            print("Send response...", flush=True)
-            r = TriplesQueryResponse(triples=triples, error=None)
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(triples=triples, error=None)
+
             self.producer.send(r, properties={"id": id})
 
             print("Done.", flush=True)
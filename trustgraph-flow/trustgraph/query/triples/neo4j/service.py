@@ -8,7 +8,7 @@ triples.
 from neo4j import GraphDatabase
 
 from .... schema import TriplesQueryRequest, TriplesQueryResponse, Error
-from .... schema import Value, Triple
+from .... schema import Value, Triple, TriplesQueryResult
 from .... schema import triples_request_queue
 from .... schema import triples_response_queue
 from .... base import ConsumerProducer
@@ -24,6 +24,10 @@ default_username = 'neo4j'
 default_password = 'password'
 default_database = 'neo4j'
 
+# Per-pattern limit for batch queries which don't set one, as the gateway
+# uses for single queries
+default_batch_limit = 10000
+
 class Processor(ConsumerProducer):
 
     def __init__(self, **params):
@@ -58,245 +62,327 @@ class Processor(ConsumerProducer):
         else:
             return Value(value=ent, is_uri=False)
 
-    def handle(self, msg):
+    def to_triples(self, triples):
+        return [
+            Triple(
+                s=self.create_value(t[0]),
+                p=self.create_value(t[1]), 
+                o=self.create_value(t[2])
+            )
+            for t in triples
+        ]
 
-        try:
+    def query(self, s, p, o, limit):
 
-            v = msg.value()
+        triples = []
 
-            # Sender-produced ID
-            id = msg.properties()["id"]
+        if s is not None:
+            if p is not None:
+                if o is not None:
 
-            print(f"Handling input {id}...", flush=True)
+                    # SPO
+
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal {value: $value}) "
+                        "RETURN $src as src",
+                        src=s.value, rel=p.value, value=o.value,
+                        database_=self.db,
+                    )
+
+                    for rec in records:
+                        triples.append((s.value, p.value, o.value))
 
-            triples = []
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node {uri: $uri}) "
+                        "RETURN $src as src",
+                        src=s.value, rel=p.value, uri=o.value,
+                        database_=self.db,
+                    )
+
+                    for rec in records:
+                        triples.append((s.value, p.value, o.value))
+
+                else:
 
-            if v.s is not None:
-                if v.p is not None:
-                    if v.o is not None:
+                    # SP
 
-                        # SPO
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal) "
+                        "RETURN dest.value as dest",
+                        src=s.value, rel=p.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal {value: $value}) "
-                            "RETURN $src as src",
-                            src=v.s.value, rel=v.p.value, value=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, p.value, data["dest"]))
 
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, v.o.value))
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node) "
+                        "RETURN dest.uri as dest",
+                        src=s.value, rel=p.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node {uri: $uri}) "
-                            "RETURN $src as src",
-                            src=v.s.value, rel=v.p.value, uri=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, p.value, data["dest"]))
 
-                        for rec in records:
-                            triples.append((v.s.value, v.p.value, v.o.value))
+            else:
 
-                    else:
+                if o is not None:
 
-                        # SP
+                    # SO
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Literal) "
-                            "RETURN dest.value as dest",
-                            src=v.s.value, rel=v.p.value,
-                            database_=self.db,
-                        )
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal {value: $value}) "
+                        "RETURN rel.uri as rel",
+                        src=s.value, value=o.value,
+                        database_=self.db,
+                    )
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, v.p.value, data["dest"]))
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, data["rel"], o.value))
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel {uri: $rel}]->(dest:Node) "
-                            "RETURN dest.uri as dest",
-                            src=v.s.value, rel=v.p.value,
-                            database_=self.db,
-                        )
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node {uri: $uri}) "
+                        "RETURN rel.uri as rel",
+                        src=s.value, uri=o.value,
+                        database_=self.db,
+                    )
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, v.p.value, data["dest"]))
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, data["rel"], o.value))
 
                 else:
 
-                    if v.o is not None:
+                    # S
 
-                        # SO
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal) "
+                        "RETURN rel.uri as rel, dest.value as dest",
+                        src=s.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal {value: $value}) "
-                            "RETURN rel.uri as rel",
-                            src=v.s.value, value=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, data["rel"], data["dest"]))
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, data["rel"], v.o.value))
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node) "
+                        "RETURN rel.uri as rel, dest.uri as dest",
+                        src=s.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node {uri: $uri}) "
-                            "RETURN rel.uri as rel",
-                            src=v.s.value, uri=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((s.value, data["rel"], data["dest"]))
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, data["rel"], v.o.value))
 
-                    else:
+        else:
 
-                        # S
+            if p is not None:
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Literal) "
-                            "RETURN rel.uri as rel, dest.value as dest",
-                            src=v.s.value,
-                            database_=self.db,
-                        )
+                if o is not None:
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, data["rel"], data["dest"]))
+                    # PO
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node {uri: $src})-[rel:Rel]->(dest:Node) "
-                            "RETURN rel.uri as rel, dest.uri as dest",
-                            src=v.s.value,
-                            database_=self.db,
-                        )
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal {value: $value}) "
+                        "RETURN src.uri as src",
+                        uri=p.value, value=o.value,
+                        database_=self.db,
+                    )
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((v.s.value, data["rel"], data["dest"]))
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], p.value, o.value))
 
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node {uri: $uri}) "
+                        "RETURN src.uri as src",
+                        uri=p.value, dest=o.value,
+                        database_=self.db,
+                    )
 
-            else:
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], p.value, o.value))
 
-                if v.p is not None:
+                else:
 
-                    if v.o is not None:
+                    # P
 
-                        # PO
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal) "
+                        "RETURN src.uri as src, dest.value as dest",
+                        uri=p.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal {value: $value}) "
-                            "RETURN src.uri as src",
-                            uri=v.p.value, value=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], p.value, data["dest"]))
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], v.p.value, v.o.value))
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node) "
+                        "RETURN src.uri as src, dest.uri as dest",
+                        uri=p.value,
+                        database_=self.db,
+                    )
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node {uri: $uri}) "
-                            "RETURN src.uri as src",
-                            uri=v.p.value, dest=v.o.value,
-                            database_=self.db,
-                        )
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], p.value, data["dest"]))
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], v.p.value, v.o.value))
+            else:
 
-                    else:
+                if o is not None:
 
-                        # P
+                    # O
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Literal) "
-                            "RETURN src.uri as src, dest.value as dest",
-                            uri=v.p.value,
-                            database_=self.db,
-                        )
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Literal {value: $value}) "
+                        "RETURN src.uri as src, rel.uri as rel",
+                        value=o.value,
+                        database_=self.db,
+                    )
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], v.p.value, data["dest"]))
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], data["rel"], o.value))
 
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel {uri: $uri}]->(dest:Node) "
-                            "RETURN src.uri as src, dest.uri as dest",
-                            uri=v.p.value,
-                            database_=self.db,
-                        )
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Node {uri: $uri}) "
+                        "RETURN src.uri as src, rel.uri as rel",
+                        uri=o.value,
+                        database_=self.db,
+                    )
 
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], v.p.value, data["dest"]))
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], data["rel"], o.value))
 
                 else:
 
-                    if v.o is not None:
-
-                        # O
-
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Literal {value: $value}) "
-                            "RETURN src.uri as src, rel.uri as rel",
-                            value=v.o.value,
-                            database_=self.db,
-                        )
-
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], data["rel"], v.o.value))
-
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Node {uri: $uri}) "
-                            "RETURN src.uri as src, rel.uri as rel",
-                            uri=v.o.value,
-                            database_=self.db,
-                        )
-
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], data["rel"], v.o.value))
-
-                    else:
-
-                        # *
-
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Literal) "
-                            "RETURN src.uri as src, rel.uri as rel, dest.value as dest",
-                            database_=self.db,
-                        )
-
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], data["rel"], data["dest"]))
-
-                        records, summary, keys = self.io.execute_query(
-                            "MATCH (src:Node)-[rel:Rel]->(dest:Node) "
-                            "RETURN src.uri as src, rel.uri as rel, dest.uri as dest",
-                            database_=self.db,
-                        )
-
-                        for rec in records:
-                            data = rec.data()
-                            triples.append((data["src"], data["rel"], data["dest"]))
-
-            triples = [
-                Triple(
-                    s=self.create_value(t[0]),
-                    p=self.create_value(t[1]), 
-                    o=self.create_value(t[2])
+                    # *
+
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Literal) "
+                        "RETURN src.uri as src, rel.uri as rel, dest.value as dest",
+                        database_=self.db,
+                    )
+
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], data["rel"], data["dest"]))
+
+                    records, summary, keys = self.io.execute_query(
+                        "MATCH (src:Node)-[rel:Rel]->(dest:Node) "
+                        "RETURN src.uri as src, rel.uri as rel, dest.uri as dest",
+                        database_=self.db,
+                    )
+
+                    for rec in records:
+                        data = rec.data()
+                        triples.append((data["src"], data["rel"], data["dest"]))
+
+        return triples
+
+    # Batch queries are grouped by which of s, p and o are set, and each
+    # group is run as one UNWIND query for literal objects and one for node
+    # objects
+    def batch_query(self, shape, dest, key):
+
+        s, p, o = shape
+
+        return (
+            "UNWIND $rows AS row "
+            "MATCH (src:Node" + (" {uri: row.s}" if s else "") + ")"
+            "-[rel:Rel" + (" {uri: row.p}" if p else "") + "]->"
+            "(dest:" + dest + (" {" + key + ": row.o}" if o else "") + ") "
+            "WITH row.idx AS idx, "
+            "collect([src.uri, rel.uri, dest." + key + "]) AS ts "
+            "RETURN idx, ts[0..$limit] AS ts"
+        )
+
+    def query_batch(self, patterns, limit):
+
+        if not patterns: return []
+
+        # A null bound would make every slice in the query null
+        if limit is None: limit = default_batch_limit
+
+        results = [[] for t in patterns]
+
+        groups = {}
+
+        for i, t in enumerate(patterns):
+
+            shape = (t.s is not None, t.p is not None, t.o is not None)
+
+            groups.setdefault(shape, []).append({
+                "idx": i,
+                "s": t.s.value if t.s is not None else None,
+                "p": t.p.value if t.p is not None else None,
+                "o": t.o.value if t.o is not None else None,
+            })
+
+        for shape, rows in groups.items():
+
+            for dest, key in [("Literal", "value"), ("Node", "uri")]:
+
+                records, summary, keys = self.io.execute_query(
+                    self.batch_query(shape, dest, key),
+                    rows=rows, limit=limit,
+                    database_=self.db,
                 )
-                for t in triples
-            ]
 
-            print("Send response...", flush=True)
-            r = TriplesQueryResponse(triples=triples, error=None)
+                for rec in records:
+                    data = rec.data()
+                    results[data["idx"]].extend(
+                        tuple(t) for t in data["ts"]
+                    )
+
+        return [r[:limit] for r in results]
+
+    def handle(self, msg):
+
+        try:
+
+            v = msg.value()
+
+            # Sender-produced ID
+            id = msg.properties()["id"]
+
+            print(f"Handling input {id}...", flush=True)
+
+            # An empty patterns list is a batch with no patterns, not a
+            # single query
+            if v.patterns is not None:
+
+                # Batch query, one result per pattern
+                results = [
+                    TriplesQueryResult(triples=self.to_triples(triples))
+                    for triples in self.query_batch(v.patterns, v.limit)
+                ]
+
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(results=results, error=None)
+
+            else:
+
+                triples = self.to_triples(
+                    self.query(v.s, v.p, v.o, v.limit)
+                )
+
+                print("Send response...", flush=True)
+                r = TriplesQueryResponse(triples=triples, error=None)
+
             self.producer.send(r, properties={"id": id})
 
             print("Done.", flush=True)
@@ -34,6 +34,10 @@ class Processor(ConsumerProducer):
         entity_limit = params.get("entity_limit", 50)
         triple_limit = params.get("triple_limit", 30)
         max_subgraph_size = params.get("max_subgraph_size", 3000)
+        triple_concurrency = params.get("triple_concurrency", 10)
+        label_batch_size = params.get("label_batch_size", 100)
+        label_cache_size = params.get("label_cache_size", 10000)
+        label_cache_ttl = params.get("label_cache_ttl", 600)
         pr_request_queue = params.get(
             "prompt_request_queue", prompt_request_queue
         )
@@ -69,6 +73,10 @@ class Processor(ConsumerProducer):
                 "entity_limit": entity_limit,
                 "triple_limit": triple_limit,
                 "max_subgraph_size": max_subgraph_size,
+                "triple_concurrency": triple_concurrency,
+                "label_batch_size": label_batch_size,
+                "label_cache_size": label_cache_size,
+                "label_cache_ttl": label_cache_ttl,
                 "prompt_request_queue": pr_request_queue,
                 "prompt_response_queue": pr_response_queue,
                 "embeddings_request_queue": emb_request_queue,
@@ -94,6 +102,10 @@ class Processor(ConsumerProducer):
             entity_limit=entity_limit,
             triple_limit=triple_limit,
             max_subgraph_size=max_subgraph_size,
+            triple_concurrency=triple_concurrency,
+            label_batch_size=label_batch_size,
+            label_cache_size=label_cache_size,
+            label_cache_ttl=label_cache_ttl,
             module=module,
         )
 
@@ -165,6 +177,34 @@ class Processor(ConsumerProducer):
             help=f'Max subgraph size (default: 3000)'
         )
 
+        parser.add_argument(
+            '--triple-concurrency',
+            type=int,
+            default=10,
+            help=f'Max triple queries in flight, per query (default: 10)'
+        )
+
+        parser.add_argument(
+            '--label-batch-size',
+            type=int,
+            default=100,
+            help=f'Labels fetched per triples query (default: 100)'
+        )
+
+        parser.add_argument(
+            '--label-cache-size',
+            type=int,
+            default=10000,
+            help=f'Max labels held in the label cache (default: 10000)'
+        )
+
+        parser.add_argument(
+            '--label-cache-ttl',
+            type=int,
+            default=600,
+            help=f'Label cache entry lifetime, seconds (default: 600)'
+        )
+
         parser.add_argument(
             '--prompt-request-queue',
             default=prompt_request_queue,
@@ -0,0 +1,90 @@
+
+"""
+Accepts chunk/vector pairs and writes them to a local vector store held in
+memory-mapped files.  No external service is needed.
+"""
+
+from .... schema import ChunkEmbeddings
+from .... schema import chunk_embeddings_ingest_queue
+from .... log_level import LogLevel
+from .... direct.local_vectors import LocalVectors
+from .... base import BufferedConsumer, point_id
+
+module = ".".join(__name__.split(".")[1:-1])
+
+default_input_queue = chunk_embeddings_ingest_queue
+default_subscriber = module
+default_store_path = 'vectors'
+
+class Processor(BufferedConsumer):
+
+    def __init__(self, **params):
+
+        input_queue = params.get("input_queue", default_input_queue)
+        subscriber = params.get("subscriber", default_subscriber)
+        store_path = params.get("store_path", default_store_path)
+
+        super(Processor, self).__init__(
+            **params | {
+                "input_queue": input_queue,
+                "subscriber": subscriber,
+                "input_schema": ChunkEmbeddings,
+                "store_path": store_path,
+            }
+        )
+
+        self.vecstore = LocalVectors(store_path)
+
+    def handle(self, msg):
+
+        v = msg.value()
+
+        chunk = v.chunk.decode("utf-8")
+
+        if chunk == "": return
+
+        for i, vec in enumerate(v.vectors):
+
+            dim = len(vec)
+            collection = (
+                "d_" + v.metadata.user + "_" + v.metadata.collection + "_" +
+                str(dim)
+            )
+
+            id = point_id(
+                v.metadata.user, v.metadata.collection, v.metadata.id,
+                chunk, i
+            )
+
+            self.add(
+                (collection, dim),
+                (id, vec, { "doc": chunk })
+            )
+
+    def flush(self, key, items):
+
+        collection, dim = key
+
+        self.vecstore.index(collection, dim).insert_many(
+            [ id for id, vec, payload in items ],
+            [ vec for id, vec, payload in items ],
+            [ payload for id, vec, payload in items ],
+        )
+
+    @staticmethod
+    def add_args(parser):
+
+        BufferedConsumer.add_args(
+            parser, default_input_queue, default_subscriber,
+        )
+
+        parser.add_argument(
+            '-t', '--store-path',
+            default=default_store_path,
+            help=f'Vector store directory (default: {default_store_path})'
+        )
+
+def run():
+
+    Processor.start(module, __doc__)
+
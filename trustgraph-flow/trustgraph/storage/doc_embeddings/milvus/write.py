@@ -7,7 +7,7 @@ from .... schema import ChunkEmbeddings
 from .... schema import chunk_embeddings_ingest_queue
 from .... log_level import LogLevel
 from .... direct.milvus_doc_embeddings import DocVectors
-from .... base import Consumer
+from .... base import BufferedConsumer, point_id
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -15,7 +15,7 @@ default_input_queue = chunk_embeddings_ingest_queue
 default_subscriber = module
 default_store_uri = 'http://localhost:19530'
 
-class Processor(Consumer):
+class Processor(BufferedConsumer):
 
     def __init__(self, **params):
 
@@ -41,13 +41,20 @@ class Processor(Consumer):
         chunk = v.chunk.decode("utf-8")
 
         if v.chunk != "" and v.chunk is not None:
-            for vec in v.vectors:
-                self.vecstore.insert(vec, chunk)
+            for i, vec in enumerate(v.vectors):
+                id = point_id(
+                    v.metadata.user, v.metadata.collection, v.metadata.id,
+                    chunk, i
+                )
+                self.add(len(vec), (id, vec, chunk))
+
+    def flush(self, dim, items):
+        self.vecstore.insert_many(items)
 
     @staticmethod
     def add_args(parser):
 
-        Consumer.add_args(
+        BufferedConsumer.add_args(
             parser, default_input_queue, default_subscriber,
         )
 
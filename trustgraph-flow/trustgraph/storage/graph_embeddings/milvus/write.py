@@ -7,7 +7,7 @@ from .... schema import GraphEmbeddings
 from .... schema import graph_embeddings_store_queue
 from .... log_level import LogLevel
 from .... direct.milvus_graph_embeddings import EntityVectors
-from .... base import Consumer
+from .... base import BufferedConsumer, point_id
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -15,7 +15,7 @@ default_input_queue = graph_embeddings_store_queue
 default_subscriber = module
 default_store_uri = 'http://localhost:19530'
 
-class Processor(Consumer):
+class Processor(BufferedConsumer):
 
     def __init__(self, **params):
 
@@ -39,13 +39,20 @@ class Processor(Consumer):
         v = msg.value()
 
         if v.entity.value != "":
-            for vec in v.vectors:
-                self.vecstore.insert(vec, v.entity.value)
+            for i, vec in enumerate(v.vectors):
+                id = point_id(
+                    v.metadata.user, v.metadata.collection, v.entity.value,
+                    v.metadata.id, i, vec
+                )
+                self.add(len(vec), (id, vec, v.entity.value))
+
+    def flush(self, dim, items):
+        self.vecstore.insert_many(items)
 
     @staticmethod
     def add_args(parser):
 
-        Consumer.add_args(
+        BufferedConsumer.add_args(
             parser, default_input_queue, default_subscriber,
         )
 
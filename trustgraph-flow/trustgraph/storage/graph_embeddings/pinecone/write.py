@@ -3,17 +3,16 @@
 Accepts entity/vector pairs and writes them to a Pinecone store.
 """
 
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import Pinecone
 from pinecone.grpc import PineconeGRPC, GRPCClientConfig
 
-import time
-import uuid
 import os
 
 from .... schema import GraphEmbeddings
 from .... schema import graph_embeddings_store_queue
 from .... log_level import LogLevel
-from .... base import Consumer
+from .... direct.pinecone_provisioner import IndexProvisioner
+from .... base import BufferedConsumer, point_id
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -22,8 +21,9 @@ default_subscriber = module
 default_api_key = os.getenv("PINECONE_API_KEY", "not-specified")
 default_cloud = "aws"
 default_region = "us-east-1"
+upsert_size = 100
 
-class Processor(Consumer):
+class Processor(BufferedConsumer):
 
     def __init__(self, **params):
 
@@ -58,17 +58,17 @@ class Processor(Consumer):
             }
         )
 
-        self.last_index_name = None
+        self.provisioner = IndexProvisioner(
+            self.pinecone, self.cloud, self.region
+        )
 
     def handle(self, msg):
 
         v = msg.value()
 
-        id = str(uuid.uuid4())
-
         if v.entity.value == "" or v.entity.value is None: return
 
-        for vec in v.vectors:
+        for i, vec in enumerate(v.vectors):
 
             dim = len(vec)
 
@@ -76,65 +76,41 @@ class Processor(Consumer):
                 "t-" + v.metadata.user + "-" + str(dim)
             )
 
-            if index_name != self.last_index_name:
-
-                if not self.pinecone.has_index(index_name):
-
-                    try:
-
-                        self.pinecone.create_index(
-                            name = index_name,
-                            dimension = dim,
-                            metric = "cosine",
-                            spec = ServerlessSpec(
-                                cloud = self.cloud,
-                                region = self.region,
-                            )
-                        )
-
-                        for i in range(0, 1000):
-
-                            if self.pinecone.describe_index(
-                                    index_name
-                            ).status["ready"]:
-                                break
-
-                            time.sleep(1)
-
-                        if not self.pinecone.describe_index(
-                                index_name
-                        ).status["ready"]:
-                            raise RuntimeError(
-                                "Gave up waiting for index creation"
-                            )
+            # Index creation is slow, so happens in the background.  Until
+            # the index is ready the message is negatively acknowledged and
+            # redelivered later, leaving other indexes' writes unblocked.
+            if not self.provisioner.is_ready(index_name, dim):
+                raise RuntimeError(f"Index {index_name} is not ready")
 
-                    except Exception as e:
-                        print("Pinecone index creation failed")
-                        raise e
-
-                    print(f"Index {index_name} created", flush=True)
-
-                self.last_index_name = index_name
-
-            index = self.pinecone.Index(index_name)
-
-            records = [
+            self.add(
+                (index_name, v.metadata.collection),
                 {
-                    "id": id,
+                    "id": point_id(
+                        v.metadata.user, v.metadata.collection,
+                        v.entity.value, v.metadata.id, i, vec
+                    ),
                     "values": vec,
                     "metadata": { "entity": v.entity.value },
                 }
-            ]
+            )
+
+    def flush(self, key, records):
+
+        index_name, namespace = key
+
+        index = self.pinecone.Index(index_name)
 
+        # Upsert requests are size-limited, so are sent in slices
+        for i in range(0, len(records), upsert_size):
             index.upsert(
-                vectors = records,
-                namespace = v.metadata.collection,
+                vectors = records[i:i + upsert_size],
+                namespace = namespace,
             )
 
     @staticmethod
     def add_args(parser):
 
-        Consumer.add_args(
+        BufferedConsumer.add_args(
             parser, default_input_queue, default_subscriber,
         )
 
@@ -6,12 +6,11 @@ Accepts entity/vector pairs and writes them to a Qdrant store.
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct
 from qdrant_client.models import Distance, VectorParams
-import uuid
 
 from .... schema import GraphEmbeddings
 from .... schema import graph_embeddings_store_queue
 from .... log_level import LogLevel
-from .... base import Consumer
+from .... base import BufferedConsumer, point_id
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -19,7 +18,7 @@ default_input_queue = graph_embeddings_store_queue
 default_subscriber = module
 default_store_uri = 'http://localhost:6333'
 
-class Processor(Consumer):
+class Processor(BufferedConsumer):
 
     def __init__(self, **params):
 
@@ -46,7 +45,7 @@ class Processor(Consumer):
 
         if v.entity.value == "" or v.entity.value is None: return
 
-        for vec in v.vectors:
+        for i, vec in enumerate(v.vectors):
 
             dim = len(vec)
             collection = (
@@ -71,23 +70,31 @@ class Processor(Consumer):
 
                 self.last_collection = collection
 
-            self.client.upsert(
-                collection_name=collection,
-                points=[
-                    PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=vec,
-                        payload={
-                            "entity": v.entity.value,
-                        }
-                    )
-                ]
+            self.add(
+                collection,
+                PointStruct(
+                    id=point_id(
+                        v.metadata.user, v.metadata.collection,
+                        v.entity.value, v.metadata.id, i, vec
+                    ),
+                    vector=vec,
+                    payload={
+                        "entity": v.entity.value,
+                    }
+                )
             )
 
+    def flush(self, collection, points):
+
+        self.client.upsert(
+            collection_name=collection,
+            points=points,
+        )
+
     @staticmethod
     def add_args(parser):
 
-        Consumer.add_args(
+        BufferedConsumer.add_args(
             parser, default_input_queue, default_subscriber,
         )
 
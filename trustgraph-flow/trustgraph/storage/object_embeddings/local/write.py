@@ -0,0 +1,96 @@
+
+"""
+Accepts object/vector pairs and writes them to a local vector store held in
+memory-mapped files.  No external service is needed.
+"""
+
+from .... schema import ObjectEmbeddings
+from .... schema import object_embeddings_store_queue
+from .... log_level import LogLevel
+from .... direct.local_vectors import LocalVectors
+from .... base import BufferedConsumer, point_id
+
+module = ".".join(__name__.split(".")[1:-1])
+
+default_input_queue = object_embeddings_store_queue
+default_subscriber = module
+default_store_path = 'vectors'
+
+class Processor(BufferedConsumer):
+
+    def __init__(self, **params):
+
+        input_queue = params.get("input_queue", default_input_queue)
+        subscriber = params.get("subscriber", default_subscriber)
+        store_path = params.get("store_path", default_store_path)
+
+        super(Processor, self).__init__(
+            **params | {
+                "input_queue": input_queue,
+                "subscriber": subscriber,
+                "input_schema": ObjectEmbeddings,
+                "store_path": store_path,
+            }
+        )
+
+        self.vecstore = LocalVectors(store_path)
+
+    def handle(self, msg):
+
+        v = msg.value()
+
+        if v.id == "" or v.id is None: return
+
+        for i, vec in enumerate(v.vectors):
+
+            dim = len(vec)
+            collection = (
+                "o_" + v.metadata.user + "_" + v.metadata.collection + "_" +
+                v.name + "_" + str(dim)
+            )
+
+            id = point_id(
+                v.metadata.user, v.metadata.collection, v.name,
+                v.key_name, v.id, i
+            )
+
+            self.add(
+                (collection, dim),
+                (
+                    id,
+                    vec,
+                    {
+                        "name": v.name,
+                        "key_name": v.key_name,
+                        "key": v.id,
+                    }
+                )
+            )
+
+    def flush(self, key, items):
+
+        collection, dim = key
+
+        self.vecstore.index(collection, dim).insert_many(
+            [ id for id, vec, payload in items ],
+            [ vec for id, vec, payload in items ],
+            [ payload for id, vec, payload in items ],
+        )
+
+    @staticmethod
+    def add_args(parser):
+
+        BufferedConsumer.add_args(
+            parser, default_input_queue, default_subscriber,
+        )
+
+        parser.add_argument(
+            '-t', '--store-path',
+            default=default_store_path,
+            help=f'Vector store directory (default: {default_store_path})'
+        )
+
+def run():
+
+    Processor.start(module, __doc__)
+
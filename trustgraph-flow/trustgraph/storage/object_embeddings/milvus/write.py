@@ -7,7 +7,7 @@ from .... schema import ObjectEmbeddings
 from .... schema import object_embeddings_store_queue
 from .... log_level import LogLevel
 from .... direct.milvus_object_embeddings import ObjectVectors
-from .... base import Consumer
+from .... base import BufferedConsumer, point_id
 
 module = ".".join(__name__.split(".")[1:-1])
 
@@ -15,7 +15,7 @@ default_input_queue = object_embeddings_store_queue
 default_subscriber = module
 default_store_uri = 'http://localhost:19530'
 
-class Processor(Consumer):
+class Processor(BufferedConsumer):
 
     def __init__(self, **params):
 
@@ -39,13 +39,20 @@ class Processor(Consumer):
         v = msg.value()
 
         if v.id != "" and v.id is not None:
-            for vec in v.vectors:
-                self.vecstore.insert(vec, v.name, v.key_name, v.id)
+            for i, vec in enumerate(v.vectors):
+                id = point_id(
+                    v.metadata.user, v.metadata.collection, v.name,
+                    v.key_name, v.id, i
+                )
+                self.add(v.name, (id, vec, v.name, v.key_name, v.id))
+
+    def flush(self, name, items):
+        self.vecstore.insert_many(items)
 
     @staticmethod
     def add_args(parser):
 
-        Consumer.add_args(
+        BufferedConsumer.add_args(
             parser, default_input_queue, default_subscriber,
         )
 
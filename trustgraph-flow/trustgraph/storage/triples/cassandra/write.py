@@ -9,7 +9,7 @@ import os
 import argparse
 import time
 
-from .... direct.cassandra import TrustGraph
+from .... direct.cassandra import TrustGraphs, layouts, INDEXED
 from .... schema import Triples
 from .... schema import triples_store_queue
 from .... log_level import LogLevel
@@ -20,6 +20,9 @@ module = ".".join(__name__.split(".")[1:-1])
 default_input_queue = triples_store_queue
 default_subscriber = module
 default_graph_host='localhost'
+default_write_concurrency = 100
+default_table_cache_size = 100
+default_table_layout = INDEXED
 
 class Processor(Consumer):
 
@@ -28,6 +31,13 @@ class Processor(Consumer):
         input_queue = params.get("input_queue", default_input_queue)
         subscriber = params.get("subscriber", default_subscriber)
         graph_host = params.get("graph_host", default_graph_host)
+        write_concurrency = params.get(
+            "write_concurrency", default_write_concurrency
+        )
+        table_cache_size = params.get(
+            "table_cache_size", default_table_cache_size
+        )
+        table_layout = params.get("table_layout", default_table_layout)
 
         super(Processor, self).__init__(
             **params | {
@@ -35,40 +45,32 @@ class Processor(Consumer):
                 "subscriber": subscriber,
                 "input_schema": Triples,
                 "graph_host": graph_host,
+                "write_concurrency": write_concurrency,
+                "table_cache_size": table_cache_size,
+                "table_layout": table_layout,
             }
         )
 
-        self.graph_host = [graph_host]
-        self.table = None
+        self.write_concurrency = write_concurrency
+
+        self.graphs = TrustGraphs(
+            hosts=[graph_host], max_size=table_cache_size,
+            layout=table_layout,
+        )
 
     def handle(self, msg):
 
         v = msg.value()
 
-        table = (v.metadata.user, v.metadata.collection)
-
-        if self.table is None or self.table != table:
+        tg = self.graphs.get(v.metadata.user, v.metadata.collection)
 
-            self.tg = None
-
-            try:
-                self.tg = TrustGraph(
-                    hosts=self.graph_host,
-                    keyspace=v.metadata.user, table=v.metadata.collection,
-                )
-            except Exception as e:
-                print("Exception", e, flush=True)
-                time.sleep(1)
-                raise e
-
-            self.table = table
-
-        for t in v.triples:
-            self.tg.insert(
-                t.s.value,
-                t.p.value,
-                t.o.value
-            )
+        tg.insert_many(
+            [
+                (t.s.value, t.p.value, t.o.value)
+                for t in v.triples
+            ],
+            concurrency=self.write_concurrency,
+        )
 
     @staticmethod
     def add_args(parser):
@@ -83,6 +85,27 @@ class Processor(Consumer):
             help=f'Graph host (default: localhost)'
         )
 
+        parser.add_argument(
+            '--write-concurrency',
+            type=int,
+            default=default_write_concurrency,
+            help=f'Max inserts in flight (default: {default_write_concurrency})'
+        )
+
+        parser.add_argument(
+            '--table-cache-size',
+            type=int,
+            default=default_table_cache_size,
+            help=f'Max collections with cached statements (default: {default_table_cache_size})'
+        )
+
+        parser.add_argument(
+            '--table-layout',
+            default=default_table_layout,
+            choices=layouts,
+            help=f'Table layout, must match between writer and query service (default: {default_table_layout})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
@@ -23,6 +23,7 @@ default_subscriber = module
 
 default_graph_url = 'falkor://falkordb:6379'
 default_database = 'falkordb'
+default_batch_size = 1000
 
 class Processor(Consumer):
 
@@ -32,6 +33,7 @@ class Processor(Consumer):
         subscriber = params.get("subscriber", default_subscriber)
         graph_url = params.get("graph_host", default_graph_url)
         database = params.get("database", default_database)
+        batch_size = params.get("batch_size", default_batch_size)
 
         super(Processor, self).__init__(
             **params | {
@@ -43,95 +45,92 @@ class Processor(Consumer):
         )
 
         self.db = database
+        self.batch_size = batch_size
 
         self.io = FalkorDB.from_url(graph_url).select_graph(database)
 
-    def create_node(self, uri):
+    # Splits triples into the rows for each bulk query: node URIs, literal
+    # values, node relationships and literal relationships
+    def to_rows(self, triples):
 
-        print("Create node", uri)
+        nodes = set()
+        literals = set()
+        node_rels = []
+        literal_rels = []
 
-        res = self.io.query(
-            "MERGE (n:Node {uri: $uri})",
-            params={
-                "uri": uri,
-            },
-        )
+        for t in triples:
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=res.nodes_created,
-            time=res.run_time_ms
-        ))
+            nodes.add(t.s.value)
+
+            if t.o.is_uri:
+                nodes.add(t.o.value)
+                node_rels.append({
+                    "src": t.s.value, "dest": t.o.value, "uri": t.p.value,
+                })
+            else:
+                literals.add(t.o.value)
+                literal_rels.append({
+                    "src": t.s.value, "dest": t.o.value, "uri": t.p.value,
+                })
 
-    def create_literal(self, value):
+        return list(nodes), list(literals), node_rels, literal_rels
 
-        print("Create literal", value)
+    def create_triples(self, triples):
 
-        res = self.io.query(
-            "MERGE (n:Literal {value: $value})",
+        nodes, literals, node_rels, literal_rels = self.to_rows(triples)
+
+        # Create new nodes with given uris, if not exists
+        self.io.query(
+            "UNWIND $rows AS uri "
+            "MERGE (n:Node {uri: uri})",
             params={
-                "value": value,
+                "rows": nodes,
             },
         )
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=res.nodes_created,
-            time=res.run_time_ms
-        ))
-
-    def relate_node(self, src, uri, dest):
-
-        print("Create node rel", src, uri, dest)
-
-        res = self.io.query(
-            "MATCH (src:Node {uri: $src}) "
-            "MATCH (dest:Node {uri: $dest}) "
-            "MERGE (src)-[:Rel {uri: $uri}]->(dest)",
+        # Create new literals with given values, if not exists
+        self.io.query(
+            "UNWIND $rows AS value "
+            "MERGE (n:Literal {value: value})",
             params={
-                "src": src,
-                "dest": dest,
-                "uri": uri,
+                "rows": literals,
             },
         )
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=res.nodes_created,
-            time=res.run_time_ms
-        ))
-
-    def relate_literal(self, src, uri, dest):
-
-        print("Create literal rel", src, uri, dest)
-
-        res = self.io.query(
-            "MATCH (src:Node {uri: $src}) "
-            "MATCH (dest:Literal {value: $dest}) "
-            "MERGE (src)-[:Rel {uri: $uri}]->(dest)",
+        self.io.query(
+            "UNWIND $rows AS row "
+            "MATCH (src:Node {uri: row.src}) "
+            "MATCH (dest:Node {uri: row.dest}) "
+            "MERGE (src)-[:Rel {uri: row.uri}]->(dest)",
             params={
-                "src": src,
-                "dest": dest,
-                "uri": uri,
+                "rows": node_rels,
             },
         )
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=res.nodes_created,
-            time=res.run_time_ms
-        ))
+        self.io.query(
+            "UNWIND $rows AS row "
+            "MATCH (src:Node {uri: row.src}) "
+            "MATCH (dest:Literal {value: row.dest}) "
+            "MERGE (src)-[:Rel {uri: row.uri}]->(dest)",
+            params={
+                "rows": literal_rels,
+            },
+        )
 
     def handle(self, msg):
 
         v = msg.value()
 
-        for t in v.triples:
+        start = time.time()
 
-            self.create_node(t.s.value)
+        # Each batch of triples is written with one UNWIND query per
+        # node / relationship shape
+        for i in range(0, len(v.triples), self.batch_size):
+            self.create_triples(v.triples[i:i + self.batch_size])
 
-            if t.o.is_uri:
-                self.create_node(t.o.value)
-                self.relate_node(t.s.value, t.p.value, t.o.value)
-            else:
-                self.create_literal(t.o.value)
-                self.relate_literal(t.s.value, t.p.value, t.o.value)
+        print("Wrote {n} triples in {time} ms.".format(
+            n=len(v.triples), time=int((time.time() - start) * 1000)
+        ), flush=True)
 
     @staticmethod
     def add_args(parser):
@@ -152,6 +151,13 @@ class Processor(Consumer):
             help=f'FalkorDB database (default: {default_database})'
         )
 
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=default_batch_size,
+            help=f'Max triples written per query (default: {default_batch_size})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
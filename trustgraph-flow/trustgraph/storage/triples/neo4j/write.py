@@ -25,6 +25,7 @@ default_graph_host = 'bolt://neo4j:7687'
 default_username = 'neo4j'
 default_password = 'password'
 default_database = 'neo4j'
+default_batch_size = 1000
 
 class Processor(Consumer):
 
@@ -36,6 +37,7 @@ class Processor(Consumer):
         username = params.get("username", default_username)
         password = params.get("password", default_password)
         database = params.get("database", default_database)
+        batch_size = params.get("batch_size", default_batch_size)
 
         super(Processor, self).__init__(
             **params | {
@@ -47,87 +49,88 @@ class Processor(Consumer):
         )
 
         self.db = database
+        self.batch_size = batch_size
 
         self.io = GraphDatabase.driver(graph_host, auth=(username, password))
 
-    def create_node(self, uri):
+    # Splits triples into the rows for each bulk query: node URIs, literal
+    # values, node relationships and literal relationships
+    def to_rows(self, triples):
 
-        print("Create node", uri)
+        nodes = set()
+        literals = set()
+        node_rels = []
+        literal_rels = []
 
-        summary = self.io.execute_query(
-            "MERGE (n:Node {uri: $uri})",
-            uri=uri,
-            database_=self.db,
-        ).summary
+        for t in triples:
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=summary.counters.nodes_created,
-            time=summary.result_available_after
-        ))
+            nodes.add(t.s.value)
 
-    def create_literal(self, value):
-
-        print("Create literal", value)
-
-        summary = self.io.execute_query(
-            "MERGE (n:Literal {value: $value})",
-            value=value,
-            database_=self.db,
-        ).summary
-
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=summary.counters.nodes_created,
-            time=summary.result_available_after
-        ))
-
-    def relate_node(self, src, uri, dest):
+            if t.o.is_uri:
+                nodes.add(t.o.value)
+                node_rels.append({
+                    "src": t.s.value, "dest": t.o.value, "uri": t.p.value,
+                })
+            else:
+                literals.add(t.o.value)
+                literal_rels.append({
+                    "src": t.s.value, "dest": t.o.value, "uri": t.p.value,
+                })
 
-        print("Create node rel", src, uri, dest)
+        return list(nodes), list(literals), node_rels, literal_rels
 
-        summary = self.io.execute_query(
-            "MATCH (src:Node {uri: $src}) "
-            "MATCH (dest:Node {uri: $dest}) "
-            "MERGE (src)-[:Rel {uri: $uri}]->(dest)",
-            src=src, dest=dest, uri=uri,
-            database_=self.db,
-        ).summary
+    def create_triples(self, tx, triples):
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=summary.counters.nodes_created,
-            time=summary.result_available_after
-        ))
+        nodes, literals, node_rels, literal_rels = self.to_rows(triples)
 
-    def relate_literal(self, src, uri, dest):
+        # Create new nodes with given uris, if not exists
+        tx.run(
+            "UNWIND $rows AS uri "
+            "MERGE (n:Node {uri: uri})",
+            rows=nodes,
+        )
 
-        print("Create literal rel", src, uri, dest)
+        # Create new literals with given values, if not exists
+        tx.run(
+            "UNWIND $rows AS value "
+            "MERGE (n:Literal {value: value})",
+            rows=literals,
+        )
 
-        summary = self.io.execute_query(
-            "MATCH (src:Node {uri: $src}) "
-            "MATCH (dest:Literal {value: $dest}) "
-            "MERGE (src)-[:Rel {uri: $uri}]->(dest)",
-            src=src, dest=dest, uri=uri,
-            database_=self.db,
-        ).summary
+        tx.run(
+            "UNWIND $rows AS row "
+            "MATCH (src:Node {uri: row.src}) "
+            "MATCH (dest:Node {uri: row.dest}) "
+            "MERGE (src)-[:Rel {uri: row.uri}]->(dest)",
+            rows=node_rels,
+        )
 
-        print("Created {nodes_created} nodes in {time} ms.".format(
-            nodes_created=summary.counters.nodes_created,
-            time=summary.result_available_after
-        ))
+        tx.run(
+            "UNWIND $rows AS row "
+            "MATCH (src:Node {uri: row.src}) "
+            "MATCH (dest:Literal {value: row.dest}) "
+            "MERGE (src)-[:Rel {uri: row.uri}]->(dest)",
+            rows=literal_rels,
+        )
 
     def handle(self, msg):
 
         v = msg.value()
 
-        for t in v.triples:
+        start = time.time()
 
-            self.create_node(t.s.value)
+        # Each batch of triples is written in one transaction, with one
+        # UNWIND query per node / relationship shape
+        for i in range(0, len(v.triples), self.batch_size):
 
-            if t.o.is_uri:
-                self.create_node(t.o.value)
-                self.relate_node(t.s.value, t.p.value, t.o.value)
-            else:
-                self.create_literal(t.o.value)
-                self.relate_literal(t.s.value, t.p.value, t.o.value)
+            batch = v.triples[i:i + self.batch_size]
+
+            with self.io.session(database=self.db) as session:
+                session.execute_write(self.create_triples, batch)
+
+        print("Wrote {n} triples in {time} ms.".format(
+            n=len(v.triples), time=int((time.time() - start) * 1000)
+        ), flush=True)
 
     @staticmethod
     def add_args(parser):
@@ -160,6 +163,13 @@ class Processor(Consumer):
             help=f'Neo4j database (default: {default_database})'
         )
 
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=default_batch_size,
+            help=f'Max triples written per transaction (default: {default_batch_size})'
+        )
+
 def run():
 
     Processor.start(module, __doc__)
@@ -27,7 +27,7 @@ from .... schema import TextCompletionRequest, TextCompletionResponse, Error
 from .... schema import text_completion_request_queue
 from .... schema import text_completion_response_queue
 from .... log_level import LogLevel
-from .... base import ConsumerProducer
+from .... base import LlmProcessor
 from .... exceptions import TooManyRequests
 
 module = ".".join(__name__.split(".")[1:-1])
@@ -41,7 +41,7 @@ default_temperature = 0.0
 default_max_output = 8192
 default_private_key = "private.json"
 
-class Processor(ConsumerProducer):
+class Processor(LlmProcessor):
 
     def __init__(self, **params):
 
@@ -145,6 +145,17 @@ class Processor(ConsumerProducer):
 
             prompt = v.system + "\n\n" + v.prompt
 
+            if v.streaming:
+
+                with __class__.text_completion_metric.time():
+                    self.stream(id, prompt)
+
+                print("Done.", flush=True)
+
+                self.consumer.acknowledge(msg)
+
+                return
+
             with __class__.text_completion_metric.time():
 
                 response = self.llm.generate_content(
@@ -169,20 +180,27 @@ class Processor(ConsumerProducer):
                 model=self.model
             )
 
-            self.producer.send(r, properties={"id": id})
+            self.send(r, properties={"id": id})
 
             print("Done.", flush=True)
 
             # Acknowledge successful processing of the message
             self.consumer.acknowledge(msg)
 
-        except google.api_core.exceptions.ResourceExhausted as e:
+        except google.api_core.exceptions.ResourceExhausted:
+
+            # The message is redelivered and the rate limiter backs off
+            raise TooManyRequests()
+
+        except Exception as e:
+
+            print(f"Exception: {e}")
 
-            print("Send rate limit response...", flush=True)
+            print("Send error response...", flush=True)
 
             r = TextCompletionResponse(
                 error=Error(
-                    type = "rate-limit",
+                    type = "llm-error",
                     message = str(e),
                 ),
                 response=None,
@@ -195,31 +213,57 @@ class Processor(ConsumerProducer):
 
             self.consumer.acknowledge(msg)
 
-        except Exception as e:
+    # Sends the completion as it is generated, one message per chunk of
+    # text, followed by an end-of-stream message with the token counts
+    def stream(self, id, prompt):
 
-            print(f"Exception: {e}")
+        response = self.llm.generate_content(
+            prompt, generation_config=self.generation_config,
+            safety_settings=self.safety_settings, stream=True
+        )
 
-            print("Send error response...", flush=True)
+        inputtokens = None
+        outputtokens = None
+
+        for chunk in response:
+
+            # Usage counts are cumulative, the last chunk has the totals
+            if chunk.usage_metadata:
+                inputtokens = int(chunk.usage_metadata.prompt_token_count)
+                outputtokens = int(chunk.usage_metadata.candidates_token_count)
+
+            if not chunk.candidates or not chunk.candidates[0].content.parts:
+                continue
 
             r = TextCompletionResponse(
-                error=Error(
-                    type = "llm-error",
-                    message = str(e),
-                ),
-                response=None,
+                error=None,
+                response=chunk.text,
                 in_token=None,
                 out_token=None,
-                model=None,
+                model=self.model,
+                end_of_stream=False,
             )
 
-            self.producer.send(r, properties={"id": id})
+            self.send(r, properties={"id": id})
 
-            self.consumer.acknowledge(msg)
+        print(f"Input Tokens: {inputtokens}", flush=True)
+        print(f"Output Tokens: {outputtokens}", flush=True)
+
+        r = TextCompletionResponse(
+            error=None,
+            response="",
+            in_token=inputtokens,
+            out_token=outputtokens,
+            model=self.model,
+            end_of_stream=True,
+        )
+
+        self.send(r, properties={"id": id})
 
     @staticmethod
     def add_args(parser):
 
-        ConsumerProducer.add_args(
+        LlmProcessor.add_args(
             parser, default_input_queue, default_subscriber,
             default_output_queue,
         )